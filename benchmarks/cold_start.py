@@ -0,0 +1,133 @@
+"""
+Cold-start benchmark for the JIT Lambda handlers
+
+Each run imports one handler module in a fresh interpreter (as Lambda does on a
+cold start) and records the time spent importing and initializing it. No AWS
+calls are made; dummy environment variables and credentials are used.
+
+Usage:
+    python benchmarks/cold_start.py                      # current tree
+    python benchmarks/cold_start.py --baseline HEAD~1    # compare with a git revision
+    python benchmarks/cold_start.py --runs 30 --handler JIT-Request-Handler
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = 'lambda-functions'
+
+BENCH_ENV = {
+    'DYNAMODB_TABLE': 'JIT-Access-Requests',
+    'REGION': 'us-east-1',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'IDENTITY_CENTER_INSTANCE_ARN': 'arn:aws:sso:::instance/ssoins-0000000000000000',
+    'IDENTITY_STORE_ID': 'd-0000000000',
+    'PS_S3_FULL_ACCESS': 'arn:aws:sso:::permissionSet/ssoins-0000000000000000/ps-0000000000000001',
+    'PS_EC2_FULL_ACCESS': 'arn:aws:sso:::permissionSet/ssoins-0000000000000000/ps-0000000000000002',
+    'PS_EMERGENCY_ADMIN': 'arn:aws:sso:::permissionSet/ssoins-0000000000000000/ps-0000000000000003',
+    'MANAGEMENT_ACCOUNT': '111111111111',
+    'LOG_ARCHIVE_ACCOUNT': '222222222222',
+    'AUDIT_ACCOUNT': '333333333333',
+    'SNS_APPROVAL_TOPIC_ARN': 'arn:aws:sns:us-east-1:111111111111:JIT-Approvals',
+    'PROVISIONING_QUEUE_URL': 'https://sqs.us-east-1.amazonaws.com/111111111111/JIT-Provisioning'
+}
+
+# Runs inside the child interpreter: argv = [lambda_dir, handler_name]
+CHILD_SCRIPT = '''
+import importlib.util, json, sys, time
+lambda_dir, name = sys.argv[1], sys.argv[2]
+sys.path.insert(0, lambda_dir)
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location(name.replace('-', '_'), f"{lambda_dir}/{name}.py")
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+print(json.dumps({"init_ms": (time.perf_counter() - start) * 1000}))
+'''
+
+
+def measure(lambda_dir, handler, runs):
+    """Import the handler in `runs` fresh interpreters, returning init times in ms"""
+    env = dict(os.environ, **BENCH_ENV)
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    samples = []
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, lambda_dir, handler],
+            env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"{handler} failed to import:\n{result.stderr.strip()}")
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1])['init_ms'])
+
+    return samples
+
+
+def list_handlers(lambda_dir):
+    return sorted(
+        name[:-3] for name in os.listdir(lambda_dir)
+        if name.startswith('JIT-') and name.endswith('.py')
+    )
+
+
+def export_revision(revision, target_dir):
+    """Extract lambda-functions/ at a git revision into target_dir"""
+    archive = subprocess.run(
+        ['git', 'archive', revision, LAMBDA_DIR],
+        cwd=REPO_ROOT, capture_output=True, check=True
+    )
+    subprocess.run(['tar', '-x', '-C', target_dir], input=archive.stdout, check=True)
+    return os.path.join(target_dir, LAMBDA_DIR)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'median': statistics.median(ordered),
+        'p90': ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        'min': ordered[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure handler import/init time on a cold interpreter')
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per handler (default 10)')
+    parser.add_argument('--baseline', help='git revision to compare against, e.g. HEAD~1')
+    parser.add_argument('--handler', action='append', help='limit to these handlers (repeatable)')
+    args = parser.parse_args()
+
+    current_dir = os.path.join(REPO_ROOT, LAMBDA_DIR)
+    handlers = args.handler or list_handlers(current_dir)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_dir = export_revision(args.baseline, tmp) if args.baseline else None
+        baseline_handlers = set(list_handlers(baseline_dir)) if baseline_dir else set()
+
+        print(f"{'handler':<28} {'median ms':>10} {'p90 ms':>8} {'min ms':>8}", end='')
+        print(f" {'baseline':>10} {'change':>8}" if baseline_dir else '')
+
+        for handler in handlers:
+            current = summarize(measure(current_dir, handler, args.runs))
+            line = f"{handler:<28} {current['median']:>10.1f} {current['p90']:>8.1f} {current['min']:>8.1f}"
+
+            if baseline_dir:
+                if handler in baseline_handlers:
+                    baseline = summarize(measure(baseline_dir, handler, args.runs))
+                    change = (current['median'] - baseline['median']) / baseline['median'] * 100
+                    line += f" {baseline['median']:>10.1f} {change:>+7.1f}%"
+                else:
+                    line += f" {'-':>10} {'-':>8}"
+
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,686 @@
+"""
+In-process stand-ins for the AWS services used by the JIT Lambdas
+Import after adding lambda-functions/ to sys.path (see load_test.py)
+
+FakeAWS.install() registers the fakes with jit_core.set_client(), so the
+handlers run unmodified against in-memory state. Every call is counted per
+service/operation and can be slowed down with an injected latency to
+approximate real round-trip times.
+"""
+
+import bisect
+import contextlib
+import io
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from decimal import Decimal
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from jit_core.tracing import record_call
+
+# Rough same-region p50 round trips, in milliseconds
+REALISTIC_LATENCY_MS = {
+    'dynamodb': 6,
+    'sso-admin': 120,
+    'identitystore': 40,
+    'scheduler': 35,
+    'events': 30,
+    'ses': 60,
+    'sns': 25,
+    'sqs': 15,
+    'apigatewaymanagementapi': 15,
+    's3': 20
+}
+
+REQUESTS_TABLE_INDEXES = {
+    'UserId-RequestTimestamp-index': ('UserId', 'RequestTimestamp'),
+    'Status-RequestTimestamp-index': ('Status', 'RequestTimestamp'),
+    'UpdatedDay-UpdatedTimestamp-index': ('UpdatedDay', 'UpdatedTimestamp')
+}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+class CallRecorder:
+    """Thread-safe per-operation call counter with optional injected latency"""
+
+    def __init__(self, latency_ms=None):
+        self.latency_ms = dict(latency_ms or {})
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, service, operation):
+        with self._lock:
+            self.calls[f'{service}.{operation}'] += 1
+        delay = self.latency_ms.get(f'{service}.{operation}', self.latency_ms.get(service, 0))
+        if delay:
+            time.sleep(delay / 1000)
+        # Fakes bypass botocore, so report the call to the invocation trace directly
+        record_call(f'{service}.{operation}', delay)
+
+    def snapshot(self):
+        with self._lock:
+            return Counter(self.calls)
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+
+
+def client_error(code, operation, message=''):
+    return ClientError({'Error': {'Code': code, 'Message': message or code}}, operation)
+
+
+def to_dynamo(value):
+    """Normalize a Python value the way DynamoDB returns it (numbers as Decimal)"""
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_dynamo(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_dynamo(v) for v in value]
+    return value
+
+
+class FakeTable:
+    """
+    In-memory DynamoDB Table resource
+    Supports get/put/update_item, query (table or GSI), scan and batch_writer
+    with the expression forms the handlers use
+    """
+
+    def __init__(self, recorder, name, key='RequestId', indexes=None):
+        self.recorder = recorder
+        self.name = name
+        self.key = key
+        self.items = {}
+        self._order = []
+        self._index_keys = dict(indexes or {})
+        # index name -> hash value -> sorted [(range value, primary key)]
+        self._indexes = {name: {} for name in self._index_keys}
+        self._lock = threading.RLock()
+
+    # Seeding helpers (not counted as calls)
+
+    def load(self, items):
+        with self._lock:
+            for item in items:
+                self._store(to_dynamo(item))
+
+    def __len__(self):
+        return len(self.items)
+
+    # Table API
+
+    def get_item(self, Key, **kwargs):
+        self.recorder.record('dynamodb', 'GetItem')
+        with self._lock:
+            item = self.items.get(Key[self.key])
+            return {'Item': dict(item)} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        self.recorder.record('dynamodb', 'PutItem')
+        with self._lock:
+            existing = self.items.get(Item[self.key])
+            self._check_condition(existing, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'PutItem')
+            self._store(to_dynamo(Item))
+            return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues='NONE', **kwargs):
+        self.recorder.record('dynamodb', 'UpdateItem')
+        names = ExpressionAttributeNames or {}
+        values = to_dynamo(ExpressionAttributeValues or {})
+
+        with self._lock:
+            existing = self.items.get(Key[self.key])
+            self._check_condition(existing, ConditionExpression, names, values, 'UpdateItem',
+                                  return_old=kwargs.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD')
+
+            item = self._apply_update(existing or to_dynamo(Key), UpdateExpression, names, values)
+            return {'Attributes': dict(item)} if ReturnValues == 'ALL_NEW' else {}
+
+    def delete_item(self, Key, **kwargs):
+        self.recorder.record('dynamodb', 'DeleteItem')
+        with self._lock:
+            self._remove(Key[self.key])
+            return {}
+
+    def query(self, KeyConditionExpression, IndexName=None, FilterExpression=None, Limit=None,
+              ExclusiveStartKey=None, ScanIndexForward=True, ProjectionExpression=None,
+              ExpressionAttributeNames=None, **kwargs):
+        self.recorder.record('dynamodb', 'Query')
+        hash_condition, range_condition = _split_key_condition(KeyConditionExpression)
+        hash_name, hash_value = hash_condition.get_expression()['values'][0].name, hash_condition.get_expression()['values'][1]
+
+        with self._lock:
+            if IndexName:
+                range_name = self._index_keys[IndexName][1]
+                entries = self._indexes[IndexName].get(to_dynamo(hash_value), [])
+            else:
+                range_name = None
+                entries = [(None, hash_value)] if hash_value in self.items else []
+
+            start = 0
+            if ExclusiveStartKey:
+                marker = (to_dynamo(ExclusiveStartKey.get(range_name)) if range_name else None, ExclusiveStartKey[self.key])
+                if ScanIndexForward:
+                    start = bisect.bisect_right(entries, marker)
+                else:
+                    start = len(entries) - bisect.bisect_left(entries, marker)
+            ordered = entries if ScanIndexForward else entries[::-1]
+
+            items, evaluated, last_key = [], 0, None
+            for position in range(start, len(ordered)):
+                range_value, primary_key = ordered[position]
+                item = self.items[primary_key]
+                if range_condition is not None and not _evaluate(range_condition, item):
+                    continue
+                evaluated += 1
+                if FilterExpression is None or _evaluate(FilterExpression, item):
+                    items.append(_project(item, ProjectionExpression, ExpressionAttributeNames))
+                # DynamoDB only returns a key when more items may follow
+                if Limit and evaluated >= Limit:
+                    if position + 1 < len(ordered):
+                        last_key = {self.key: primary_key}
+                        if range_name:
+                            last_key.update({hash_name: item[hash_name], range_name: range_value})
+                    break
+
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': evaluated}
+        if last_key:
+            response['LastEvaluatedKey'] = last_key
+        return response
+
+    def scan(self, FilterExpression=None, Limit=None, ExclusiveStartKey=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, **kwargs):
+        self.recorder.record('dynamodb', 'Scan')
+        with self._lock:
+            keys = [key for key in self._order if key in self.items]
+            start = keys.index(ExclusiveStartKey[self.key]) + 1 if ExclusiveStartKey else 0
+
+            items, evaluated, last_key = [], 0, None
+            for primary_key in keys[start:]:
+                item = self.items[primary_key]
+                evaluated += 1
+                if FilterExpression is None or _evaluate(FilterExpression, item):
+                    items.append(_project(item, ProjectionExpression, ExpressionAttributeNames))
+                if Limit and evaluated >= Limit:
+                    if start + evaluated < len(keys):
+                        last_key = {self.key: primary_key}
+                    break
+
+        response = {'Items': items, 'Count': len(items), 'ScannedCount': evaluated}
+        if last_key:
+            response['LastEvaluatedKey'] = last_key
+        return response
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return FakeBatchWriter(self)
+
+    # Internals
+
+    def _store(self, item):
+        primary_key = item[self.key]
+        if primary_key not in self.items:
+            self._order.append(primary_key)
+        else:
+            self._unindex(self.items[primary_key])
+        self.items[primary_key] = item
+        for index_name, (hash_name, range_name) in self._index_keys.items():
+            if hash_name in item and range_name in item:
+                partition = self._indexes[index_name].setdefault(item[hash_name], [])
+                bisect.insort(partition, (item[range_name], primary_key))
+
+    def _remove(self, primary_key):
+        item = self.items.pop(primary_key, None)
+        if item is not None:
+            self._unindex(item)
+
+    def _unindex(self, item):
+        for index_name, (hash_name, range_name) in self._index_keys.items():
+            if hash_name in item and range_name in item:
+                partition = self._indexes[index_name].get(item[hash_name], [])
+                entry = (item[range_name], item[self.key])
+                position = bisect.bisect_left(partition, entry)
+                if position < len(partition) and partition[position] == entry:
+                    del partition[position]
+
+    def _apply_update(self, existing, expression, names, values):
+        item = dict(existing)
+        for action, path, operand in _parse_update(expression):
+            attribute = names.get(path, path)
+            if action == 'SET':
+                item[attribute] = values[operand]
+            elif action == 'REMOVE':
+                item.pop(attribute, None)
+            elif action == 'ADD':
+                item[attribute] = item.get(attribute, Decimal(0)) + values[operand]
+        self._store(item)
+        return item
+
+    def _check_condition(self, existing, expression, names, values, operation, return_old=False):
+        if expression and not _evaluate_string(expression, existing or {}, names or {}, to_dynamo(values or {})):
+            error = client_error('ConditionalCheckFailedException', operation, 'The conditional request failed')
+            if return_old and existing is not None:
+                # Like DynamoDB, the old item comes back in the typed (low-level) format
+                error.response['Item'] = _typed(existing)
+            raise error
+
+
+class FakeBatchWriter:
+    """batch_writer() stand-in that counts one BatchWriteItem per 25 writes"""
+
+    def __init__(self, table):
+        self.table = table
+        self.pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._flush()
+
+    def put_item(self, Item):
+        with self.table._lock:
+            self.table._store(to_dynamo(Item))
+        self._count()
+
+    def delete_item(self, Key):
+        with self.table._lock:
+            self.table._remove(Key[self.table.key])
+        self._count()
+
+    def _count(self):
+        self.pending += 1
+        if self.pending == 25:
+            self._flush()
+
+    def _flush(self):
+        if self.pending:
+            self.table.recorder.record('dynamodb', 'BatchWriteItem')
+            self.pending = 0
+
+
+class FakeDynamoDBClient:
+    """Low-level DynamoDB client (typed attribute values) backed by FakeTable instances"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def get_item(self, TableName, Key, **kwargs):
+        response = self.tables[TableName].get_item(Key=_untyped(Key))
+        if 'Item' in response:
+            response['Item'] = _typed(response['Item'])
+        return response
+
+    def put_item(self, TableName, Item, ExpressionAttributeValues=None, **kwargs):
+        return self.tables[TableName].put_item(
+            Item=_untyped(Item),
+            ExpressionAttributeValues=_untyped(ExpressionAttributeValues or {}),
+            **kwargs
+        )
+
+    def update_item(self, TableName, Key, ExpressionAttributeValues=None, **kwargs):
+        response = self.tables[TableName].update_item(
+            Key=_untyped(Key),
+            ExpressionAttributeValues=_untyped(ExpressionAttributeValues or {}),
+            **kwargs
+        )
+        if 'Attributes' in response:
+            response['Attributes'] = _typed(response['Attributes'])
+        return response
+
+
+    def batch_get_item(self, RequestItems, **kwargs):
+        responses = {}
+        for table_name, request in RequestItems.items():
+            table = self.tables[table_name]
+            table.recorder.record('dynamodb', 'BatchGetItem')
+            with table._lock:
+                found = (table.items.get(_untyped(key)[table.key]) for key in request['Keys'])
+                responses[table_name] = [_typed(item) for item in found if item is not None]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        """Update entries only; every condition is checked before anything is written, like DynamoDB"""
+        updates = [entry['Update'] for entry in TransactItems]
+        tables = [self.tables[update['TableName']] for update in updates]
+        tables[0].recorder.record('dynamodb', 'TransactWriteItems')
+
+        with contextlib.ExitStack() as stack:
+            for table in {id(table): table for table in tables}.values():
+                stack.enter_context(table._lock)
+
+            prepared, reasons = [], []
+            for update, table in zip(updates, tables):
+                names = update.get('ExpressionAttributeNames') or {}
+                values = to_dynamo(_untyped(update.get('ExpressionAttributeValues') or {}))
+                key = _untyped(update['Key'])
+                existing = table.items.get(key[table.key])
+                condition = update.get('ConditionExpression')
+                if condition and not _evaluate_string(condition, existing or {}, names, values):
+                    reason = {'Code': 'ConditionalCheckFailed'}
+                    if update.get('ReturnValuesOnConditionCheckFailure') == 'ALL_OLD' and existing is not None:
+                        reason['Item'] = _typed(existing)
+                    reasons.append(reason)
+                else:
+                    reasons.append({'Code': 'None'})
+                prepared.append((table, existing or to_dynamo(key), update['UpdateExpression'], names, values))
+
+            if any(reason['Code'] != 'None' for reason in reasons):
+                error = client_error('TransactionCanceledException', 'TransactWriteItems', 'Transaction cancelled')
+                error.response['CancellationReasons'] = reasons
+                raise error
+
+            for table, existing, expression, names, values in prepared:
+                table._apply_update(existing, expression, names, values)
+        return {}
+
+
+class FakeClient:
+    """
+    Generic boto3 client stand-in
+    Operations listed in `responses` return (or compute) canned responses;
+    any other operation returns {}. Every call is recorded.
+    """
+
+    def __init__(self, recorder, service_name, responses=None):
+        self.recorder = recorder
+        self.service_name = service_name
+        self.responses = dict(responses or {})
+
+    def __getattr__(self, operation):
+        if operation.startswith('_'):
+            raise AttributeError(operation)
+
+        def call(**kwargs):
+            self.recorder.record(self.service_name, _operation_name(operation))
+            response = self.responses.get(operation, {})
+            return response(**kwargs) if callable(response) else dict(response)
+
+        return call
+
+
+class FakeWebSocketGateway:
+    """
+    Local stub of an API Gateway WebSocket API
+    connect() opens a connection; post_to_connection (the management API the
+    Lambdas call) appends to its inbox, and raises GoneException for closed or
+    unknown connections like API Gateway does.
+    """
+
+    def __init__(self):
+        self.inboxes = {}
+        self._lock = threading.Lock()
+
+    def connect(self, connection_id=None):
+        connection_id = connection_id or uuid.uuid4().hex[:16]
+        with self._lock:
+            self.inboxes[connection_id] = []
+        return connection_id
+
+    def disconnect(self, connection_id):
+        with self._lock:
+            self.inboxes.pop(connection_id, None)
+
+    def messages(self, connection_id):
+        """Messages pushed to a connection, decoded"""
+        return [json.loads(data) for data in self.inboxes.get(connection_id, [])]
+
+    def post_to_connection(self, ConnectionId, Data, **kwargs):
+        with self._lock:
+            if ConnectionId not in self.inboxes:
+                raise client_error('GoneException', 'PostToConnection', f'Connection {ConnectionId} is gone')
+            self.inboxes[ConnectionId].append(Data.decode('utf-8') if isinstance(Data, bytes) else Data)
+        return {}
+
+
+class FakeS3:
+    """
+    In-memory S3 object store (one namespace per bucket)
+    Supports put_object, get_object and paginated list_objects_v2, the calls
+    the archive makes.
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        with self._lock:
+            self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+        return {'ETag': f'"{uuid.uuid4().hex}"'}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            body = self.objects.get((Bucket, Key))
+        if body is None:
+            raise client_error('NoSuchKey', 'GetObject', 'The specified key does not exist.')
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body)}
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None, MaxKeys=1000, **kwargs):
+        with self._lock:
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        if ContinuationToken:
+            keys = [key for key in keys if key > ContinuationToken]
+        page = keys[:MaxKeys]
+        response = {
+            'Contents': [{'Key': key, 'Size': len(self.objects[(Bucket, key)])} for key in page],
+            'KeyCount': len(page),
+            'IsTruncated': len(keys) > MaxKeys
+        }
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+
+class FakeAWS:
+    """
+    One set of fake AWS services sharing a call recorder
+
+        aws = FakeAWS(latency_ms=REALISTIC_LATENCY_MS)
+        aws.install()
+        aws.requests.load(items)
+    """
+
+    def __init__(self, table_name='JIT-Access-Requests', latency_ms=None):
+        self.recorder = CallRecorder(latency_ms)
+        self.gateway = FakeWebSocketGateway()
+        self.s3 = FakeS3()
+        self.requests = FakeTable(self.recorder, table_name, indexes=REQUESTS_TABLE_INDEXES)
+        self.tables = {table_name: self.requests}
+        self.clients = {
+            'dynamodb': FakeDynamoDBClient(self.tables),
+            'sso-admin': FakeClient(self.recorder, 'sso-admin', {
+                'create_account_assignment': lambda **kwargs: {
+                    'AccountAssignmentCreationStatus': {'Status': 'IN_PROGRESS', 'RequestId': str(uuid.uuid4())}
+                },
+                'describe_account_assignment_creation_status': lambda **kwargs: {
+                    'AccountAssignmentCreationStatus': {
+                        'Status': 'SUCCEEDED', 'RequestId': kwargs['AccountAssignmentCreationRequestId']
+                    }
+                },
+                'delete_account_assignment': lambda **kwargs: {
+                    'AccountAssignmentDeletionStatus': {'Status': 'IN_PROGRESS', 'RequestId': str(uuid.uuid4())}
+                }
+            }),
+            'identitystore': FakeClient(self.recorder, 'identitystore', {
+                'get_user_id': lambda **kwargs: {
+                    'UserId': user_id_for(kwargs['AlternateIdentifier']['UniqueAttribute']['AttributeValue']),
+                    'IdentityStoreId': kwargs['IdentityStoreId']
+                },
+                'list_users': {'Users': []}
+            }),
+            'scheduler': FakeClient(self.recorder, 'scheduler', {
+                'create_schedule': lambda **kwargs: {'ScheduleArn': f"arn:aws:scheduler:us-east-1:111111111111:schedule/default/{kwargs['Name']}"}
+            }),
+            'events': FakeClient(self.recorder, 'events', {
+                'put_rule': lambda **kwargs: {'RuleArn': f"arn:aws:events:us-east-1:111111111111:rule/{kwargs['Name']}"},
+                'put_targets': {'FailedEntryCount': 0, 'FailedEntries': []}
+            }),
+            'ses': FakeClient(self.recorder, 'ses', {
+                'send_email': lambda **kwargs: {'MessageId': str(uuid.uuid4())}
+            }),
+            'sns': FakeClient(self.recorder, 'sns', {
+                'publish': lambda **kwargs: {'MessageId': str(uuid.uuid4())}
+            }),
+            'sqs': FakeClient(self.recorder, 'sqs', {
+                'send_message': lambda **kwargs: {'MessageId': str(uuid.uuid4())},
+                'send_message_batch': lambda **kwargs: {
+                    'Successful': [{'Id': entry['Id'], 'MessageId': str(uuid.uuid4())} for entry in kwargs['Entries']],
+                    'Failed': []
+                }
+            }),
+            'apigatewaymanagementapi': FakeClient(self.recorder, 'apigatewaymanagementapi', {
+                'post_to_connection': self.gateway.post_to_connection
+            }),
+            's3': FakeClient(self.recorder, 's3', {
+                'put_object': self.s3.put_object,
+                'get_object': self.s3.get_object,
+                'list_objects_v2': self.s3.list_objects_v2
+            })
+        }
+
+    def add_table(self, name, key, indexes=None):
+        self.tables[name] = FakeTable(self.recorder, name, key=key, indexes=indexes)
+        return self.tables[name]
+
+    def install(self):
+        """Replace every jit_core client and table with these fakes"""
+        import jit_core
+
+        jit_core.invalidate_all()
+        jit_core.reset_clients()
+        for service_name, client in self.clients.items():
+            jit_core.set_client(service_name, client)
+        for name, table in self.tables.items():
+            jit_core.set_client(('table', name), table)
+
+
+def user_id_for(email):
+    """Deterministic fake Identity Center UserId for an email/username"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, email.strip().lower()))
+
+
+# Expression helpers
+
+_UPDATE_CLAUSE = re.compile(r'\b(SET|REMOVE|ADD|DELETE)\b', re.IGNORECASE)
+
+
+def _parse_update(expression):
+    """Yield (action, attribute path, value placeholder) from an UpdateExpression"""
+    parts = _UPDATE_CLAUSE.split(expression)
+    for action, body in zip(parts[1::2], parts[2::2]):
+        action = action.upper()
+        for assignment in filter(None, (part.strip() for part in body.split(','))):
+            if action == 'SET':
+                path, operand = (side.strip() for side in assignment.split('=', 1))
+                yield action, path, operand
+            elif action == 'REMOVE':
+                yield action, assignment, None
+            else:
+                path, operand = assignment.split()
+                yield action, path, operand
+
+
+def _evaluate_string(expression, item, names, values):
+    """Evaluate simple string conditions: comparisons and attribute_(not_)exists joined by AND/OR"""
+    for disjunct in re.split(r'\s+OR\s+', expression.strip(), flags=re.IGNORECASE):
+        if all(_evaluate_term(term.strip(), item, names, values)
+               for term in re.split(r'\s+AND\s+', disjunct, flags=re.IGNORECASE)):
+            return True
+    return False
+
+
+def _evaluate_term(term, item, names, values):
+    function = re.match(r'\(?\s*(attribute_exists|attribute_not_exists)\s*\(\s*([^)]+?)\s*\)', term)
+    if function:
+        present = names.get(function.group(2), function.group(2)) in item
+        return present if function.group(1) == 'attribute_exists' else not present
+
+    match = re.match(r'\(?\s*([^\s()]+)\s*(=|<>|<=|>=|<|>)\s*([^\s()]+)\s*\)?$', term)
+    if not match:
+        raise ValueError(f'Unsupported condition: {term}')
+    left, operator, right = match.groups()
+    return _compare(item.get(names.get(left, left)), operator, values.get(right))
+
+
+def _split_key_condition(condition):
+    expression = condition.get_expression()
+    if expression['operator'] == 'AND':
+        return expression['values']
+    return condition, None
+
+
+def _evaluate(condition, item):
+    """Evaluate a boto3.dynamodb.conditions object against an item"""
+    expression = condition.get_expression()
+    operator, values = expression['operator'], expression['values']
+
+    if operator == 'AND':
+        return _evaluate(values[0], item) and _evaluate(values[1], item)
+    if operator == 'OR':
+        return _evaluate(values[0], item) or _evaluate(values[1], item)
+    if operator == 'NOT':
+        return not _evaluate(values[0], item)
+
+    name = values[0].name
+    if operator == 'attribute_exists':
+        return name in item
+    if operator == 'attribute_not_exists':
+        return name not in item
+
+    actual = item.get(name)
+    if operator == 'BETWEEN':
+        return actual is not None and to_dynamo(values[1]) <= actual <= to_dynamo(values[2])
+    if operator == 'begins_with':
+        return isinstance(actual, str) and actual.startswith(values[1])
+    if operator == 'IN':
+        return actual in [to_dynamo(value) for value in values[1]]
+    if operator == 'contains':
+        return actual is not None and values[1] in actual
+    return _compare(actual, operator, to_dynamo(values[1]))
+
+
+def _compare(actual, operator, expected):
+    if operator == '=':
+        return actual == expected
+    if operator == '<>':
+        return actual != expected
+    if actual is None or expected is None:
+        return False
+    if operator == '<':
+        return actual < expected
+    if operator == '<=':
+        return actual <= expected
+    if operator == '>':
+        return actual > expected
+    return actual >= expected
+
+
+def _project(item, projection, names):
+    if not projection:
+        return dict(item)
+    attributes = [(names or {}).get(part.strip(), part.strip()) for part in projection.split(',')]
+    return {attribute: item[attribute] for attribute in attributes if attribute in item}
+
+
+def _operation_name(method_name):
+    return ''.join(part.capitalize() for part in method_name.split('_'))
+
+
+def _typed(item):
+    return {key: _serializer.serialize(value) for key, value in item.items()}
+
+
+def _untyped(item):
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
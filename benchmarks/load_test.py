@@ -0,0 +1,598 @@
+"""
+Load test for the JIT Lambda hot paths against in-process AWS fakes
+
+Each scenario drives a real lambda_handler (loaded from lambda-functions/)
+with every AWS client replaced by benchmarks/fakes.py, and reports latency
+percentiles, throughput and AWS calls per invocation.
+
+Usage:
+    python benchmarks/load_test.py                               # all scenarios, no injected latency
+    python benchmarks/load_test.py --latency realistic --iterations 50
+    python benchmarks/load_test.py --scenario get-100k-status --save baseline.json
+    python benchmarks/load_test.py --compare baseline.json       # exit 1 on regression
+
+--compare fails when a scenario makes more AWS calls per invocation than the
+baseline, or when its p95 grows by more than --tolerance (default 25%).
+"""
+
+import argparse
+import contextlib
+import dataclasses
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+import uuid
+
+from cold_start import BENCH_ENV, LAMBDA_DIR, REPO_ROOT
+
+LAMBDA_PATH = os.path.join(REPO_ROOT, LAMBDA_DIR)
+os.environ.update(BENCH_ENV)
+sys.path.insert(0, LAMBDA_PATH)
+
+from boto3.dynamodb.types import TypeSerializer  # noqa: E402
+from fakes import REALISTIC_LATENCY_MS, FakeAWS, user_id_for  # noqa: E402
+from jit_core import record_change, subscribe, user_channel, write_partition  # noqa: E402
+from jit_core.push import APPROVALS_CHANNEL, CHANNEL_INDEX  # noqa: E402
+from jit_core.config import load_config, set_config  # noqa: E402
+from jit_core.schema import change_day, change_stamp  # noqa: E402
+
+ACCOUNTS = ['Management', 'LogArchive', 'Audit']
+ACCOUNT_IDS = {name: BENCH_ENV[variable] for name, variable in [
+    ('Management', 'MANAGEMENT_ACCOUNT'), ('LogArchive', 'LOG_ARCHIVE_ACCOUNT'), ('Audit', 'AUDIT_ACCOUNT')
+]}
+STATUSES = ['ACTIVE', 'REVOKED', 'DENIED', 'PENDING', 'FAILED']
+NOTIFICATION_QUEUE_URL = 'https://sqs.us-east-1.amazonaws.com/111111111111/JIT-Notifications'
+IDEMPOTENCY_TABLE = 'JIT-Idempotency'
+STATS_TABLE = 'JIT-Access-Stats'
+STATS_SEED_REQUESTS = 1000
+POLL_INTERVAL_SECONDS = 10
+CHANGES_PER_POLL = 5
+CONNECTIONS_TABLE = 'JIT-Connections'
+WEBSOCKET_ENDPOINT = 'https://ws0000000.execute-api.us-east-1.amazonaws.com/prod'
+PUSH_MANAGERS = 20
+PUSH_USERS = 100
+ARCHIVE_BUCKET = 'jit-access-archive'
+ARCHIVE_AGE_DAYS = 100
+ARCHIVE_SEED_DAYS = 31
+RETRIES_PER_REQUEST = 3
+STREAM_BATCH_SIZE = 100
+
+
+def load_handler(name, **environ):
+    """Import a handler module under a private name with extra environment variables"""
+    previous = {key: os.environ.get(key) for key in environ}
+    os.environ.update({key: value for key, value in environ.items() if value is not None})
+    for key, value in environ.items():
+        if value is None:
+            os.environ.pop(key, None)
+    try:
+        module_name = f"bench_{name.replace('-', '_')}_{uuid.uuid4().hex[:8]}"
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(LAMBDA_PATH, f'{name}.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def make_request(index, status, now, users=1000, expires_in=3600):
+    """Synthetic request record spread across users, accounts and permission sets"""
+    email = f'user{index % users}@example.com'
+    account_name = ACCOUNTS[index % len(ACCOUNTS)]
+    permission_set = ['S3FullAccess', 'EC2FullAccess', 'EmergencyAdmin'][index % 3]
+    return {
+        'RequestId': str(uuid.UUID(int=index)),
+        'UserId': user_id_for(email),
+        'UserEmail': email,
+        'AccountId': ACCOUNT_IDS[account_name],
+        'AccountName': account_name,
+        'PermissionSet': f'JIT-{permission_set}',
+        'PermissionSetArn': BENCH_ENV['PS_S3_FULL_ACCESS'],
+        'RiskLevel': 'HIGH' if permission_set == 'EmergencyAdmin' else 'LOW',
+        'Status': status,
+        'RequestTimestamp': now - (index % 86400),
+        'ExpirationTimestamp': now + expires_in,
+        'DurationMinutes': 60,
+        'Reason': 'load test'
+    }
+
+
+def api_event(method, body=None, params=None, headers=None):
+    return {
+        'httpMethod': method,
+        'body': json.dumps(body) if body is not None else None,
+        'queryStringParameters': params,
+        'headers': headers
+    }
+
+
+# Scenarios: setup(aws, args) returns run(i), which invokes the handler once and
+# returns its response. Optional run.prepare(i) seeds state outside the timed
+# section and run.units(response) counts the work done (default 1 per call).
+
+def post_request(permission_set, **environ):
+    def setup(aws, args):
+        handler = load_handler('JIT-Request-Handler', **environ).lambda_handler
+
+        def run(i):
+            return handler(api_event('POST', {
+                'user_email': f'user{i % 200}@example.com',
+                'account_name': ACCOUNTS[i % len(ACCOUNTS)],
+                'permission_set': permission_set,
+                'reason': 'load test',
+                'duration_minutes': 60
+            }), None)
+        return run
+    return setup
+
+
+def retry_storm(aws, args):
+    """Every request is followed by RETRIES_PER_REQUEST retries carrying the same idempotency key"""
+    aws.add_table(IDEMPOTENCY_TABLE, key='IdempotencyKey')
+    aws.install()
+    set_config(dataclasses.replace(load_config(), idempotency_table_name=IDEMPOTENCY_TABLE))
+    handler = load_handler('JIT-Request-Handler', PROVISIONING_QUEUE_URL=None).lambda_handler
+
+    def run(i):
+        attempt = i // (RETRIES_PER_REQUEST + 1)
+        return handler(api_event('POST', {
+            'user_email': f'user{attempt % 200}@example.com',
+            'account_name': ACCOUNTS[attempt % len(ACCOUNTS)],
+            'permission_set': 'S3FullAccess',
+            'reason': 'load test',
+            'duration_minutes': 60,
+            'idempotency_key': f'retry-{attempt}'
+        }), None)
+    return run
+
+
+def repeat_grant(**environ):
+    """Users re-request a low-risk grant they already hold (it is extended, not granted again)"""
+    def setup(aws, args):
+        handler = load_handler('JIT-Request-Handler', **environ).lambda_handler
+
+        def run(i):
+            return handler(api_event('POST', {
+                'user_email': f'user{i % 5}@example.com',
+                'account_name': ACCOUNTS[0],
+                'permission_set': 'S3FullAccess',
+                'reason': 'load test',
+                'duration_minutes': 30 + i % 30
+            }), None)
+        return run
+    return setup
+
+
+def get_100k(params_for):
+    def setup(aws, args):
+        now = int(time.time())
+        aws.requests.load(make_request(i, STATUSES[i % len(STATUSES)], now) for i in range(args.items))
+        handler = load_handler('JIT-Request-Handler').lambda_handler
+        state = {'token': None}
+
+        def run(i):
+            params = dict(params_for(i), limit='50')
+            if state['token']:
+                params['next_token'] = state['token']
+            response = handler(api_event('GET', params=params), None)
+            # Walk forward through the pages, starting over at the end
+            state['token'] = json.loads(response['body']).get('next_token')
+            return response
+        return run
+    return setup
+
+
+def approve_burst(aws, args):
+    now = int(time.time())
+    aws.requests.load(make_request(i, 'PENDING', now) for i in range(args.iterations))
+    handler = load_handler('JIT-Approval-Handler').lambda_handler
+
+    def run(i):
+        return handler(api_event('POST', {
+            'request_id': str(uuid.UUID(int=i)),
+            'action': 'APPROVE',
+            'approver_email': 'manager@example.com',
+            'comments': 'approved by load test'
+        }), None)
+    return run
+
+
+def manual_revoke(aws, args):
+    now = int(time.time())
+    aws.requests.load(
+        dict(make_request(i, 'ACTIVE', now), RevocationScheduleArn=f'arn:aws:events:us-east-1:111111111111:rule/revoke-{i}')
+        for i in range(args.iterations)
+    )
+    handler = load_handler('JIT-Manual-Revoke').lambda_handler
+
+    def run(i):
+        return handler(api_event('POST', {
+            'request_id': str(uuid.UUID(int=i)),
+            'revoker_email': 'security@example.com'
+        }), None)
+    return run
+
+
+def with_outbox(setup):
+    """Run a scenario with NOTIFICATION_QUEUE_URL set, so emails go through the outbox"""
+    def outbox_setup(aws, args):
+        set_config(dataclasses.replace(load_config(), notification_queue_url=NOTIFICATION_QUEUE_URL))
+        return setup(aws, args)
+    return outbox_setup
+
+
+def with_stream_side_effects(setup):
+    """Run a scenario with SIDE_EFFECT_MODE=stream, so the handler only writes the request"""
+    def stream_setup(aws, args):
+        set_config(dataclasses.replace(load_config(), side_effect_mode='stream'))
+        return setup(aws, args)
+    return stream_setup
+
+
+def with_stats(setup):
+    """Run a scenario with STATS_TABLE set, so the stream processor maintains the aggregates"""
+    def stats_setup(aws, args):
+        aws.add_table(STATS_TABLE, 'StatKey')
+        aws.install()
+        set_config(dataclasses.replace(load_config(), stats_table_name=STATS_TABLE))
+        return setup(aws, args)
+    return stats_setup
+
+
+def with_push(setup):
+    """Run a scenario with WebSocket push on: PUSH_MANAGERS approvers and PUSH_USERS users connected"""
+    def push_setup(aws, args):
+        aws.add_table(CONNECTIONS_TABLE, 'SubscriptionKey', indexes={CHANNEL_INDEX: ('Channel', 'ConnectionId')})
+        aws.install()
+        set_config(dataclasses.replace(
+            load_config(), connections_table_name=CONNECTIONS_TABLE, websocket_endpoint=WEBSOCKET_ENDPOINT
+        ))
+        for n in range(PUSH_MANAGERS):
+            subscribe(aws.gateway.connect(), [user_channel(f'manager{n}@example.com'), APPROVALS_CHANNEL])
+        for n in range(PUSH_USERS):
+            subscribe(aws.gateway.connect(), [user_channel(f'user{n}@example.com')])
+        return setup(aws, args)
+    return push_setup
+
+
+def with_archive(setup):
+    """Run a scenario with ARCHIVE_BUCKET set"""
+    def archive_setup(aws, args):
+        set_config(dataclasses.replace(load_config(), archive_bucket=ARCHIVE_BUCKET))
+        return setup(aws, args)
+    return archive_setup
+
+
+def stream_changes(aws, args):
+    """Stream processor batches with no side effects: half new PENDING requests, half approvals"""
+    handler = load_handler('JIT-Stream-Processor').lambda_handler
+    state = {'offset': 0, 'event': None}
+
+    def prepare(i):
+        now = int(time.time())
+        items = [make_request(state['offset'] + n, 'PENDING', now) for n in range(STREAM_BATCH_SIZE)]
+        state['offset'] += STREAM_BATCH_SIZE
+        half = STREAM_BATCH_SIZE // 2
+        state['event'] = {'Records': (
+            [stream_record('INSERT', item) for item in items[:half]] +
+            [stream_record('MODIFY', dict(item, Status='PROVISIONING'), item) for item in items[half:]]
+        )}
+
+    def run(i):
+        return handler(state['event'], None)
+    run.prepare = prepare
+    run.units = lambda response: STREAM_BATCH_SIZE - len(response['batchItemFailures'])
+    return run
+
+
+def stream_record(event_name, new_item, old_item=None):
+    """DynamoDB stream record (NEW_AND_OLD_IMAGES) for a change to a request"""
+    serializer = TypeSerializer()
+    images = {
+        'Keys': {'RequestId': {'S': new_item['RequestId']}},
+        'NewImage': {name: serializer.serialize(value) for name, value in new_item.items()},
+        'SequenceNumber': str(uuid.uuid4().int)
+    }
+    if old_item:
+        images['OldImage'] = {name: serializer.serialize(value) for name, value in old_item.items()}
+    return {'eventID': uuid.uuid4().hex, 'eventName': event_name, 'dynamodb': images}
+
+
+def stream_batch(aws, args):
+    """Stream processor batches: half new PROVISIONING requests, half grants that just became ACTIVE"""
+    handler = load_handler('JIT-Stream-Processor').lambda_handler
+    state = {'offset': 0, 'event': None}
+
+    def prepare(i):
+        now = int(time.time())
+        items = [make_request(state['offset'] + n, 'PROVISIONING', now) for n in range(STREAM_BATCH_SIZE)]
+        aws.requests.load(items)
+        state['offset'] += STREAM_BATCH_SIZE
+        half = STREAM_BATCH_SIZE // 2
+        state['event'] = {'Records': (
+            [stream_record('INSERT', item) for item in items[:half]] +
+            [stream_record('MODIFY', dict(item, Status='ACTIVE'), item) for item in items[half:]]
+        )}
+
+    def run(i):
+        return handler(state['event'], None)
+    run.prepare = prepare
+    run.units = lambda response: STREAM_BATCH_SIZE - len(response['batchItemFailures'])
+    return run
+
+
+def get_stats(aws, args):
+    """GET /stats once the aggregates exist (the read does not grow with the number of requests counted)"""
+    now = int(time.time())
+    for i in range(STATS_SEED_REQUESTS):
+        record_change(None, make_request(i, STATUSES[i % len(STATUSES)], now))
+    handler = load_handler('JIT-Request-Handler').lambda_handler
+
+    def run(i):
+        event = api_event('GET', params={'days': '7'})
+        event['resource'] = '/stats'
+        return handler(event, None)
+    return run
+
+
+def poll_pending_etag(aws, args):
+    """Approvals view polling GET /requests?status=PENDING with If-None-Match; one change every 10 polls"""
+    now = int(time.time())
+    aws.requests.load(make_request(i, STATUSES[i % len(STATUSES)], now) for i in range(args.items))
+    handler = load_handler('JIT-Request-Handler').lambda_handler
+    state = {'etag': None}
+
+    def prepare(i):
+        if i % 10 == 0:
+            # What JIT-Stream-Processor does for every change to the requests table
+            aws.tables[STATS_TABLE].load([{'StatKey': 'VERSION', 'Version': i + 1}])
+
+    def run(i):
+        headers = {'If-None-Match': state['etag']} if state['etag'] else None
+        response = handler(api_event('GET', params={'status': 'PENDING'}, headers=headers), None)
+        state['etag'] = response['headers'].get('ETag', state['etag'])
+        return response
+    run.prepare = prepare
+    return run
+
+
+def poll_changes(aws, args):
+    """Approvals view polling GET /requests?changed_since=<cursor> while a few requests change between polls"""
+    now = int(time.time())
+    aws.requests.load(make_request(i, STATUSES[i % len(STATUSES)], now) for i in range(args.items))
+    handler = load_handler('JIT-Request-Handler').lambda_handler
+    # Simulated clock: poll i happens POLL_INTERVAL_SECONDS after poll i - 1
+    started = now - (args.iterations + 1) * POLL_INTERVAL_SECONDS
+
+    def prepare(i):
+        changed_at = started + (i + 1) * POLL_INTERVAL_SECONDS
+        aws.requests.load(
+            dict(make_request(n, 'PENDING', now), **change_stamp(changed_at))
+            for n in range(i * CHANGES_PER_POLL, (i + 1) * CHANGES_PER_POLL)
+        )
+
+    def run(i):
+        changed_since = started + (i + 1) * POLL_INTERVAL_SECONDS
+        return handler(api_event('GET', params={'status': 'PENDING', 'changed_since': str(changed_since)}), None)
+    run.prepare = prepare
+    run.units = lambda response: json.loads(response['body'])['count']
+    return run
+
+
+def mass_expiry(aws, args):
+    handler = load_handler('JIT-Revoke-Access', SWEEPER_MAX_ITEMS=str(args.expired)).lambda_handler
+    state = {'offset': 0}
+
+    def prepare(i):
+        # Fresh batch of expired grants for every sweep
+        now = int(time.time())
+        aws.requests.load(make_request(state['offset'] + n, 'ACTIVE', now, expires_in=-60) for n in range(args.expired))
+        state['offset'] += args.expired
+
+    def run(i):
+        return handler({'mode': 'sweep'}, None)
+    run.prepare = prepare
+    run.units = lambda response: json.loads(response['body'])['revoked']
+    return run
+
+
+def archive_closed(aws, args):
+    """JIT-Archiver moving --expired closed requests (older than ARCHIVE_AFTER_DAYS) per run to S3"""
+    handler = load_handler('JIT-Archiver', ARCHIVE_MAX_ITEMS=str(args.expired)).lambda_handler
+    state = {'offset': 0}
+
+    def prepare(i):
+        # Fresh batch of old closed requests for every run
+        old = int(time.time()) - ARCHIVE_AGE_DAYS * 86400
+        aws.requests.load(make_request(state['offset'] + n, ['REVOKED', 'DENIED'][n % 2], old) for n in range(args.expired))
+        state['offset'] += args.expired
+
+    def run(i):
+        return handler({}, None)
+    run.prepare = prepare
+    run.units = lambda response: json.loads(response['body'])['archived']
+    return run
+
+
+def get_archive(aws, args):
+    """GET /requests?archive=true for one user's month of history, over --items archived records"""
+    now = int(time.time())
+    partitions = {}
+    for i in range(args.items):
+        item = dict(make_request(i, STATUSES[1 + i % 2], now), RequestTimestamp=now - i * ARCHIVE_SEED_DAYS * 86400 // args.items)
+        partitions.setdefault((change_day(item['RequestTimestamp']), item['AccountName']), []).append(item)
+    for (day, account_name), items in partitions.items():
+        write_partition(day, account_name, items, 'seed')
+    handler = load_handler('JIT-Request-Handler').lambda_handler
+
+    def run(i):
+        return handler(api_event('GET', params={
+            'archive': 'true',
+            'user': f'user{i % 1000}@example.com',
+            'since': str(now - (ARCHIVE_SEED_DAYS - 1) * 86400)
+        }), None)
+    run.units = lambda response: json.loads(response['body'])['count']
+    return run
+
+
+SCENARIOS = {
+    'post-low-risk': (post_request('S3FullAccess', PROVISIONING_QUEUE_URL=None), 'POST /requests, low risk, synchronous grant'),
+    'post-low-risk-async': (post_request('S3FullAccess'), 'POST /requests, low risk, queued to the provisioning worker'),
+    'post-high-risk': (post_request('EmergencyAdmin'), 'POST /requests, high risk (SNS approval)'),
+    'post-low-risk-stream': (with_stream_side_effects(post_request('S3FullAccess')), 'POST /requests, low risk, SIDE_EFFECT_MODE=stream (single write)'),
+    'post-repeat-grant': (repeat_grant(PROVISIONING_QUEUE_URL=None), 'POST /requests for a grant the user already holds (extended in place)'),
+    'post-retry-storm': (retry_storm, f'post-low-risk where each request is retried {RETRIES_PER_REQUEST}x with its idempotency key'),
+    'get-100k-status': (get_100k(lambda i: {'status': 'ACTIVE'}), 'GET /requests?status=ACTIVE over --items records'),
+    'get-100k-user': (get_100k(lambda i: {'user': f'user{i % 1000}@example.com'}), 'GET /requests?user=... over --items records'),
+    'poll-pending-etag': (with_stats(poll_pending_etag), 'GET /requests?status=PENDING repeated with If-None-Match (304 unless the table changed)'),
+    'poll-changes': (poll_changes, f'GET /requests?changed_since= over --items records, {CHANGES_PER_POLL} changed per poll'),
+    'approve-burst': (approve_burst, 'Approval handler APPROVE of PENDING requests'),
+    'approve-burst-stream': (with_stream_side_effects(approve_burst), 'approve-burst with SIDE_EFFECT_MODE=stream (single write)'),
+    'manual-revoke': (manual_revoke, 'Manual revoke of ACTIVE grants'),
+    'mass-expiry': (mass_expiry, 'Revoke-Access sweeper over --expired expired grants per invocation'),
+    'mass-expiry-outbox': (with_outbox(mass_expiry), 'mass-expiry with emails queued to the notification worker'),
+    'stream-batch': (with_stream_side_effects(stream_batch), f'Stream processor over batches of {STREAM_BATCH_SIZE} records (new requests + activations)'),
+    'stream-batch-stats': (with_stats(with_stream_side_effects(stream_batch)), 'stream-batch with STATS_TABLE set (aggregates maintained too)'),
+    'get-stats': (with_stats(get_stats), 'GET /stats (one BatchGetItem) for the dashboard summary'),
+    'stream-push': (with_push(stream_changes), f'Stream processor pushing {STREAM_BATCH_SIZE}-record batches to {PUSH_MANAGERS} approvers and {PUSH_USERS} users over WebSocket'),
+    'archive-closed': (with_archive(archive_closed), 'Archiver moving --expired closed requests per run to compressed S3 partitions'),
+    'get-archive': (with_archive(get_archive), f'GET /requests?archive=true for one user over {ARCHIVE_SEED_DAYS} days of --items archived records')
+}
+
+
+class _NullWriter(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def run_scenario(name, args, latency_ms):
+    setup, _ = SCENARIOS[name]
+    set_config(None)
+    aws = FakeAWS(latency_ms=latency_ms)
+    aws.install()
+    run = setup(aws, args)
+    iterations = args.sweeps if name.startswith(('mass-expiry', 'archive-')) else args.iterations
+    prepare = getattr(run, 'prepare', None)
+    units_of = getattr(run, 'units', lambda response: 1)
+
+    # Setup calls (seeding, user lookups at import) are not part of the result
+    aws.recorder.reset()
+    durations, units, errors = [], 0, 0
+
+    with contextlib.redirect_stdout(_NullWriter()):
+        elapsed = 0.0
+        for i in range(iterations):
+            # Per-iteration setup (seeding) is not timed
+            if prepare:
+                prepare(i)
+            before = time.perf_counter()
+            response = run(i)
+            duration = time.perf_counter() - before
+            durations.append(duration)
+            elapsed += duration
+            # 304 Not Modified is a successful conditional poll
+            if response.get('statusCode', 200) >= 300 and response['statusCode'] != 304:
+                errors += 1
+            else:
+                units += units_of(response)
+        calls = aws.recorder.snapshot()
+
+    ordered = sorted(durations)
+    return {
+        'scenario': name,
+        'iterations': iterations,
+        'errors': errors,
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+        'throughput': units / elapsed if elapsed else 0.0,
+        'calls_per_invocation': sum(calls.values()) / iterations,
+        'calls': {operation: count / iterations for operation, count in sorted(calls.items())}
+    }
+
+
+def print_report(results):
+    print(f"{'scenario':<22} {'n':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'units/s':>9} {'calls':>6}")
+    for result in results:
+        print(f"{result['scenario']:<22} {result['iterations']:>5} {result['errors']:>4} "
+              f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{result['throughput']:>9.1f} {result['calls_per_invocation']:>6.1f}")
+    print()
+    for result in results:
+        breakdown = ', '.join(f'{operation}={count:g}' for operation, count in result['calls'].items())
+        print(f"{result['scenario']}: {breakdown}")
+
+
+def compare(results, baseline_path, tolerance):
+    """Return a list of regressions against a saved run"""
+    with open(baseline_path) as f:
+        baseline = {result['scenario']: result for result in json.load(f)['results']}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['scenario'])
+        if not previous:
+            continue
+        if result['calls_per_invocation'] > previous['calls_per_invocation'] + 1e-9:
+            regressions.append(
+                f"{result['scenario']}: AWS calls per invocation {previous['calls_per_invocation']:g} -> {result['calls_per_invocation']:g}"
+            )
+        if previous['p95_ms'] and result['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f"{result['scenario']}: p95 {previous['p95_ms']:.2f} ms -> {result['p95_ms']:.2f} ms"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drive the JIT handlers against in-process AWS fakes')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='scenario to run (repeatable, default all)')
+    parser.add_argument('--iterations', type=int, default=200, help='invocations per scenario (default 200)')
+    parser.add_argument('--items', type=int, default=100000, help='records seeded for the GET scenarios (default 100000)')
+    parser.add_argument('--expired', type=int, default=500, help='expired grants per mass-expiry sweep, closed requests per archive-closed run (default 500)')
+    parser.add_argument('--sweeps', type=int, default=5, help='sweeper / archiver invocations for mass-expiry and archive-closed (default 5)')
+    parser.add_argument('--latency', choices=['none', 'realistic'], default='none', help='injected AWS latency (default none)')
+    parser.add_argument('--save', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON from --save; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth for --compare (default 0.25)')
+    parser.add_argument('--list', action='store_true', help='list scenarios and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (_, description) in SCENARIOS.items():
+            print(f'{name:<22} {description}')
+        return 0
+
+    latency_ms = REALISTIC_LATENCY_MS if args.latency == 'realistic' else None
+    results = [run_scenario(name, args, latency_ms) for name in (args.scenario or list(SCENARIOS))]
+    print_report(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'latency': args.latency, 'results': results}, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Notification rendering benchmark
+
+Renders every template in jit_core/templates.py (subject + text + HTML) with
+representative fields and reports the cost per message, next to the cost of
+compiling the template on every render to show what compile-once saves.
+
+Usage:
+    python benchmarks/render.py
+    python benchmarks/render.py --renders 50000 --timezone Europe/Berlin
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from cold_start import BENCH_ENV, LAMBDA_DIR, REPO_ROOT
+
+os.environ.update(BENCH_ENV)
+sys.path.insert(0, os.path.join(REPO_ROOT, LAMBDA_DIR))
+
+from jit_core.templates import TEMPLATES, CompiledTemplate, get_template  # noqa: E402
+
+NOW = int(time.time())
+
+SAMPLE_FIELDS = {
+    'account': 'Management',
+    'permission_set': 'JIT-S3FullAccess',
+    'expires': NOW + 3600,
+    'duration_minutes': 60,
+    'request_id': 'd1c1f1e0-8f5b-4a57-9a3e-5d0f6c3b2a10',
+    'batch_id': '7a0c2c8e-64a4-4e0e-b1f3-0c3c4f6f7d21',
+    'approver': 'manager@example.com',
+    'comments': 'Approved for incident <INC-1234> & follow-up',
+    'error': 'Account assignment FAILED: ConflictException',
+    'revoker': 'security@example.com',
+    'user': 'engineer@example.com',
+    'reason': 'Investigate S3 replication lag',
+    'grant_count': 3,
+    'grants': [
+        {'account': name, 'permission_set': 'JIT-S3FullAccess', 'request_id': f'request-{index}'}
+        for index, name in enumerate(['Management', 'LogArchive', 'Audit'])
+    ]
+}
+
+
+def time_renders(render, renders):
+    started = time.perf_counter()
+    for _ in range(renders):
+        render()
+    return (time.perf_counter() - started) / renders * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure notification template rendering cost')
+    parser.add_argument('--renders', type=int, default=20000, help='renders per template (default 20000)')
+    parser.add_argument('--timezone', default='UTC', help='time zone for timestamps (default UTC)')
+    args = parser.parse_args()
+
+    print(f"{'template':<20} {'us/render':>10} {'renders/s':>11} {'compile each':>13} {'html bytes':>11}")
+    for name in TEMPLATES:
+        template = get_template(name)
+        rendered = template.render(SAMPLE_FIELDS, args.timezone)
+
+        compiled_us = time_renders(lambda: template.render(SAMPLE_FIELDS, args.timezone), args.renders)
+        uncompiled_us = time_renders(
+            lambda: CompiledTemplate(name, TEMPLATES[name]).render(SAMPLE_FIELDS, args.timezone),
+            max(args.renders // 10, 1)
+        )
+        print(f"{name:<20} {compiled_us:>10.1f} {1e6 / compiled_us:>11.0f} {uncompiled_us:>10.1f} us {len(rendered.html):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Response serialization benchmark
+
+Encodes a GET /requests-sized page of DynamoDB items (numbers as Decimal, the
+way the Table resource returns them) the old way - a json.loads(json.dumps(...))
+round trip, then json.dumps of the body - and with the single-pass to_json
+encoder api_response uses now. The same items with plain int numbers are
+included as the floor: the cost of encoding with no Decimal to convert.
+
+Usage:
+    python benchmarks/serialize.py
+    python benchmarks/serialize.py --items 10000 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from decimal import Decimal
+
+from cold_start import BENCH_ENV, LAMBDA_DIR, REPO_ROOT
+
+os.environ.update(BENCH_ENV)
+sys.path.insert(0, os.path.join(REPO_ROOT, LAMBDA_DIR))
+
+from jit_core.responses import decimal_default, to_json  # noqa: E402
+
+NOW = int(time.time())
+
+
+def sample_items(count, number=Decimal):
+    """Items shaped like the GET /requests projection"""
+    return [
+        {
+            'RequestId': f'd1c1f1e0-8f5b-4a57-9a3e-{index:012d}',
+            'UserEmail': f'engineer{index % 500}@example.com',
+            'AccountName': 'Management',
+            'PermissionSet': 'JIT-S3FullAccess',
+            'Status': 'REVOKED' if index % 4 else 'ACTIVE',
+            'RequestTimestamp': number(NOW - index * 60),
+            'ExpirationTimestamp': number(NOW - index * 60 + 3600),
+            'DurationMinutes': number(60),
+            'Reason': 'Investigate S3 replication lag',
+            'ApproverEmail': 'manager@example.com',
+            'RevocationType': 'AUTO'
+        }
+        for index in range(count)
+    ]
+
+
+def round_trip(items):
+    """The previous list_requests + api_response path"""
+    requests_json = json.loads(json.dumps(items, default=decimal_default))
+    return json.dumps({'requests': requests_json, 'count': len(requests_json)})
+
+
+def single_pass(items):
+    return to_json({'requests': items, 'count': len(items)})
+
+
+def time_encodes(encode, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure API response encoding cost for large item pages')
+    parser.add_argument('--items', type=int, default=10000, help='items per payload (default 10000)')
+    parser.add_argument('--repeat', type=int, default=10, help='encodes per variant, best is reported (default 10)')
+    args = parser.parse_args()
+
+    decimal_items = sample_items(args.items)
+    plain_items = sample_items(args.items, number=int)
+    assert json.loads(round_trip(decimal_items)) == json.loads(single_pass(decimal_items))
+
+    variants = [
+        ('round trip', lambda: round_trip(decimal_items)),
+        ('single pass', lambda: single_pass(decimal_items)),
+        ('plain numbers', lambda: single_pass(plain_items))
+    ]
+
+    baseline = None
+    print(f"{'variant':<15} {'ms':>8} {'us/item':>8} {'vs round trip':>14} {'body bytes':>11}")
+    for name, encode in variants:
+        elapsed_ms = time_encodes(encode, args.repeat)
+        baseline = baseline or elapsed_ms
+        body_bytes = len(encode())
+        print(f"{name:<15} {elapsed_ms:>8.1f} {elapsed_ms * 1000 / args.items:>8.2f} "
+              f"{baseline / elapsed_ms:>13.2f}x {body_bytes:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,25 @@
 import json
-import boto3
-import os
-import time
-import uuid
 from datetime import datetime
-from decimal import Decimal
 from botocore.exceptions import ClientError
+from jit_core import (
+    TransitionConflict, api_response, bind, get_client, get_logger, load_config, notify_transition,
+    schedule_revocation, traced, transition_request
+)
+from jit_core.lifecycle import ACTIVE, DENIED, PROVISIONING
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-sso_admin = boto3.client('sso-admin')
-identitystore = boto3.client('identitystore')
-scheduler = boto3.client('scheduler')
+logger = get_logger('JIT-Approval-Handler')
 
 # Environment variables
-TABLE_NAME = os.environ['DYNAMODB_TABLE']
-INSTANCE_ARN = os.environ['IDENTITY_CENTER_INSTANCE_ARN']
-IDENTITY_STORE_ID = os.environ['IDENTITY_STORE_ID']
-REGION = os.environ['REGION']
+config = load_config()
+INSTANCE_ARN = config.instance_arn
 
-table = dynamodb.Table(TABLE_NAME)
+# CORS methods of the POST-only /approvals resource
+ALLOWED_METHODS = 'POST,OPTIONS'
 
+# SIDE_EFFECT_MODE=stream: only record the decision; JIT-Stream-Processor grants and notifies
+STREAM_SIDE_EFFECTS = config.side_effect_mode == 'stream'
+
+@traced
 def lambda_handler(event, context):
     """
     Handle approval or denial of JIT access requests
@@ -43,74 +42,65 @@ def lambda_handler(event, context):
             approver_email = event.get('approver_email')
             comments = event.get('comments', '')
         
-        print(f"Approval handler triggered: request_id={request_id}, action={action}")
+        bind(request_id=request_id, approver=approver_email)
+        logger.info("Approval handler triggered", action=action)
         
         # Validation
         if not request_id:
-            return api_response(400, {'error': 'Missing request_id'})
+            return api_response(400, {'error': 'Missing request_id'}, methods=ALLOWED_METHODS)
         
         if action not in ['APPROVE', 'DENY']:
-            return api_response(400, {'error': 'Action must be APPROVE or DENY'})
+            return api_response(400, {'error': 'Action must be APPROVE or DENY'}, methods=ALLOWED_METHODS)
         
         if not approver_email:
-            return api_response(400, {'error': 'Missing approver_email'})
-        
-        # Get request details from DynamoDB
-        response = table.get_item(Key={'RequestId': request_id})
-        
-        if 'Item' not in response:
-            return api_response(404, {'error': f'Request {request_id} not found'})
-        
-        request_item = response['Item']
-        current_status = request_item.get('Status')
-        
-        # Verify request is in PENDING status
-        if current_status != 'PENDING':
-            return api_response(400, {'error': f'Request is not pending. Current status: {current_status}'})
+            return api_response(400, {'error': 'Missing approver_email'}, methods=ALLOWED_METHODS)
         
-        current_timestamp = int(time.time())
+        # Claim the PENDING request with one conditional write; exactly one
+        # approver wins and gets the updated item back without a separate read
+        if action == 'DENY':
+            transition = 'deny'
+        else:
+            transition = 'approve_async' if STREAM_SIDE_EFFECTS else 'approve'
+        try:
+            request_item = transition_request(request_id, transition, {
+                'ApproverEmail': approver_email,
+                'ApprovalComments': comments
+            })
+        except TransitionConflict as e:
+            if e.current is None:
+                return api_response(404, {'error': f'Request {request_id} not found'}, methods=ALLOWED_METHODS)
+            return api_response(400, {'error': f'Request is not pending. Current status: {e.current_status}'}, methods=ALLOWED_METHODS)
         
         if action == 'DENY':
-            # Update status to DENIED
-            table.update_item(
-                Key={'RequestId': request_id},
-                UpdateExpression='SET #status = :status, ApproverEmail = :approver, ApprovalTimestamp = :timestamp, ApprovalComments = :comments',
-                ExpressionAttributeNames={
-                    '#status': 'Status'
-                },
-                ExpressionAttributeValues={
-                    ':status': 'DENIED',
-                    ':approver': approver_email,
-                    ':timestamp': current_timestamp,
-                    ':comments': comments
-                }
-            )
-            
-            print(f"Request {request_id} denied by {approver_email}")
-
-            # Send denial email
-            email_subject = f"✗ JIT Access Request DENIED"
-            email_body = f"""
-Your JIT access request has been DENIED.
+            logger.info("Request denied")
 
-Account: {request_item.get('AccountName')}
-Permission Set: {request_item.get('PermissionSet')}
-Approver: {approver_email}
-Reason: {comments}
-
-Request ID: {request_id}
-"""
-            send_user_notification(request_item.get('UserEmail'), email_subject, email_body)
+            # Send denial email (in stream mode JIT-Stream-Processor sends it)
+            if not STREAM_SIDE_EFFECTS:
+                notify_transition(transition, request_item)
             
             return api_response(200, {
                 'message': 'Request denied',
                 'request_id': request_id,
-                'status': 'DENIED',
+                'status': DENIED,
                 'approver': approver_email,
                 'user_email': request_item.get('UserEmail'),
                 'account': request_item.get('AccountName'),
                 'permission_set': request_item.get('PermissionSet')
-            })
+            }, methods=ALLOWED_METHODS)
+        
+        elif STREAM_SIDE_EFFECTS:
+            logger.info("Request approved, provisioning from the stream")
+            
+            return api_response(202, {
+                'message': 'Request approved, access is being provisioned',
+                'request_id': request_id,
+                'status': PROVISIONING,
+                'approver': approver_email,
+                'user_email': request_item.get('UserEmail'),
+                'account': request_item.get('AccountName'),
+                'permission_set': request_item.get('PermissionSet'),
+                'note': 'The user will be notified by email when access is active.'
+            }, methods=ALLOWED_METHODS)
         
         else:  # APPROVE
             # Extract request details
@@ -120,11 +110,11 @@ Request ID: {request_id}
             expiration_timestamp = int(request_item.get('ExpirationTimestamp'))
             
             # Grant access
-            print(f"Granting access for request {request_id}")
+            logger.info("Granting access", user_id=user_id, account_id=account_id)
             
             try:
                 # Create account assignment in Identity Center
-                sso_response = sso_admin.create_account_assignment(
+                sso_response = get_client('sso-admin').create_account_assignment(
                     InstanceArn=INSTANCE_ARN,
                     TargetId=account_id,
                     TargetType='AWS_ACCOUNT',
@@ -134,161 +124,46 @@ Request ID: {request_id}
                 )
                 
                 assignment_status = sso_response['AccountAssignmentCreationStatus']['Status']
-                print(f"Account assignment initiated: {assignment_status}")
+                logger.info("Account assignment initiated", status=assignment_status)
                 
             except ClientError as e:
                 error_code = e.response['Error']['Code']
                 if error_code == 'ConflictException':
-                    print(f"Assignment already exists")
+                    logger.warning("Assignment already exists")
                 else:
+                    release_claim(request_item)
                     raise
-            
-            # Update DynamoDB record
-            table.update_item(
-                Key={'RequestId': request_id},
-                UpdateExpression='SET #status = :status, ApproverEmail = :approver, ApprovalTimestamp = :approval_ts, GrantedTimestamp = :granted_ts, ApprovalComments = :comments',
-                ExpressionAttributeNames={
-                    '#status': 'Status'
-                },
-                ExpressionAttributeValues={
-                    ':status': 'ACTIVE',
-                    ':approver': approver_email,
-                    ':approval_ts': current_timestamp,
-                    ':granted_ts': current_timestamp,
-                    ':comments': comments
-                }
-            )
+            except Exception:
+                release_claim(request_item)
+                raise
             
             # Schedule auto-revocation
-            schedule_revocation(request_id, user_id, account_id, permission_set_arn, expiration_timestamp)
+            schedule_revocation(request_id, user_id, account_id, permission_set_arn, expiration_timestamp, method='scheduler')
             
-            print(f"Request {request_id} approved by {approver_email}")
+            logger.info("Request approved")
 
             # Send approval email
-            email_subject = f"✓ JIT Access Request APPROVED"
-            email_body = f"""
-Your JIT access request has been APPROVED and access is now ACTIVE.
-
-Account: {request_item.get('AccountName')}
-Permission Set: {request_item.get('PermissionSet')}
-Approver: {approver_email}
-Comments: {comments}
-Expires: {datetime.fromtimestamp(expiration_timestamp).strftime('%Y-%m-%d %H:%M:%S UTC')}
-
-Your access will be automatically revoked at the expiration time.
-
-Request ID: {request_id}
-"""
-            send_user_notification(request_item.get('UserEmail'), email_subject, email_body)
+            notify_transition(transition, request_item)
             
             return api_response(200, {
                 'message': 'Request approved and access granted',
                 'request_id': request_id,
-                'status': 'ACTIVE',
+                'status': ACTIVE,
                 'approver': approver_email,
                 'user_email': request_item.get('UserEmail'),
                 'account': request_item.get('AccountName'),
                 'permission_set': request_item.get('PermissionSet'),
                 'expires_at': datetime.fromtimestamp(expiration_timestamp).isoformat()
-            })
+            }, methods=ALLOWED_METHODS)
     
     except Exception as e:
-        print(f"Error processing approval: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return api_response(500, {'error': f'Internal error: {str(e)}'})
+        logger.exception("Error processing approval", error=str(e))
+        return api_response(500, {'error': f'Internal error: {str(e)}'}, methods=ALLOWED_METHODS)
 
-def send_user_notification(user_email, subject, message):
-    """Send email notification to user via SES"""
-    try:
-        ses = boto3.client('ses', region_name=REGION)
-        
-        ses.send_email(
-            Source='felixayo85@gmail.com',  # Must be a verified email in SES
-            Destination={
-                'ToAddresses': [user_email]
-            },
-            Message={
-                'Subject': {
-                    'Data': subject,
-                    'Charset': 'UTF-8'
-                },
-                'Body': {
-                    'Text': {
-                        'Data': message,
-                        'Charset': 'UTF-8'
-                    }
-                }
-            }
-        )
-        
-        print(f"✓ Email sent to {user_email}: {subject}")
-        
-    except Exception as e:
-        print(f"⚠ Error sending email: {str(e)}")       
 
-
-def api_response(status_code, body):
-    """Helper function to return API Gateway formatted response"""
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'POST,OPTIONS'
-        },
-        'body': json.dumps(body)
-    }
-
-
-def schedule_revocation(request_id, user_id, account_id, permission_set_arn, expiration_timestamp):
-    """Schedule automatic revocation using EventBridge Scheduler"""
+def release_claim(request_item):
+    """Put an approved request back to PENDING when access could not be granted, so it can be retried"""
     try:
-        schedule_name = f"revoke-{request_id}"
-        schedule_time = datetime.fromtimestamp(expiration_timestamp)
-        
-        # Create EventBridge schedule to invoke revocation Lambda
-        scheduler.create_schedule(
-            Name=schedule_name,
-            GroupName='default',
-            ScheduleExpression=f"at({schedule_time.strftime('%Y-%m-%dT%H:%M:%S')})",
-            ScheduleExpressionTimezone='UTC',
-            FlexibleTimeWindow={'Mode': 'OFF'},
-            Target={
-                'Arn': f'arn:aws:lambda:{REGION}:533267321107:function:JIT-Revoke-Access',
-                'RoleArn': f'arn:aws:iam::533267321107:role/JIT-Automation-Role',
-                'Input': json.dumps({
-                    'request_id': request_id,
-                    'user_id': user_id,
-                    'account_id': account_id,
-                    'permission_set_arn': permission_set_arn
-                })
-            },
-            State='ENABLED'
-        )
-        
-        print(f"Revocation scheduled: {schedule_name} at {schedule_time}")
-        
-        # Update DynamoDB with schedule ARN
-        table.update_item(
-            Key={'RequestId': request_id},
-            UpdateExpression='SET RevocationScheduleArn = :arn',
-            ExpressionAttributeValues={
-                ':arn': f'arn:aws:scheduler:{REGION}:533267321107:schedule/default/{schedule_name}'
-            }
-        )
-        
+        transition_request(request_item['RequestId'], 'reopen', version=request_item['Version'])
     except Exception as e:
-        print(f"Error scheduling revocation: {str(e)}")
-        # Non-fatal - access can still be manually revoked
-
-
-def error_response(message):
-    """Return standardized error response"""
-    return {
-        'statusCode': 400,
-        'body': json.dumps({
-            'error': message
-        })
-    }
+        logger.exception("Error returning request to PENDING", error=str(e))
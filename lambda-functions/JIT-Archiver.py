@@ -0,0 +1,177 @@
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from jit_core import expand_item, get_logger, get_table, load_config, traced, write_partition
+from jit_core.lifecycle import DENIED, ERROR, FAILED, REVOKED
+from jit_core.schema import change_day
+
+logger = get_logger('JIT-Archiver')
+
+# Environment variables
+config = load_config()
+
+STATUS_INDEX = 'Status-RequestTimestamp-index'
+
+# Requests in these states never change again and are archived once old enough
+CLOSED_STATES = (DENIED, REVOKED, FAILED, ERROR)
+
+# Closed requests made more than this many days ago are moved to ARCHIVE_BUCKET
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 90))
+# Archived items stay in the table this long before DynamoDB TTL deletes them
+ARCHIVE_EXPIRY_SECONDS = int(os.environ.get('ARCHIVE_EXPIRY_SECONDS', 86400))
+# Requests archived per run (the next run continues) and per object batch
+ARCHIVE_MAX_ITEMS = int(os.environ.get('ARCHIVE_MAX_ITEMS', 5000))
+ARCHIVE_PAGE_SIZE = int(os.environ.get('ARCHIVE_PAGE_SIZE', 1000))
+ARCHIVE_MAX_WORKERS = int(os.environ.get('ARCHIVE_MAX_WORKERS', 10))
+
+@traced
+def lambda_handler(event, context):
+    """
+    Move closed requests older than ARCHIVE_AFTER_DAYS from the requests table to S3
+    Triggered on a schedule, or directly with {"older_than_days": N}
+
+    Each page of closed requests is written as compressed day/account
+    partitions (see jit_core.archive), then every archived item gets an
+    ExpiresAt for the table's TTL to delete it. Items are only stamped once
+    their object is written, so an interrupted run loses nothing.
+    """
+
+    if not config.archive_bucket:
+        logger.error("ARCHIVE_BUCKET is not set, nothing to archive to")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': 'Archive failed: ARCHIVE_BUCKET is not set'
+            })
+        }
+
+    started = time.time()
+    older_than_days = int(event.get('older_than_days', ARCHIVE_AFTER_DAYS))
+    cutoff = int(started) - older_than_days * 86400
+    run = time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(started)) + '-' + uuid.uuid4().hex[:8]
+
+    try:
+        summary = {'ARCHIVED': 0, 'SKIPPED': 0, 'FAILED': 0}
+        processed = objects = pages = 0
+        remaining = False
+
+        with ThreadPoolExecutor(max_workers=ARCHIVE_MAX_WORKERS) as executor:
+            for status in CLOSED_STATES:
+                query_args = {
+                    'IndexName': STATUS_INDEX,
+                    'KeyConditionExpression': Key('Status').eq(status) & Key('RequestTimestamp').lt(cutoff),
+                    'FilterExpression': Attr('ArchivedAt').not_exists()
+                }
+                while True:
+                    if processed >= ARCHIVE_MAX_ITEMS:
+                        remaining = True
+                        break
+                    query_args['Limit'] = min(ARCHIVE_PAGE_SIZE, ARCHIVE_MAX_ITEMS - processed)
+                    response = get_table().query(**query_args)
+
+                    # Archive each page before fetching the next one
+                    items = [expand_item(item) for item in response.get('Items', [])]
+                    if items:
+                        objects += archive_page(executor, items, f'{run}-{pages:05d}', summary)
+                        pages += 1
+                    processed += len(items)
+
+                    if not response.get('LastEvaluatedKey'):
+                        break
+                    query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        logger.info("Archive complete", cutoff=cutoff, objects=objects, archived=summary['ARCHIVED'],
+                    skipped=summary['SKIPPED'], failed=summary['FAILED'], remaining=remaining)
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Archive complete',
+                'run': run,
+                'cutoff': cutoff,
+                'objects': objects,
+                'archived': summary['ARCHIVED'],
+                'skipped': summary['SKIPPED'],
+                'failed': summary['FAILED'],
+                # More closed requests are waiting (ARCHIVE_MAX_ITEMS reached); the next run continues
+                'remaining': remaining,
+                'duration_seconds': round(time.time() - started, 2)
+            })
+        }
+
+    except Exception as e:
+        logger.exception("Error archiving requests", error=str(e))
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': f'Archive failed: {str(e)}'
+            })
+        }
+
+
+def archive_page(executor, items, name, summary):
+    """
+    Write one page of closed requests to their partitions, then stamp the ones
+    written for expiry. Returns the number of objects written.
+    """
+    partitions = {}
+    for item in items:
+        partitions.setdefault((change_day(item['RequestTimestamp']), item['AccountName']), []).append(item)
+
+    def write(partition):
+        (day, account_name), partition_items = partition
+        try:
+            return write_partition(day, account_name, partition_items, name)
+        except Exception as e:
+            logger.error("Error writing archive object", day=day, account=account_name, error=str(e))
+            return None
+
+    stamps = []
+    for (_, partition_items), key in zip(partitions.items(), executor.map(write, partitions.items())):
+        if key is None:
+            # Left unstamped: the next run archives them again
+            summary['FAILED'] += len(partition_items)
+        else:
+            stamps.extend((item, key) for item in partition_items)
+
+    expires_at = int(time.time()) + ARCHIVE_EXPIRY_SECONDS
+    for status in executor.map(lambda stamp: mark_archived(stamp[0], stamp[1], expires_at), stamps):
+        summary[status] += 1
+
+    return len({key for _, key in stamps})
+
+
+def mark_archived(request_item, archive_key, expires_at):
+    """
+    Stamp an archived request for deletion by TTL, returning ARCHIVED, SKIPPED or FAILED
+    Conditional on the status it was archived with. This is not a change of the
+    request, so the change stamp (UpdatedTimestamp) is left alone.
+    """
+    request_id = request_item['RequestId']
+
+    try:
+        get_table().update_item(
+            Key={'RequestId': request_id},
+            UpdateExpression='SET ArchivedAt = :now, ArchiveKey = :key, ExpiresAt = :expires',
+            ConditionExpression='#status = :status',
+            ExpressionAttributeNames={'#status': 'Status'},
+            ExpressionAttributeValues={
+                ':now': int(time.time()),
+                ':key': archive_key,
+                ':expires': expires_at,
+                ':status': request_item['Status']
+            }
+        )
+        return 'ARCHIVED'
+
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            # Changed since it was read; the archived copy is superseded when it is archived again
+            logger.info("Request changed while archiving, skipping", request_id=request_id)
+            return 'SKIPPED'
+        logger.error("Error marking request archived", request_id=request_id, error=str(e))
+        return 'FAILED'
@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+from jit_core import (
+    TransitionConflict, delete_assignment, delete_revocation_schedule, expand_item, get_client, get_logger,
+    get_table, load_config, traced, transition_many
+)
+from jit_core.lifecycle import ACTIVE, PENDING, PROVISIONING
+
+logger = get_logger('JIT-Drift-Reconciler')
+
+# Environment variables
+config = load_config()
+INSTANCE_ARN = config.instance_arn
+
+# JIT permission sets - only assignments of these are reconciled
+JIT_PERMISSION_SET_ARNS = [permission_set['arn'] for permission_set in config.permission_sets.values()]
+
+STATUS_INDEX = 'Status-RequestTimestamp-index'
+RECONCILER_MAX_WORKERS = int(os.environ.get('RECONCILER_MAX_WORKERS', 8))
+# Records granted more recently than this are not reported as missing (assignment may still be propagating),
+# and PENDING records made more recently than this protect their assignment (it may be being created)
+RECONCILER_GRACE_SECONDS = int(os.environ.get('RECONCILER_GRACE_SECONDS', 300))
+# Maximum number of drift entries listed in the report
+RECONCILER_REPORT_LIMIT = int(os.environ.get('RECONCILER_REPORT_LIMIT', 100))
+
+@traced
+def lambda_handler(event, context):
+    """
+    Compare DynamoDB grant state with actual Identity Center assignments
+    Triggered on a schedule (report only) or directly with {"repair": true}
+
+    - orphaned: a JIT permission set is assigned to a user but no ACTIVE/PROVISIONING
+      record (or PENDING record younger than RECONCILER_GRACE_SECONDS) exists
+      -> repair deletes the assignment
+    - missing: an ACTIVE record has no matching assignment -> repair marks the
+      record REVOKED with RevocationType RECONCILED and deletes its revocation
+      schedule (records that changed status meanwhile are skipped)
+    """
+
+    repair = event.get('repair') is True
+    started = time.time()
+
+    try:
+        # Actual assignments, listed concurrently per account x permission set
+        targets = list_assignment_targets()
+        with ThreadPoolExecutor(max_workers=RECONCILER_MAX_WORKERS) as executor:
+            assignment_sets = list(executor.map(lambda target: list_user_assignments(*target), targets))
+        actual = set().union(*assignment_sets)
+
+        # Recorded grants; a low-risk request is granted while its record is still
+        # PENDING (JIT-Request-Handler polls the assignment before marking it ACTIVE)
+        grace_cutoff = int(time.time()) - RECONCILER_GRACE_SECONDS
+        active_items = query_status(ACTIVE)
+        provisioning_items = query_status(PROVISIONING)
+        recent_items = query_status(PENDING, since=grace_cutoff)
+
+        expected = {grant_key(item) for item in active_items}
+        known = expected | {grant_key(item) for item in provisioning_items + recent_items}
+
+        settled = {
+            grant_key(item): item for item in active_items
+            if int(item.get('GrantedTimestamp', 0)) <= grace_cutoff
+        }
+
+        orphaned = actual - known
+        missing = set(settled) - actual
+
+        logger.info(
+            "Reconciled assignments", pairs=len(targets), assignments=len(actual),
+            active_records=len(expected), orphaned=len(orphaned), missing=len(missing)
+        )
+
+        repaired = {'orphaned': 0, 'missing': 0, 'skipped': 0, 'errors': 0}
+        if repair:
+            with ThreadPoolExecutor(max_workers=RECONCILER_MAX_WORKERS) as executor:
+                for ok in executor.map(delete_orphaned_assignment, orphaned):
+                    repaired['orphaned' if ok else 'errors'] += 1
+
+            # Mark ACTIVE records whose assignment no longer exists as REVOKED; a
+            # record revoked by someone else in the meantime needs no repair
+            missing_items = [settled[key] for key in missing]
+            for result in transition_many('reconcile', missing_items, max_workers=RECONCILER_MAX_WORKERS):
+                if isinstance(result, TransitionConflict):
+                    repaired['skipped'] += 1
+                elif isinstance(result, Exception):
+                    repaired['errors'] += 1
+                else:
+                    delete_revocation_schedule(result.get('RevocationScheduleArn'))
+                    repaired['missing'] += 1
+
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Reconciliation complete',
+                'mode': 'repair' if repair else 'report',
+                'targets': len(targets),
+                'assignments': len(actual),
+                'active_records': len(expected),
+                'orphaned_count': len(orphaned),
+                'missing_count': len(missing),
+                'orphaned': [describe_key(key) for key in sorted(orphaned)[:RECONCILER_REPORT_LIMIT]],
+                'missing': [
+                    dict(describe_key(key), request_id=settled[key]['RequestId'])
+                    for key in sorted(missing)[:RECONCILER_REPORT_LIMIT]
+                ],
+                'repaired': repaired,
+                'duration_seconds': round(time.time() - started, 2)
+            })
+        }
+
+    except Exception as e:
+        logger.exception("Error reconciling assignments", error=str(e))
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': f'Reconciliation failed: {str(e)}'
+            })
+        }
+
+
+def list_assignment_targets():
+    """Return (account_id, permission_set_arn) for every account each JIT permission set is provisioned to"""
+    targets = []
+    paginator = get_client('sso-admin').get_paginator('list_accounts_for_provisioned_permission_set')
+
+    for permission_set_arn in JIT_PERMISSION_SET_ARNS:
+        for page in paginator.paginate(InstanceArn=INSTANCE_ARN, PermissionSetArn=permission_set_arn):
+            for account_id in page.get('AccountIds', []):
+                targets.append((account_id, permission_set_arn))
+
+    return targets
+
+
+def list_user_assignments(account_id, permission_set_arn):
+    """Return the set of (account_id, permission_set_arn, user_id) assigned in Identity Center"""
+    assignments = set()
+    paginator = get_client('sso-admin').get_paginator('list_account_assignments')
+
+    for page in paginator.paginate(InstanceArn=INSTANCE_ARN, AccountId=account_id, PermissionSetArn=permission_set_arn):
+        for assignment in page.get('AccountAssignments', []):
+            if assignment.get('PrincipalType') == 'USER':
+                assignments.add((account_id, permission_set_arn, assignment['PrincipalId']))
+
+    return assignments
+
+
+def query_status(status, since=None):
+    """Return every request with the given status (made since the given time) via the Status index"""
+    items = []
+    key_condition = Key('Status').eq(status)
+    if since is not None:
+        key_condition &= Key('RequestTimestamp').gte(since)
+    query_args = {
+        'IndexName': STATUS_INDEX,
+        'KeyConditionExpression': key_condition
+    }
+
+    while True:
+        response = get_table().query(**query_args)
+        items.extend(map(expand_item, response.get('Items', [])))
+        if not response.get('LastEvaluatedKey'):
+            return items
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def grant_key(item):
+    """Key a request record the same way as an Identity Center assignment"""
+    return (item.get('AccountId'), item.get('PermissionSetArn'), item.get('UserId'))
+
+
+def describe_key(key):
+    """Turn a grant key into a report entry"""
+    account_id, permission_set_arn, user_id = key
+    return {
+        'account_id': account_id,
+        'permission_set_arn': permission_set_arn,
+        'user_id': user_id
+    }
+
+
+def delete_orphaned_assignment(key):
+    """Delete an assignment that has no ACTIVE record (runs in a worker thread)"""
+    account_id, permission_set_arn, user_id = key
+
+    try:
+        delete_assignment({'AccountId': account_id, 'PermissionSetArn': permission_set_arn, 'UserId': user_id})
+        logger.info("Deleted orphaned assignment", user_id=user_id, account_id=account_id)
+        return True
+
+    except ClientError as e:
+        logger.error("Error deleting orphaned assignment", user_id=user_id, account_id=account_id, error=str(e))
+        return False
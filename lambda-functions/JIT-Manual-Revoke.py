@@ -1,22 +1,25 @@
 import json
-import boto3
 import os
-import time
-from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
+from jit_core import (
+    TransitionConflict, api_response, bind, delete_assignment, delete_revocation_schedule, get_logger, get_table,
+    notify_transition, traced, transition_many, transition_request
+)
+from jit_core.lifecycle import ACTIVE, PROVISIONING
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-sso_admin = boto3.client('sso-admin')
-scheduler = boto3.client('scheduler')
-events = boto3.client('events')
+logger = get_logger('JIT-Manual-Revoke')
 
-# Environment variables
-TABLE_NAME = os.environ['DYNAMODB_TABLE']
-INSTANCE_ARN = os.environ['IDENTITY_CENTER_INSTANCE_ARN']
-REGION = os.environ['REGION']
+# CORS methods of the POST-only /revoke resource
+ALLOWED_METHODS = 'POST,OPTIONS'
 
-table = dynamodb.Table(TABLE_NAME)
+# Bulk revocation ("kill switch")
+STATUS_INDEX = 'Status-RequestTimestamp-index'
+BULK_REVOKE_MAX_WORKERS = int(os.environ.get('BULK_REVOKE_MAX_WORKERS', 10))
+# The transition that claims each kind of grant; grants still provisioning are cancelled
+BULK_TRANSITIONS = {ACTIVE: 'bulk_revoke', PROVISIONING: 'bulk_cancel'}
 
+@traced
 def lambda_handler(event, context):
     """
     Manually revoke JIT access before expiration
@@ -29,105 +32,45 @@ def lambda_handler(event, context):
             request_id = body.get('request_id')
             revoker_email = body.get('revoker_email')
         else:
+            body = event
             request_id = event.get('request_id')
             revoker_email = event.get('revoker_email', 'Manual')
         
-        print(f"Manual revocation triggered for request: {request_id}")
+        # Bulk mode: revoke every ACTIVE (or PROVISIONING) grant for a user, an account, or everyone
+        if body.get('bulk'):
+            return bulk_revoke(body, revoker_email or 'Manual')
         
-        if not request_id:
-            return api_response(400, {'error': 'Missing request_id'})
-        
-        # Get request details from DynamoDB
-        response = table.get_item(Key={'RequestId': request_id})
-        
-        if 'Item' not in response:
-            return api_response(404, {'error': f'Request {request_id} not found'})
+        bind(request_id=request_id, revoker=revoker_email)
+        logger.info("Manual revocation triggered")
         
-        request_item = response['Item']
-        current_status = request_item.get('Status')
-        
-        # Only revoke if access is currently active
-        if current_status != 'ACTIVE':
-            return api_response(400, {'error': f'Cannot revoke. Current status: {current_status}'})
+        if not request_id:
+            return api_response(400, {'error': 'Missing request_id'}, methods=ALLOWED_METHODS)
         
-        user_id = request_item.get('UserId')
-        account_id = request_item.get('AccountId')
-        permission_set_arn = request_item.get('PermissionSetArn')
+        # Only revoke if access is currently active; the conditional write
+        # returns the grant, and loses cleanly to the scheduled revocation
+        try:
+            request_item = transition_request(request_id, 'revoke', {'RevokedBy': revoker_email})
+        except TransitionConflict as e:
+            if e.current is None:
+                return api_response(404, {'error': f'Request {request_id} not found'}, methods=ALLOWED_METHODS)
+            return api_response(400, {'error': f'Cannot revoke. Current status: {e.current_status}'}, methods=ALLOWED_METHODS)
         
         # Delete account assignment in Identity Center
-        print(f"Revoking access for user {user_id} on account {account_id}")
+        logger.info("Revoking access", user_id=request_item.get('UserId'), account_id=request_item.get('AccountId'))
         
         try:
-            sso_response = sso_admin.delete_account_assignment(
-                InstanceArn=INSTANCE_ARN,
-                TargetId=account_id,
-                TargetType='AWS_ACCOUNT',
-                PermissionSetArn=permission_set_arn,
-                PrincipalType='USER',
-                PrincipalId=user_id
-            )
-            
-            deletion_status = sso_response['AccountAssignmentDeletionStatus']['Status']
-            print(f"Account assignment deletion initiated: {deletion_status}")
-            
-        except ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code == 'ResourceNotFoundException':
-                print(f"Assignment already deleted")
-            else:
-                raise
-        
-        # Update DynamoDB record
-        current_timestamp = int(time.time())
-        table.update_item(
-            Key={'RequestId': request_id},
-            UpdateExpression='SET #status = :status, RevokedTimestamp = :revoked, RevokedBy = :revoker, RevocationType = :type',
-            ExpressionAttributeNames={
-                '#status': 'Status'
-            },
-            ExpressionAttributeValues={
-                ':status': 'REVOKED',
-                ':revoked': current_timestamp,
-                ':revoker': revoker_email,
-                ':type': 'MANUAL'
-            }
-        )
+            deletion_status = delete_assignment(request_item)
+        except Exception:
+            restore_grant(request_item)
+            raise
+        if deletion_status:
+            logger.info("Account assignment deletion initiated", status=deletion_status)
         
         # Send revocation email
-        email_subject = f"⏱ JIT Access REVOKED (Manual)"
-        email_body = f"""
-Your JIT access has been MANUALLY REVOKED.
-
-Account: {request_item.get('AccountName')}
-Permission Set: {request_item.get('PermissionSet')}
-Revoked by: {revoker_email}
-
-If you still need access, please submit a new request through the JIT Access Portal.
-
-Request ID: {request_id}
-"""
-        send_user_notification(request_item.get('UserEmail'), email_subject, email_body)
+        notify_transition('revoke', request_item)
         
         # Cancel the automatic revocation schedule
-        schedule_arn = request_item.get('RevocationScheduleArn')
-        if schedule_arn:
-            try:
-                if 'scheduler' in schedule_arn:
-                    # EventBridge Scheduler
-                    schedule_name = schedule_arn.split('/')[-1]
-                    scheduler.delete_schedule(
-                        Name=schedule_name,
-                        GroupName='default'
-                    )
-                    print(f"Deleted scheduler: {schedule_name}")
-                elif 'rule' in schedule_arn:
-                    # EventBridge Rule
-                    rule_name = schedule_arn.split('/')[-1]
-                    events.remove_targets(Rule=rule_name, Ids=['1'])
-                    events.delete_rule(Name=rule_name)
-                    print(f"Deleted rule: {rule_name}")
-            except Exception as e:
-                print(f"Error deleting schedule: {str(e)}")
+        delete_revocation_schedule(request_item.get('RevocationScheduleArn'))
         
         return api_response(200, {
             'message': 'Access successfully revoked',
@@ -136,54 +79,131 @@ Request ID: {request_id}
             'account': request_item.get('AccountName'),
             'permission_set': request_item.get('PermissionSet'),
             'revoked_by': revoker_email
-        })
+        }, methods=ALLOWED_METHODS)
         
     except Exception as e:
-        print(f"Error revoking access: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return api_response(500, {'error': f'Internal error: {str(e)}'})
+        logger.exception("Error revoking access", error=str(e))
+        return api_response(500, {'error': f'Internal error: {str(e)}'}, methods=ALLOWED_METHODS)
+
+
+def bulk_revoke(filters, revoker_email):
+    """
+    Revoke every ACTIVE grant matching the filters (user_email, account_id, account_name)
+    and cancel the PROVISIONING ones. Revoking everything requires confirm_all=true
+    """
+    filter_expression = None
+    for field, attribute in [('user_email', 'UserEmail'), ('account_id', 'AccountId'), ('account_name', 'AccountName')]:
+        if filters.get(field):
+            # Requests carry the portal's (lowercase) Cognito email, whatever case the revoker typed
+            value = filters[field].lower() if field == 'user_email' else filters[field]
+            condition = Attr(attribute).eq(value)
+            filter_expression = condition if filter_expression is None else filter_expression & condition
+    
+    if filter_expression is None and filters.get('confirm_all') is not True:
+        return api_response(400, {'error': 'Bulk revocation needs user_email, account_id or account_name (or confirm_all=true to revoke everything)'}, methods=ALLOWED_METHODS)
+    
+    # Find ACTIVE and PROVISIONING grants through the Status index
+    matched = {}
+    for status in BULK_TRANSITIONS:
+        query_args = {
+            'IndexName': STATUS_INDEX,
+            'KeyConditionExpression': Key('Status').eq(status)
+        }
+        if filter_expression is not None:
+            query_args['FilterExpression'] = filter_expression
+        
+        matched[status] = []
+        while True:
+            response = get_table().query(**query_args)
+            matched[status].extend(response.get('Items', []))
+            if not response.get('LastEvaluatedKey'):
+                break
+            query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    logger.info("Bulk revocation started", revoker=revoker_email, active=len(matched[ACTIVE]),
+                provisioning=len(matched[PROVISIONING]))
+    
+    # Claim every grant first (one conditional write each); grants the scheduled
+    # revocation (or provisioning) got to in the meantime are skipped
+    results = []
+    claimed = []
+    for status, items in matched.items():
+        claims = transition_many(BULK_TRANSITIONS[status], items, {'RevokedBy': revoker_email},
+                                 max_workers=BULK_REVOKE_MAX_WORKERS)
+        for request_item, claim in zip(items, claims):
+            if isinstance(claim, TransitionConflict):
+                results.append(dict(grant_result(request_item), status='SKIPPED'))
+            elif isinstance(claim, Exception):
+                results.append(dict(grant_result(request_item), status='FAILED', error=str(claim)))
+            else:
+                claimed.append((claim, status))
+    
+    if claimed:
+        with ThreadPoolExecutor(max_workers=min(BULK_REVOKE_MAX_WORKERS, len(claimed))) as executor:
+            results.extend(executor.map(lambda claim: revoke_grant(*claim), claimed))
+    
+    summary = {status: sum(1 for result in results if result['status'] == status)
+               for status in ['REVOKED', 'CANCELLED', 'SKIPPED', 'FAILED']}
+    logger.info("Bulk revocation complete", **{status.lower(): count for status, count in summary.items()})
+    
+    return api_response(200, {
+        'message': 'Bulk revocation complete',
+        'revoked_by': revoker_email,
+        'matched': sum(len(items) for items in matched.values()),
+        'revoked': summary['REVOKED'],
+        'cancelled': summary['CANCELLED'],
+        'skipped': summary['SKIPPED'],
+        'failed': summary['FAILED'],
+        'results': results
+    }, methods=ALLOWED_METHODS)
 
 
-def send_user_notification(user_email, subject, message):
-    """Send email notification to user via SES"""
+def revoke_grant(request_item, claimed_status=ACTIVE):
+    """
+    Delete the assignment of a grant bulk mode has marked REVOKED and report the outcome
+    On failure an ACTIVE grant goes back to ACTIVE. A cancelled PROVISIONING grant
+    stays REVOKED: its assignment may not exist yet, and the function that
+    finishes provisioning deletes it when the provisioned transition loses.
+    """
+    request_id = request_item['RequestId']
+    result = grant_result(request_item)
+    cancelled = claimed_status == PROVISIONING
+    
     try:
-        ses = boto3.client('ses', region_name=REGION)
-        
-        ses.send_email(
-            Source='felixayo85@gmail.com',
-            Destination={
-                'ToAddresses': [user_email]
-            },
-            Message={
-                'Subject': {
-                    'Data': subject,
-                    'Charset': 'UTF-8'
-                },
-                'Body': {
-                    'Text': {
-                        'Data': message,
-                        'Charset': 'UTF-8'
-                    }
-                }
-            }
-        )
-        
-        print(f"✓ Email sent to {user_email}: {subject}")
-        
+        delete_assignment(request_item)
     except Exception as e:
-        print(f"⚠ Error sending email: {str(e)}")
+        if cancelled:
+            logger.warning("Assignment of cancelled grant not deleted yet, left to provisioning",
+                           request_id=request_id, error=str(e))
+        else:
+            logger.error("Bulk revocation of grant failed", request_id=request_id, error=str(e))
+            restore_grant(request_item)
+            result['status'] = 'FAILED'
+            result['error'] = str(e)
+            return result
+    
+    try:
+        notify_transition(BULK_TRANSITIONS[claimed_status], request_item)
+        delete_revocation_schedule(request_item.get('RevocationScheduleArn'))
+    except Exception as e:
+        logger.warning("Error notifying about revoked grant", request_id=request_id, error=str(e))
+    
+    result['status'] = 'CANCELLED' if cancelled else 'REVOKED'
+    return result
 
 
-def api_response(status_code, body):
-    """Helper function to return API Gateway formatted response"""
+def grant_result(request_item):
     return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'POST,OPTIONS'
-        },
-        'body': json.dumps(body)
+        'request_id': request_item['RequestId'],
+        'user_email': request_item.get('UserEmail'),
+        'account': request_item.get('AccountName'),
+        'permission_set': request_item.get('PermissionSet')
     }
+
+
+def restore_grant(request_item):
+    """Put a grant back to ACTIVE when the assignment could not be deleted, so the revoke can be retried"""
+    try:
+        transition_request(request_item['RequestId'], 'restore', version=request_item['Version'])
+    except Exception as e:
+        logger.exception("Error restoring grant to ACTIVE", error=str(e))
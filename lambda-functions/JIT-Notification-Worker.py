@@ -0,0 +1,133 @@
+import json
+import os
+from botocore.exceptions import ClientError
+from jit_core import (
+    bind, deliver_notification, get_cache, get_client, get_logger, load_config, render_digest, traced
+)
+from jit_core.tracing import THROTTLING_CODES
+
+logger = get_logger('JIT-Notification-Worker')
+
+# Environment variables
+config = load_config()
+NOTIFICATION_QUEUE_URL = config.notification_queue_url
+
+# Backoff applied to the remaining messages when SES/SNS throttles (SQS visibility caps at 12 hours)
+NOTIFICATION_BASE_DELAY_SECONDS = int(os.environ.get('NOTIFICATION_BASE_DELAY_SECONDS', 5))
+NOTIFICATION_MAX_DELAY_SECONDS = min(int(os.environ.get('NOTIFICATION_MAX_DELAY_SECONDS', 300)), 43200)
+
+# Fields every queued notification carries (see jit_core.notifications)
+REQUIRED_FIELDS = ('kind', 'dedupe_key')
+
+# Dedupe keys already delivered by this container (SQS standard queues deliver at least once)
+delivered_cache = get_cache('notifications', maxsize=4096, ttl_seconds=3600)
+
+@traced
+def lambda_handler(event, context):
+    """
+    Deliver notifications queued by the other JIT functions (the outbox)
+    Triggered by SQS with ReportBatchItemFailures enabled. Duplicates of the same
+    request/status are sent once and several emails to one user in a batch are
+    combined into one. When SES/SNS throttles, the rest of the batch is returned
+    to the queue with an exponentially growing visibility timeout.
+    """
+
+    records = event.get('Records', [])
+    failures = []
+    groups = {}
+
+    for record in records:
+        try:
+            notification = json.loads(record['body'])
+            if not isinstance(notification, dict):
+                raise ValueError('notification is not a JSON object')
+            missing = [field for field in REQUIRED_FIELDS if not notification.get(field)]
+            if missing:
+                raise ValueError(f"notification has no {', '.join(missing)}")
+        except (KeyError, ValueError) as e:
+            # Redelivery cannot fix it; only this record is dropped, the rest of the batch is delivered
+            logger.error("Dropping malformed notification", message_id=record.get('messageId'), error=str(e))
+            continue
+
+        if delivered_cache.get(notification['dedupe_key']):
+            logger.info("Notification already delivered, skipping", dedupe_key=notification['dedupe_key'])
+            continue
+
+        target = notification.get('to') or notification.get('topic_arn')
+        group = groups.setdefault((notification['kind'], target), {'records': [], 'notifications': {}})
+        group['records'].append(record)
+        # Later duplicates of a key replace earlier ones; both messages are acknowledged together
+        group['notifications'][notification['dedupe_key']] = notification
+
+    throttled = False
+    for (kind, target), group in groups.items():
+        if throttled:
+            failures.extend(group['records'])
+            continue
+
+        bind(to=target)
+        try:
+            deliver_group(kind, list(group['notifications'].values()))
+        except ClientError as e:
+            if e.response['Error']['Code'] in THROTTLING_CODES:
+                logger.warning("Throttled, returning remaining notifications to the queue", error=str(e))
+                throttled = True
+            else:
+                logger.exception("Error delivering notification", error=str(e))
+            failures.extend(group['records'])
+            continue
+        except Exception as e:
+            logger.exception("Error delivering notification", error=str(e))
+            failures.extend(group['records'])
+
+    if throttled:
+        back_off(failures)
+
+    logger.info("Notification batch processed", messages=len(records), failed=len(failures))
+    return {'batchItemFailures': [{'itemIdentifier': record['messageId']} for record in failures]}
+
+
+def deliver_group(kind, notifications):
+    """Send one recipient's notifications, as a single digest email when there are several"""
+    if kind == 'email' and len(notifications) > 1:
+        deliver_notification(digest(notifications))
+        for notification in notifications:
+            delivered_cache.set(notification['dedupe_key'], True)
+    else:
+        for notification in notifications:
+            deliver_notification(notification)
+            # Marked one by one so a retry after a partial failure skips what was sent
+            delivered_cache.set(notification['dedupe_key'], True)
+
+    logger.info("Notifications delivered", count=len(notifications))
+
+
+def digest(notifications):
+    """Combine several emails to the same user into one"""
+    rendered = render_digest(notifications)
+    return {
+        'kind': 'email',
+        'to': notifications[0]['to'],
+        'subject': rendered.subject,
+        'body': rendered.text,
+        'html': rendered.html
+    }
+
+
+def back_off(records):
+    """Delay redelivery of throttled messages based on how often they have been received"""
+    if not NOTIFICATION_QUEUE_URL:
+        return
+
+    sqs = get_client('sqs')
+    for record in records:
+        receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+        delay = min(NOTIFICATION_BASE_DELAY_SECONDS * (2 ** (receive_count - 1)), NOTIFICATION_MAX_DELAY_SECONDS)
+        try:
+            sqs.change_message_visibility(
+                QueueUrl=NOTIFICATION_QUEUE_URL,
+                ReceiptHandle=record['receiptHandle'],
+                VisibilityTimeout=delay
+            )
+        except Exception as e:
+            logger.warning("Error delaying message", message_id=record['messageId'], error=str(e))
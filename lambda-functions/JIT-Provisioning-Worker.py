@@ -0,0 +1,175 @@
+import json
+import os
+from botocore.exceptions import ClientError
+from jit_core import (
+    TransitionConflict, bind, get_client, get_logger, load_config, notify_transition,
+    schedule_revocation, traced, transition_request
+)
+from jit_core.lifecycle import REVOKED
+
+logger = get_logger('JIT-Provisioning-Worker')
+
+# Environment variables
+config = load_config()
+INSTANCE_ARN = config.instance_arn
+PROVISIONING_QUEUE_URL = os.environ['PROVISIONING_QUEUE_URL']
+
+# SIDE_EFFECT_MODE=stream: JIT-Stream-Processor schedules and notifies when it sees the status change
+STREAM_SIDE_EFFECTS = config.side_effect_mode == 'stream'
+
+# Exponential backoff between status checks (SQS DelaySeconds caps at 900)
+PROVISIONING_BASE_DELAY_SECONDS = int(os.environ.get('PROVISIONING_BASE_DELAY_SECONDS', 2))
+PROVISIONING_MAX_DELAY_SECONDS = min(int(os.environ.get('PROVISIONING_MAX_DELAY_SECONDS', 300)), 900)
+PROVISIONING_MAX_ATTEMPTS = int(os.environ.get('PROVISIONING_MAX_ATTEMPTS', 10))
+
+@traced
+def lambda_handler(event, context):
+    """
+    Finalize low-risk grants started by JIT-Request-Handler
+    Triggered by SQS with ReportBatchItemFailures enabled. Each message is one
+    status check; IN_PROGRESS assignments are re-queued with exponential backoff.
+    """
+
+    failures = []
+
+    for record in event.get('Records', []):
+        try:
+            process_message(json.loads(record['body']))
+        except Exception as e:
+            logger.exception("Error processing message", message_id=record.get('messageId'), error=str(e))
+            failures.append({'itemIdentifier': record['messageId']})
+
+    return {'batchItemFailures': failures}
+
+
+def process_message(message):
+    """Check one assignment and finalize, fail or re-queue the request"""
+    request_id = message['request_id']
+    attempt = message.get('attempt', 0)
+    assignment_request_id = message.get('assignment_request_id')
+    bind(request_id=request_id, user=message.get('user_email'))
+
+    if not assignment_request_id:
+        # Assignment already existed when the request was made
+        finalize_active(message)
+        return
+
+    status_response = get_client('sso-admin').describe_account_assignment_creation_status(
+        InstanceArn=INSTANCE_ARN,
+        AccountAssignmentCreationRequestId=assignment_request_id
+    )
+
+    status = status_response['AccountAssignmentCreationStatus']['Status']
+    logger.debug("Assignment status check", attempt=attempt + 1, max_attempts=PROVISIONING_MAX_ATTEMPTS, status=status)
+
+    if status == 'SUCCEEDED':
+        finalize_active(message)
+    elif status == 'FAILED':
+        failure_reason = status_response['AccountAssignmentCreationStatus'].get('FailureReason', 'Unknown')
+        finalize_failed(message, f"Account assignment FAILED: {failure_reason}")
+    elif attempt + 1 >= PROVISIONING_MAX_ATTEMPTS:
+        # Giving up: withdraw the assignment first, or one that succeeds later would never be revoked
+        if withdraw_assignment(message):
+            finalize_failed(message, f"Account assignment still {status} after {PROVISIONING_MAX_ATTEMPTS} checks")
+        else:
+            requeue(message, attempt + 1)
+    else:
+        requeue(message, attempt + 1)
+
+
+def withdraw_assignment(message):
+    """
+    Delete the assignment of a request that will not become ACTIVE (given up
+    on, or revoked in bulk while provisioning)
+    Returns False when Identity Center refuses while the creation is still in
+    progress; the message is then re-queued (at the capped delay) until it can
+    be deleted or has finished.
+    """
+    try:
+        get_client('sso-admin').delete_account_assignment(
+            InstanceArn=INSTANCE_ARN,
+            TargetId=message['account_id'],
+            TargetType='AWS_ACCOUNT',
+            PermissionSetArn=message['permission_set_arn'],
+            PrincipalType='USER',
+            PrincipalId=message['user_id']
+        )
+        logger.info("Assignment deletion requested before failing the request")
+        return True
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code == 'ResourceNotFoundException':
+            return True
+        if code == 'ConflictException':
+            logger.warning("Assignment cannot be deleted yet, checking again later")
+            return False
+        raise
+
+
+def requeue(message, attempt):
+    """Send the message back to the queue with an exponentially growing delay"""
+    delay = min(PROVISIONING_BASE_DELAY_SECONDS * (2 ** attempt), PROVISIONING_MAX_DELAY_SECONDS)
+
+    get_client('sqs').send_message(
+        QueueUrl=PROVISIONING_QUEUE_URL,
+        DelaySeconds=delay,
+        MessageBody=json.dumps(dict(message, attempt=attempt))
+    )
+
+    logger.info("Request re-queued", attempt=attempt, delay_seconds=delay)
+
+
+def finalize_active(message):
+    """Mark the request ACTIVE, schedule revocation and notify the user"""
+    request_id = message['request_id']
+
+    try:
+        request_item = transition_request(request_id, 'provisioned')
+    except TransitionConflict as e:
+        if e.current_status == REVOKED:
+            # Cancelled by a bulk revocation while the assignment was being created
+            logger.info("Request was revoked while provisioning, deleting the assignment")
+            if not withdraw_assignment(message):
+                requeue(message, message.get('attempt', 0) + 1)
+            return
+        # Duplicate delivery - another invocation already finalized it
+        logger.info("Request is no longer PROVISIONING, skipping")
+        return
+
+    logger.info("Request is ACTIVE")
+
+    if STREAM_SIDE_EFFECTS:
+        return
+
+    # A repeated request may have extended the grant while it was provisioning
+    expiration_timestamp = int(request_item.get('ExpirationTimestamp', message['expiration_timestamp']))
+    schedule_revocation(request_id, message['user_id'], message['account_id'], message['permission_set_arn'], expiration_timestamp)
+
+    # Send confirmation email
+    notify_transition('provisioned', request_item, notification_fields(message))
+
+
+def finalize_failed(message, error_message):
+    """Mark the request FAILED and notify the user"""
+    request_id = message['request_id']
+
+    try:
+        request_item = transition_request(request_id, 'provisioning_failed', {'ErrorMessage': error_message})
+    except TransitionConflict:
+        logger.info("Request is no longer PROVISIONING, skipping")
+        return
+
+    logger.error("Request FAILED", error=error_message)
+
+    if STREAM_SIDE_EFFECTS:
+        return
+
+    notify_transition('provisioning_failed', request_item, notification_fields(message))
+
+
+def notification_fields(message):
+    # The portal's account / permission set names, as used when the request was made
+    return {
+        'account': message['account_name'],
+        'permission_set': message['permission_set']
+    }
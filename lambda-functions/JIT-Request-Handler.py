@@ -1,53 +1,90 @@
 import json
-import boto3
+import base64
+import hashlib
 import os
 import time
 import uuid
-from datetime import datetime, timedelta
-import datetime as dt
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
 from botocore.exceptions import ClientError
-from decimal import Decimal
+from jit_core import (
+    api_response, bind, compact_item, create_revocation_rule, expand_item, get_cache, get_client,
+    get_logger, get_table, projection, idempotency_key_from, load_config, not_modified, provisioning_message,
+    read_stats, read_version, reschedule_revocation, notify_transition, run_idempotent, schedule_revocation, search_archive, send_approval_notification,
+    send_templated_notification, span, to_json, traced, transition_request
+)
+from jit_core.lifecycle import ACTIVE, EXTENDABLE_STATES, FAILED, PENDING, PROVISIONING, STATES
+from jit_core.schema import change_day
+from jit_core.stats import DEFAULT_DAYS, MAX_DAYS
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-sso_admin = boto3.client('sso-admin')
-identitystore = boto3.client('identitystore')
-scheduler = boto3.client('scheduler')
+logger = get_logger('JIT-Request-Handler')
 
 # Environment variables
-TABLE_NAME = os.environ['DYNAMODB_TABLE']
-INSTANCE_ARN = os.environ['IDENTITY_CENTER_INSTANCE_ARN']
-IDENTITY_STORE_ID = os.environ['IDENTITY_STORE_ID']
-REGION = os.environ['REGION']
-
-# Permission Set Mapping
-PERMISSION_SETS = {
-    'S3FullAccess': {
-        'arn': os.environ['PS_S3_FULL_ACCESS'],
-        'risk_level': 'LOW',
-        'name': 'JIT-S3FullAccess'
-    },
-    'EC2FullAccess': {
-        'arn': os.environ['PS_EC2_FULL_ACCESS'],
-        'risk_level': 'LOW',
-        'name': 'JIT-EC2FullAccess'
-    },
-    'EmergencyAdmin': {
-        'arn': os.environ['PS_EMERGENCY_ADMIN'],
-        'risk_level': 'HIGH',
-        'name': 'JIT-EmergencyAdmin'
-    }
-}
+config = load_config()
+INSTANCE_ARN = config.instance_arn
+IDENTITY_STORE_ID = config.identity_store_id
+
+# Permission Set and Account Mappings
+PERMISSION_SETS = config.permission_sets
+ACCOUNTS = config.accounts
 
-# Account Mapping
-ACCOUNTS = {
-    'Management': os.environ['MANAGEMENT_ACCOUNT'],
-    'LogArchive': os.environ['LOG_ARCHIVE_ACCOUNT'],
-    'Audit': os.environ['AUDIT_ACCOUNT']
+# Global secondary indexes on the requests table
+USER_INDEX = 'UserId-RequestTimestamp-index'
+STATUS_INDEX = 'Status-RequestTimestamp-index'
+CHANGES_INDEX = 'UpdatedDay-UpdatedTimestamp-index'
+
+# Attributes returned by GET /requests (list view); GET /requests?request_id= returns the whole item
+LIST_ATTRIBUTES = [
+    'RequestId', 'UserEmail', 'AccountName', 'PermissionSet', 'Status',
+    'RequestTimestamp', 'ExpirationTimestamp', 'DurationMinutes', 'Reason',
+    'ApproverEmail', 'ApprovalComments', 'RevokedBy', 'RevocationType'
+]
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Attributes (and types) of the LastEvaluatedKey a next_token holds, per table / index read
+TABLE_PAGE_KEY = {'RequestId': str}
+INDEX_PAGE_KEYS = {
+    USER_INDEX: {'RequestId': str, 'UserId': str, 'RequestTimestamp': int},
+    STATUS_INDEX: {'RequestId': str, 'Status': str, 'RequestTimestamp': int},
+    CHANGES_INDEX: {'RequestId': str, 'UpdatedDay': str, 'UpdatedTimestamp': int}
 }
+ARCHIVE_PAGE_KEY = {'RequestId': str, 'RequestTimestamp': int}
+
+# GET /requests?changed_since= (change feed). Each response's cursor trails the
+# clock so writes not yet visible in the index are read again on the next poll
+CHANGE_KEY_ATTRIBUTES = ['UpdatedDay', 'UpdatedTimestamp']
+CHANGE_FEED_LAG_SECONDS = 5
+CHANGE_FEED_MAX_AGE_SECONDS = int(os.environ.get('CHANGE_FEED_MAX_AGE_SECONDS', 86400))
+
+# GET /requests?archive=true reads closed requests JIT-Archiver moved to ARCHIVE_BUCKET,
+# one day partition at a time, so the range a lookup may span is bounded
+ARCHIVE_MAX_RANGE_DAYS = int(os.environ.get('ARCHIVE_MAX_RANGE_DAYS', 31))
+
+# Optional email/username -> UserId lookup table (partition key: LookupKey, TTL: ExpiresAt)
+USER_LOOKUP_TABLE = os.environ.get('USER_LOOKUP_TABLE')
+USER_LOOKUP_TTL_SECONDS = int(os.environ.get('USER_LOOKUP_TTL_SECONDS', 86400))
+
+# Optional asynchronous provisioning (see JIT-Provisioning-Worker)
+PROVISIONING_QUEUE_URL = os.environ.get('PROVISIONING_QUEUE_URL')
+PROVISIONING_BASE_DELAY_SECONDS = int(os.environ.get('PROVISIONING_BASE_DELAY_SECONDS', 2))
+
+# SIDE_EFFECT_MODE=stream: only write the request; JIT-Stream-Processor provisions, schedules and notifies
+STREAM_SIDE_EFFECTS = config.side_effect_mode == 'stream'
+
+# Attempts at extending an existing grant (EXTENDABLE_STATES) that changes while we extend it
+EXTEND_ATTEMPTS = 3
 
-table = dynamodb.Table(TABLE_NAME)
+# Batch requests
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 20))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 10))
 
+# Warm-container caches
+USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', 300))
+user_cache = get_cache('users', maxsize=1024, ttl_seconds=USER_CACHE_TTL_SECONDS)
+
+@traced
 def lambda_handler(event, context):
     """
     Main handler for JIT access requests
@@ -68,25 +105,22 @@ def lambda_handler(event, context):
                 permission_set_name = body.get('permission_set')
                 reason = body.get('reason')
                 duration_minutes = body.get('duration_minutes', 60)
+                grants = body.get('grants')
+                idempotency_key = idempotency_key_from(event, body)
                 
             elif http_method == 'GET':
-                # List all requests
-                response = table.scan()
-                requests_list = response.get('Items', [])
-                
-                # Convert Decimal to regular numbers for JSON
-                import decimal
-                def decimal_default(obj):
-                    if isinstance(obj, decimal.Decimal):
-                        return int(obj) if obj % 1 == 0 else float(obj)
-                    raise TypeError
-                
-                requests_json = json.loads(json.dumps(requests_list, default=decimal_default))
-                
-                return api_response(200, {
-                    'requests': requests_json,
-                    'count': len(requests_json)
-                })
+                params = event.get('queryStringParameters') or {}
+                if (event.get('resource') or event.get('path') or '').endswith('/stats'):
+                    # Dashboard aggregates (maintained by JIT-Stream-Processor)
+                    return get_stats(params)
+                if params.get('archive') == 'true':
+                    # History older than the requests table keeps (archived to S3)
+                    return list_archive(params)
+                if params.get('request_id'):
+                    # Detail view of one request
+                    return get_request(params['request_id'])
+                # List requests (paginated, index-backed, conditional on If-None-Match)
+                return list_requests(params, event.get('headers'))
             else:
                 return api_response(405, {'error': 'Method not allowed'})
         else:
@@ -96,202 +130,1013 @@ def lambda_handler(event, context):
             permission_set_name = event.get('permission_set')
             reason = event.get('reason')
             duration_minutes = event.get('duration_minutes', 60)
+            grants = event.get('grants')
+            idempotency_key = event.get('idempotency_key')
         
-        # Validation
-        if not all([user_email, account_name, permission_set_name, reason]):
-            return api_response(400, {'error': 'Missing required fields: user_email, account_name, permission_set, reason'})
-        
-        if account_name not in ACCOUNTS:
-            return api_response(400, {'error': f'Invalid account. Must be one of: {list(ACCOUNTS.keys())}'})
-        
-        if permission_set_name not in PERMISSION_SETS:
-            return api_response(400, {'error': f'Invalid permission set. Must be one of: {list(PERMISSION_SETS.keys())}'})
+        # A retried submission with the same client token gets the original response
+        payload = {
+            'user_email': user_email,
+            'account_name': account_name,
+            'permission_set': permission_set_name,
+            'reason': reason,
+            'duration_minutes': duration_minutes,
+            'grants': grants
+        }
+        return run_idempotent(
+            (user_email or '').lower(), idempotency_key, payload,
+            lambda: submit_request(user_email, account_name, permission_set_name, reason, duration_minutes, grants)
+        )
+    
+    except Exception as e:
+        logger.exception("Error processing request", error=str(e))
+        return api_response(500, {'error': f'Internal error: {str(e)}'})
+
+
+def submit_request(user_email, account_name, permission_set_name, reason, duration_minutes, grants):
+    """Validate and process one access request (or a batch of grants)"""
+    # Batch request: several (account, permission set) pairs at once
+    if grants is not None:
+        return handle_batch_request(user_email, grants, reason, duration_minutes)
+    
+    # Validation
+    if not all([user_email, account_name, permission_set_name, reason]):
+        return api_response(400, {'error': 'Missing required fields: user_email, account_name, permission_set, reason'})
+    
+    if account_name not in ACCOUNTS:
+        return api_response(400, {'error': f'Invalid account. Must be one of: {list(ACCOUNTS.keys())}'})
+    
+    if permission_set_name not in PERMISSION_SETS:
+        return api_response(400, {'error': f'Invalid permission set. Must be one of: {list(PERMISSION_SETS.keys())}'})
+    
+    if duration_minutes > 60:
+        return api_response(400, {'error': 'Duration cannot exceed 60 minutes'})
+    
+    # Get account ID and permission set details
+    account_id = ACCOUNTS[account_name]
+    permission_set = PERMISSION_SETS[permission_set_name]
+    risk_level = permission_set['risk_level']
+    
+    # Get user details from Identity Center
+    user_info = get_user_by_email(user_email)
+    if not user_info:
+        return api_response(404, {'error': f'User {user_email} not found in Identity Center'})
+    
+    user_id = user_info['UserId']
+    
+    # Already granted: extend that grant instead of assigning and scheduling revocation again
+    if risk_level == 'LOW':
+        extension = extend_active_grant(user_id, account_id, permission_set['arn'], duration_minutes)
+        if extension:
+            grant, expiration_timestamp = extension
+            bind(request_id=grant['RequestId'], user=user_email)
+            notify_extension(grant, expiration_timestamp, permission_set_name)
+            return api_response(200, {
+                'message': 'Access already granted - existing grant extended',
+                'request_id': grant['RequestId'],
+                'status': grant['Status'],
+                'extended': True,
+                'expires_at': datetime.fromtimestamp(expiration_timestamp).isoformat(),
+                'account': account_name,
+                'permission_set': permission_set_name
+            })
+    
+    # Generate request ID
+    request_id = str(uuid.uuid4())
+    bind(request_id=request_id, user=user_email)
+    current_timestamp = int(time.time())
+    expiration_timestamp = current_timestamp + (duration_minutes * 60)
+    
+    # Create request record
+    request_item = {
+        'RequestId': request_id,
+        'UserId': user_id,
+        'UserEmail': user_email,
+        'AccountId': account_id,
+        'AccountName': account_name,
+        'PermissionSet': permission_set['name'],
+        'PermissionSetArn': permission_set['arn'],
+        'RiskLevel': risk_level,
+        'Status': PENDING,
+        'Version': 1,
+        'RequestTimestamp': current_timestamp,
+        'ExpirationTimestamp': expiration_timestamp,
+        'DurationMinutes': duration_minutes,
+        'Reason': reason
+    }
+    
+    if risk_level == 'LOW' and (PROVISIONING_QUEUE_URL or STREAM_SIDE_EFFECTS):
+        if STREAM_SIDE_EFFECTS:
+            # Single write - JIT-Stream-Processor creates the assignment from the stream record
+            request_item['Status'] = PROVISIONING
+            get_table().put_item(Item=compact_item(request_item))
+        else:
+            # Auto-approve asynchronously - the provisioning worker finalizes the record
+            start_provisioning(request_item)
         
-        if duration_minutes > 60:
-            return api_response(400, {'error': 'Duration cannot exceed 60 minutes'})
+        return api_response(202, {
+            'message': 'Access approved automatically (low risk) and is being provisioned',
+            'request_id': request_id,
+            'status': PROVISIONING,
+            'expires_at': datetime.fromtimestamp(expiration_timestamp).isoformat(),
+            'account': account_name,
+            'permission_set': permission_set_name,
+            'note': 'You will be notified by email when access is active.'
+        })
+    
+    # Store request in DynamoDB
+    get_table().put_item(Item=compact_item(request_item))
+    
+    logger.info("Request created", account=account_name, permission_set=permission_set_name, risk_level=risk_level)
+    
+    # Determine if auto-approval or manual approval needed
+    if risk_level == 'LOW':
+        # Auto-approve and grant access immediately
+        request_item = grant_access(request_id, user_id, account_id, permission_set['arn'], expiration_timestamp)
+
+        # Send confirmation email
+        notify_transition('grant', request_item, {'account': account_name, 'permission_set': permission_set_name})
         
-        # Get account ID and permission set details
-        account_id = ACCOUNTS[account_name]
-        permission_set = PERMISSION_SETS[permission_set_name]
-        risk_level = permission_set['risk_level']
+        return api_response(200, {
+            'message': 'Access granted automatically (low risk)',
+            'request_id': request_id,
+            'status': ACTIVE,
+            'expires_at': datetime.fromtimestamp(expiration_timestamp).isoformat(),
+            'account': account_name,
+            'permission_set': permission_set_name
+        })
+    else:
+        # High risk - requires approval (in stream mode JIT-Stream-Processor asks the approvers)
+        if not STREAM_SIDE_EFFECTS:
+            send_approval_notification(request_id, user_email, account_name, permission_set_name, reason)
         
-        # Get user details from Identity Center
-        user_info = get_user_by_email(user_email)
-        if not user_info:
-            return api_response(404, {'error': f'User {user_email} not found in Identity Center'})
+        return api_response(202, {
+            'message': 'Access request pending approval (high risk)',
+            'request_id': request_id,
+            'status': PENDING,
+            'account': account_name,
+            'permission_set': permission_set_name,
+            'note': 'Manager approval required. You will be notified when approved.'
+        })
+
+
+def handle_batch_request(user_email, grants, reason, duration_minutes):
+    """
+    Handle a batch of (account, permission set) grants for one user
+    The user is resolved once, all records are written with a single batch
+    write before any assignment is created, then assignments run concurrently
+    and the granted records are written again with their outcome
+    """
+    # Validation
+    if not all([user_email, reason]) or not isinstance(grants, list) or not grants:
+        return api_response(400, {'error': 'Missing required fields: user_email, reason, grants'})
+    
+    if len(grants) > MAX_BATCH_SIZE:
+        return api_response(400, {'error': f'A batch can contain at most {MAX_BATCH_SIZE} grants'})
+    
+    if duration_minutes > 60:
+        return api_response(400, {'error': 'Duration cannot exceed 60 minutes'})
+    
+    pairs = []
+    for grant in grants:
+        account_name = grant.get('account_name') if isinstance(grant, dict) else None
+        permission_set_name = grant.get('permission_set') if isinstance(grant, dict) else None
         
-        user_id = user_info['UserId']
+        if account_name not in ACCOUNTS:
+            return api_response(400, {'error': f'Invalid account {account_name}. Must be one of: {list(ACCOUNTS.keys())}'})
         
-        # Generate request ID
-        request_id = str(uuid.uuid4())
-        current_timestamp = int(time.time())
-        expiration_timestamp = current_timestamp + (duration_minutes * 60)
+        if permission_set_name not in PERMISSION_SETS:
+            return api_response(400, {'error': f'Invalid permission set {permission_set_name}. Must be one of: {list(PERMISSION_SETS.keys())}'})
         
-        # Create request record
-        request_item = {
-            'RequestId': request_id,
-            'UserId': user_id,
+        if (account_name, permission_set_name) not in pairs:
+            pairs.append((account_name, permission_set_name))
+    
+    # Get user details from Identity Center (once for the whole batch)
+    user_info = get_user_by_email(user_email)
+    if not user_info:
+        return api_response(404, {'error': f'User {user_email} not found in Identity Center'})
+    
+    batch_id = str(uuid.uuid4())
+    bind(batch_id=batch_id, user=user_email)
+    
+    # Low-risk pairs the user already holds extend the existing grant instead
+    extended_results = []
+    if any(PERMISSION_SETS[name]['risk_level'] == 'LOW' for _, name in pairs):
+        active_grants = find_active_grants(user_info['UserId'])
+        new_pairs = []
+        for account_name, permission_set_name in pairs:
+            permission_set = PERMISSION_SETS[permission_set_name]
+            extension = None
+            if permission_set['risk_level'] == 'LOW':
+                extension = extend_active_grant(
+                    user_info['UserId'], ACCOUNTS[account_name], permission_set['arn'], duration_minutes, grants=active_grants
+                )
+            if not extension:
+                new_pairs.append((account_name, permission_set_name))
+                continue
+            grant, grant_expiration = extension
+            notify_extension(grant, grant_expiration, permission_set_name)
+            extended_results.append({
+                'request_id': grant['RequestId'],
+                'account': account_name,
+                'permission_set': permission_set_name,
+                'status': grant['Status'],
+                'extended': True
+            })
+        pairs = new_pairs
+    
+    current_timestamp = int(time.time())
+    expiration_timestamp = current_timestamp + (duration_minutes * 60)
+    
+    if not pairs:
+        return batch_response(batch_id, expiration_timestamp, extended_results)
+    
+    request_items = []
+    for account_name, permission_set_name in pairs:
+        permission_set = PERMISSION_SETS[permission_set_name]
+        request_items.append({
+            'RequestId': str(uuid.uuid4()),
+            'BatchId': batch_id,
+            'UserId': user_info['UserId'],
             'UserEmail': user_email,
-            'AccountId': account_id,
+            'AccountId': ACCOUNTS[account_name],
             'AccountName': account_name,
             'PermissionSet': permission_set['name'],
             'PermissionSetArn': permission_set['arn'],
-            'RiskLevel': risk_level,
-            'Status': 'PENDING',
+            'RiskLevel': permission_set['risk_level'],
+            'Status': PENDING,
+            'Version': 1,
             'RequestTimestamp': current_timestamp,
             'ExpirationTimestamp': expiration_timestamp,
             'DurationMinutes': duration_minutes,
             'Reason': reason
+        })
+    
+    if STREAM_SIDE_EFFECTS:
+        # JIT-Stream-Processor grants / asks for approval of each record once it is written
+        for request_item in request_items:
+            request_item['Status'] = PROVISIONING if request_item['RiskLevel'] == 'LOW' else PENDING
+    
+    # Store all records in DynamoDB before any assignment exists, so the drift
+    # reconciler never finds an assignment without a record
+    write_batch_items(request_items)
+    
+    logger.info("Batch created", requests=len(request_items))
+    
+    if not STREAM_SIDE_EFFECTS:
+        # Fan out the Identity Center / EventBridge / SNS calls
+        with ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(request_items))) as executor:
+            outcomes = list(executor.map(process_batch_item, request_items, [name for _, name in pairs]))
+        
+        for request_item, outcome in zip(request_items, outcomes):
+            request_item.update(outcome)
+        
+        # High-risk records stay PENDING as written (an approver may already be acting on them)
+        granted_items = [item for item in request_items if item['Status'] != PENDING]
+        for request_item in granted_items:
+            request_item['Version'] += 1
+        write_batch_items(granted_items)
+    
+    if STREAM_SIDE_EFFECTS:
+        logger.info("Batch handed to the stream processor")
+    elif PROVISIONING_QUEUE_URL:
+        queue_provisioning_batch(request_items)
+    else:
+        active_items = [item for item in request_items if item['Status'] == ACTIVE]
+        if active_items:
+            send_batch_confirmation(user_email, batch_id, active_items, expiration_timestamp, duration_minutes)
+    
+    results = extended_results
+    for request_item, (account_name, permission_set_name) in zip(request_items, pairs):
+        result = {
+            'request_id': request_item['RequestId'],
+            'account': account_name,
+            'permission_set': permission_set_name,
+            'status': request_item['Status']
         }
+        if request_item.get('ErrorMessage'):
+            result['error'] = request_item['ErrorMessage']
+        results.append(result)
+    
+    return batch_response(batch_id, expiration_timestamp, results)
+
+
+def write_batch_items(request_items):
+    """Store request records with one batch write (25 items per BatchWriteItem)"""
+    with get_table().batch_writer() as batch:
+        for request_item in request_items:
+            batch.put_item(Item=compact_item(request_item))
+
+
+def batch_response(batch_id, expiration_timestamp, results):
+    return api_response(200, {
+        'message': f'Batch of {len(results)} requests processed',
+        'batch_id': batch_id,
+        'expires_at': datetime.fromtimestamp(expiration_timestamp).isoformat(),
+        'results': results,
+        'count': len(results)
+    })
+
+
+def process_batch_item(request_item, permission_set_name):
+    """
+    Grant (low risk) or request approval for (high risk) one batch item
+    Runs in a worker thread, so it only uses boto3 clients and returns the
+    attributes to store instead of writing to DynamoDB itself
+    """
+    request_id = request_item['RequestId']
+    
+    if request_item['RiskLevel'] != 'LOW':
+        send_approval_notification(request_id, request_item['UserEmail'], request_item['AccountName'], permission_set_name, request_item['Reason'])
+        return {'Status': PENDING}
+    
+    try:
+        outcome = {}
+        try:
+            response = get_client('sso-admin').create_account_assignment(
+                InstanceArn=INSTANCE_ARN,
+                TargetId=request_item['AccountId'],
+                TargetType='AWS_ACCOUNT',
+                PermissionSetArn=request_item['PermissionSetArn'],
+                PrincipalType='USER',
+                PrincipalId=request_item['UserId']
+            )
+            outcome['AssignmentRequestId'] = response['AccountAssignmentCreationStatus']['RequestId']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConflictException':
+                raise
+            logger.warning("Assignment already exists, treating as success", request_id=request_id)
+        
+        if PROVISIONING_QUEUE_URL:
+            outcome['Status'] = PROVISIONING
+            return outcome
         
-        # Store request in DynamoDB
-        table.put_item(Item=request_item)
+        if outcome.get('AssignmentRequestId'):
+            wait_for_assignment(outcome['AssignmentRequestId'])
         
-        print(f"Request created: {request_id} for user {user_email}")
+        current_timestamp = int(time.time())
+        outcome.update({
+            'Status': ACTIVE,
+            'GrantedTimestamp': current_timestamp,
+            'ApprovalTimestamp': current_timestamp
+        })
         
-        # Determine if auto-approval or manual approval needed
-        if risk_level == 'LOW':
-            # Auto-approve and grant access immediately
-            result = grant_access(request_id, user_id, account_id, permission_set['arn'], expiration_timestamp)
+        if config.revocation_mode != 'sweeper':
+            try:
+                outcome['RevocationScheduleArn'] = create_revocation_rule(
+                    request_id, request_item['UserId'], request_item['AccountId'],
+                    request_item['PermissionSetArn'], request_item['ExpirationTimestamp']
+                )
+            except Exception as e:
+                logger.error("Error scheduling revocation", request_id=request_id, error=str(e))
+        
+        return outcome
+        
+    except Exception as e:
+        logger.error("Batch item failed", request_id=request_id, error=str(e))
+        return {'Status': FAILED, 'ErrorMessage': str(e)}
+
 
-            # Send confirmation email
-            email_subject = f"✓ JIT Access Granted - {permission_set_name}"
-            email_body = f"""
-Your JIT access request has been APPROVED and access is now ACTIVE.
+def queue_provisioning_batch(request_items):
+    """Hand PROVISIONING batch items to JIT-Provisioning-Worker, 10 messages per call"""
+    entries = [
+        {
+            'Id': str(index),
+            'DelaySeconds': PROVISIONING_BASE_DELAY_SECONDS,
+            'MessageBody': json.dumps(provisioning_message(request_item))
+        }
+        for index, request_item in enumerate(request_items)
+        if request_item['Status'] == PROVISIONING
+    ]
+    
+    sqs = get_client('sqs')
+    for start in range(0, len(entries), 10):
+        response = sqs.send_message_batch(QueueUrl=PROVISIONING_QUEUE_URL, Entries=entries[start:start + 10])
+        for failed in response.get('Failed', []):
+            logger.warning("Failed to queue batch entry", entry=failed['Id'], error=failed.get('Message'))
 
-Account: {account_name}
-Permission Set: {permission_set_name}
-Expires: {datetime.fromtimestamp(expiration_timestamp).strftime('%Y-%m-%d %H:%M:%S UTC')}
-Duration: {duration_minutes} minutes
 
-Your access will be automatically revoked after {duration_minutes} minutes.
+def send_batch_confirmation(user_email, batch_id, active_items, expiration_timestamp, duration_minutes):
+    """Send one confirmation email covering every grant activated by a batch"""
+    send_templated_notification(user_email, 'granted_batch', {
+        'grants': [
+            {'account': item['AccountName'], 'permission_set': item['PermissionSet'], 'request_id': item['RequestId']}
+            for item in active_items
+        ],
+        'grant_count': len(active_items),
+        'expires': expiration_timestamp,
+        'duration_minutes': duration_minutes,
+        'batch_id': batch_id
+    }, dedupe_key=f"{batch_id}:ACTIVE")
 
-Request ID: {request_id}
-"""
-            send_user_notification(user_email, email_subject, email_body)
-            
-            return api_response(200, {
-                'message': 'Access granted automatically (low risk)',
-                'request_id': request_id,
-                'status': 'ACTIVE',
-                'expires_at': datetime.fromtimestamp(expiration_timestamp).isoformat(),
-                'account': account_name,
-                'permission_set': permission_set_name
-            })
+
+def list_requests(params, headers=None):
+    """
+    Return one page of requests for GET /requests
+    Query parameters: user, status, since, changed_since, limit, next_token
+    With STATS_TABLE set, pages carry an ETag derived from the table version and
+    a matching If-None-Match gets 304 without querying the table. The version
+    is bumped by JIT-Stream-Processor, so for the stream delay after a write a
+    stale page can still get 304 (see documentation.md, STATS_TABLE VERSION).
+    """
+    user = params.get('user')
+    status = (params.get('status') or '').upper()
+
+    if status and status not in STATES:
+        return api_response(400, {'error': f'Invalid status. Must be one of: {list(STATES)}'})
+
+    try:
+        limit = int(params.get('limit') or DEFAULT_PAGE_SIZE)
+        since = int(params['since']) if params.get('since') else None
+        changed_since = int(params['changed_since']) if params.get('changed_since') else None
+    except ValueError:
+        return api_response(400, {'error': 'limit, since and changed_since must be integers'})
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return api_response(400, {'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'})
+
+    # Read before the query, so the ETag is never newer than the page it labels
+    etag = None
+    if config.stats_table_name and changed_since is None:
+        etag = page_etag(read_version(), params)
+        if etag in if_none_match(headers):
+            return not_modified(etag)
+
+    # Only fetch the attributes the portal renders
+    query_args = dict(projection(LIST_ATTRIBUTES), Limit=limit)
+
+    user_id = None
+    if user:
+        # Resolve the user to their Identity Center ID for the UserId index
+        user_info = get_user_by_email(user)
+        if not user_info:
+            return api_response(404, {'error': f'User {user} not found in Identity Center'})
+        user_id = user_info['UserId']
+
+    if params.get('next_token'):
+        # The token must be a key of the table or index this query reads, within its key condition
+        if changed_since is not None:
+            key_types, fixed, lower = INDEX_PAGE_KEYS[CHANGES_INDEX], {}, ('UpdatedTimestamp', changed_since)
+        elif user_id:
+            key_types, fixed, lower = INDEX_PAGE_KEYS[USER_INDEX], {'UserId': user_id}, ('RequestTimestamp', since)
+        elif status:
+            key_types, fixed, lower = INDEX_PAGE_KEYS[STATUS_INDEX], {'Status': status}, ('RequestTimestamp', since)
         else:
-            # High risk - requires approval
-            send_approval_notification(request_id, user_email, account_name, permission_set_name, reason)
-            
-            return api_response(202, {
-                'message': 'Access request pending approval (high risk)',
-                'request_id': request_id,
-                'status': 'PENDING',
-                'account': account_name,
-                'permission_set': permission_set_name,
-                'note': 'Manager approval required. You will be notified when approved.'
-            })
+            key_types, fixed, lower = TABLE_PAGE_KEY, {}, (None, None)
+        try:
+            start_key = decode_page_token(params['next_token'], key_types)
+        except ValueError:
+            return api_response(400, {'error': 'Invalid next_token'})
+        attribute, minimum = lower
+        if any(start_key[name] != value for name, value in fixed.items()) or \
+                (minimum is not None and start_key[attribute] < minimum):
+            return api_response(400, {'error': 'next_token does not belong to this query'})
+        query_args['ExclusiveStartKey'] = start_key
+
+    if changed_since is not None:
+        return list_changes(changed_since, user_id, limit, query_args.get('ExclusiveStartKey'))
+
+    if user_id:
+        key_condition = Key('UserId').eq(user_id)
+        if since is not None:
+            key_condition = key_condition & Key('RequestTimestamp').gte(since)
+
+        query_args['IndexName'] = USER_INDEX
+        query_args['KeyConditionExpression'] = key_condition
+        query_args['ScanIndexForward'] = False
+        if status:
+            query_args['FilterExpression'] = Attr('Status').eq(status)
+
+        response = get_table().query(**query_args)
+
+    elif status:
+        key_condition = Key('Status').eq(status)
+        if since is not None:
+            key_condition = key_condition & Key('RequestTimestamp').gte(since)
+
+        query_args['IndexName'] = STATUS_INDEX
+        query_args['KeyConditionExpression'] = key_condition
+        query_args['ScanIndexForward'] = False
+
+        response = get_table().query(**query_args)
+
+    else:
+        # No index applies - fall back to a paginated scan
+        if since is not None:
+            query_args['FilterExpression'] = Attr('RequestTimestamp').gte(since)
+
+        response = get_table().scan(**query_args)
+
+    # Items go to api_response as read; to_json converts the Decimal numbers while encoding
+    items = response.get('Items', [])
+
+    body = {
+        'requests': items,
+        'count': len(items),
+        'cursor': change_cursor()
+    }
+    if response.get('LastEvaluatedKey'):
+        body['next_token'] = encode_page_token(response['LastEvaluatedKey'])
+
+    return api_response(200, body, headers={'ETag': etag} if etag else None)
+
+
+def list_changes(changed_since, user_id, limit, start_key=None):
+    """
+    Return the requests written at or after changed_since (GET /requests?changed_since=)
+    Served from the UpdatedDay-UpdatedTimestamp index, one query per day
+    partition. status is not applied: requests that left a status are returned
+    too, so the client can drop them from its view.
+    """
+    now = int(time.time())
+    if changed_since < now - CHANGE_FEED_MAX_AGE_SECONDS:
+        return api_response(410, {'error': 'changed_since is too old, reload the full list'})
+
+    cursor = change_cursor()
+    days = sorted({change_day(timestamp) for timestamp in range(changed_since, now + 1, 86400)} | {change_day(now)})
+    if start_key:
+        if start_key.get('UpdatedDay') not in days:
+            return api_response(400, {'error': 'Invalid next_token'})
+        days = days[days.index(start_key['UpdatedDay']):]
+
+    items, next_key = [], None
+    for day in days:
+        query_args = dict(
+            projection(LIST_ATTRIBUTES + CHANGE_KEY_ATTRIBUTES),
+            IndexName=CHANGES_INDEX,
+            KeyConditionExpression=Key('UpdatedDay').eq(day) & Key('UpdatedTimestamp').gte(changed_since),
+            Limit=limit - len(items)
+        )
+        if start_key and start_key['UpdatedDay'] == day:
+            query_args['ExclusiveStartKey'] = start_key
+        if user_id:
+            query_args['FilterExpression'] = Attr('UserId').eq(user_id)
+
+        response = get_table().query(**query_args)
+        items.extend(response.get('Items', []))
+
+        next_key = response.get('LastEvaluatedKey')
+        if not next_key and len(items) >= limit and day != days[-1]:
+            # Page full at the end of a day: continue after its last item
+            next_key = {'RequestId': items[-1]['RequestId'], 'UpdatedDay': day,
+                        'UpdatedTimestamp': items[-1]['UpdatedTimestamp']}
+        if next_key:
+            break
+
+    body = {
+        'requests': items,
+        'count': len(items),
+        'cursor': cursor
+    }
+    if next_key:
+        body['next_token'] = encode_page_token(next_key)
+
+    return api_response(200, body)
+
+
+def change_cursor():
+    """changed_since for the next poll: now, less the index propagation allowance"""
+    return int(time.time()) - CHANGE_FEED_LAG_SECONDS
+
+
+def page_etag(version, params):
+    """Weak ETag of a list page: the table version plus the query it answers"""
+    digest = hashlib.sha256(to_json(sorted(params.items())).encode('utf-8')).hexdigest()[:16]
+    return f'W/"{version}-{digest}"'
+
+
+def if_none_match(headers):
+    """The entity tags of an If-None-Match header (any case), empty when absent"""
+    for name, value in (headers or {}).items():
+        if name.lower() == 'if-none-match' and value:
+            return {tag.strip() for tag in value.split(',')}
+    return set()
+
+
+def get_request(request_id):
+    """Return every attribute of one request for GET /requests?request_id="""
+    item = expand_item(get_table().get_item(Key={'RequestId': request_id}).get('Item'))
+    if not item:
+        error = f'Request {request_id} not found'
+        if config.archive_bucket:
+            error += ' (archived requests: add archive=true and since)'
+        return api_response(404, {'error': error})
     
+    return api_response(200, {'request': item})
+
+
+def list_archive(params):
+    """
+    Return archived requests for GET /requests?archive=true, newest first
+    Query parameters: since (required), until (default now), user, account,
+    status, limit, next_token; with request_id the whole archived item is
+    returned instead, like the detail view. At most ARCHIVE_MAX_RANGE_DAYS
+    of day partitions are read per call.
+    """
+    if not config.archive_bucket:
+        return api_response(404, {'error': 'The archive is not enabled (ARCHIVE_BUCKET is not set)'})
+
+    account = params.get('account')
+    status = (params.get('status') or '').upper()
+
+    try:
+        since = int(params['since']) if params.get('since') else None
+        until = int(params['until']) if params.get('until') else int(time.time())
+        limit = int(params.get('limit') or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return api_response(400, {'error': 'since, until and limit must be integers'})
+
+    if since is None:
+        return api_response(400, {'error': 'since is required with archive=true'})
+    if until < since or until - since > ARCHIVE_MAX_RANGE_DAYS * 86400:
+        return api_response(400, {'error': f'since to until must span 0 to {ARCHIVE_MAX_RANGE_DAYS} days'})
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        return api_response(400, {'error': f'limit must be between 1 and {MAX_PAGE_SIZE}'})
+    if status and status not in STATES:
+        return api_response(400, {'error': f'Invalid status. Must be one of: {list(STATES)}'})
+    if account and account not in ACCOUNTS:
+        return api_response(400, {'error': f'Invalid account. Must be one of: {list(ACCOUNTS)}'})
+
+    # Pages continue after the last (RequestTimestamp, RequestId) returned
+    start = None
+    if params.get('next_token'):
+        try:
+            start = decode_page_token(params['next_token'], ARCHIVE_PAGE_KEY)
+        except ValueError:
+            return api_response(400, {'error': 'Invalid next_token'})
+        start = (start['RequestTimestamp'], start['RequestId'])
+        until = min(until, start[0])
+
+    user_id = None
+    if params.get('user'):
+        user_info = get_user_by_email(params['user'])
+        if not user_info:
+            return api_response(404, {'error': f"User {params['user']} not found in Identity Center"})
+        user_id = user_info['UserId']
+
+    request_id = params.get('request_id')
+
+    def matches(item):
+        return ((not user_id or item.get('UserId') == user_id)
+                and (not status or item.get('Status') == status)
+                and (not request_id or item['RequestId'] == request_id)
+                and (start is None or (int(item['RequestTimestamp']), item['RequestId']) < start))
+
+    items = search_archive(since, until, [account] if account else None, matches)
+
+    if request_id:
+        if not items:
+            return api_response(404, {'error': f'Request {request_id} not found in the archive between since and until'})
+        return api_response(200, {'request': items[0]})
+
+    page = [{attribute: item[attribute] for attribute in LIST_ATTRIBUTES if attribute in item} for item in items[:limit]]
+    body = {
+        'requests': page,
+        'count': len(page)
+    }
+    if len(items) > limit:
+        body['next_token'] = encode_page_token({'RequestId': page[-1]['RequestId'],
+                                                'RequestTimestamp': page[-1]['RequestTimestamp']})
+
+    return api_response(200, body)
+
+
+def get_stats(params):
+    """
+    Return the dashboard aggregates for GET /stats with one BatchGetItem
+    Query parameters: days (default 7), user (adds their recent requests)
+    """
+    if not config.stats_table_name:
+        return api_response(404, {'error': 'Stats are not enabled (STATS_TABLE is not set)'})
+
+    try:
+        days = int(params.get('days') or DEFAULT_DAYS)
+    except ValueError:
+        return api_response(400, {'error': 'days must be an integer'})
+
+    if days < 1 or days > MAX_DAYS:
+        return api_response(400, {'error': f'days must be between 1 and {MAX_DAYS}'})
+
+    user_id = None
+    if params.get('user'):
+        user_info = get_user_by_email(params['user'])
+        if not user_info:
+            return api_response(404, {'error': f"User {params['user']} not found in Identity Center"})
+        user_id = user_info['UserId']
+
+    return api_response(200, read_stats(list(ACCOUNTS), days, user_id))
+
+
+def encode_page_token(last_evaluated_key):
+    """Encode a DynamoDB LastEvaluatedKey as an opaque pagination token"""
+    raw = to_json(last_evaluated_key)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_page_token(token, key_types):
+    """
+    Decode a pagination token back into an ExclusiveStartKey
+    key_types maps each key attribute of the table or index read to its type;
+    a token with other attributes or types raises ValueError, so a tampered
+    token is a 400 rather than a DynamoDB ValidationException.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (TypeError, UnicodeError):
+        raise ValueError('Malformed pagination token') from None
+    if not isinstance(key, dict) or set(key) != set(key_types):
+        raise ValueError('Malformed pagination token')
+    for attribute, attribute_type in key_types.items():
+        if not isinstance(key[attribute], attribute_type) or isinstance(key[attribute], bool):
+            raise ValueError('Malformed pagination token')
+    return key
+
+
+@span('get_user_by_email')
+def get_user_by_email(email_or_username):
+    """
+    Get user ID from Identity Center by email or username
+    Lookup order: in-process cache -> exact-match get_user_id -> persisted lookup table -> list_users scan
+    Identity Center is asked first, so a renamed or recreated user never resolves
+    to the stale UserId a table entry may still hold; the table only serves
+    names get_user_id cannot match exactly (e.g. different case).
+    """
+    lookup_key = email_or_username.strip().lower()
+
+    # 0. In-process cache (warm containers)
+    user = user_cache.get(lookup_key)
+    if user:
+        return user
+
+    try:
+        # 1. Exact match on the unique email / username attributes (written through to the table)
+        user = find_user_by_unique_attribute(email_or_username.strip())
+        if user:
+            cache_user(lookup_key, user['UserId'])
+
+        # 2. Persisted email/username -> UserId index
+        if not user:
+            user = get_cached_user(lookup_key)
+
+        # 3. Fall back to a full scan, indexing every user seen along the way
+        if not user:
+            user = scan_users(lookup_key)
+
+        if user:
+            user_cache.set(lookup_key, user)
+        return user
+
     except Exception as e:
-        print(f"Error processing request: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return api_response(500, {'error': f'Internal error: {str(e)}'})
+        logger.error("Error fetching user", lookup=email_or_username, error=str(e))
+        return None
+
+
+def get_cached_user(lookup_key):
+    """Return the cached user for an email/username, or None on miss/expiry"""
+    if not USER_LOOKUP_TABLE:
+        return None
 
-def send_user_notification(user_email, subject, message):
-    """Send email notification to user via SES"""
     try:
-        ses = boto3.client('ses', region_name=REGION)
-        
-        ses.send_email(
-            Source='felixayo85@gmail.com',  # Must be a verified email in SES
-            Destination={
-                'ToAddresses': [user_email]
-            },
-            Message={
-                'Subject': {
-                    'Data': subject,
-                    'Charset': 'UTF-8'
-                },
-                'Body': {
-                    'Text': {
-                        'Data': message,
-                        'Charset': 'UTF-8'
+        item = get_table(USER_LOOKUP_TABLE).get_item(Key={'LookupKey': lookup_key}).get('Item')
+    except ClientError as e:
+        logger.warning("User lookup table read failed", error=str(e))
+        return None
+
+    # DynamoDB TTL deletion is lazy, so check expiry ourselves
+    if not item or int(item.get('ExpiresAt', 0)) < int(time.time()):
+        return None
+
+    return {'UserId': item['UserId']}
+
+
+def cache_user(lookup_key, user_id):
+    """Store an email/username -> UserId entry in the lookup table"""
+    if not USER_LOOKUP_TABLE:
+        return
+
+    try:
+        get_table(USER_LOOKUP_TABLE).put_item(Item={
+            'LookupKey': lookup_key,
+            'UserId': user_id,
+            'ExpiresAt': int(time.time()) + USER_LOOKUP_TTL_SECONDS
+        })
+    except ClientError as e:
+        logger.warning("User lookup table write failed", error=str(e))
+
+
+def find_user_by_unique_attribute(email_or_username):
+    """Resolve a user with get_user_id, trying the email then the username attribute"""
+    for attribute_path in ['emails.value', 'userName']:
+        try:
+            response = get_client('identitystore').get_user_id(
+                IdentityStoreId=IDENTITY_STORE_ID,
+                AlternateIdentifier={
+                    'UniqueAttribute': {
+                        'AttributePath': attribute_path,
+                        'AttributeValue': email_or_username
                     }
                 }
-            }
+            )
+            return {'UserId': response['UserId']}
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ['ResourceNotFoundException', 'ValidationException']:
+                raise
+
+    return None
+
+
+def scan_users(lookup_key):
+    """Page through list_users for a case-insensitive match, refreshing the lookup table"""
+    match = None
+    params = {'IdentityStoreId': IDENTITY_STORE_ID}
+
+    while True:
+        response = get_client('identitystore').list_users(**params)
+        entries = {}
+
+        for user in response.get('Users', []):
+            keys = [email_obj.get('Value', '').lower() for email_obj in user.get('Emails', [])]
+            keys.append(user.get('UserName', '').lower())
+
+            for key in filter(None, keys):
+                entries[key] = user['UserId']
+
+            if match is None and lookup_key in keys:
+                match = user
+
+        index_users(entries)
+
+        if match or not response.get('NextToken'):
+            return match
+
+        params['NextToken'] = response['NextToken']
+
+
+def index_users(entries):
+    """Batch-write email/username -> UserId entries seen during a scan"""
+    if not USER_LOOKUP_TABLE or not entries:
+        return
+
+    expires_at = int(time.time()) + USER_LOOKUP_TTL_SECONDS
+    try:
+        with get_table(USER_LOOKUP_TABLE).batch_writer(overwrite_by_pkeys=['LookupKey']) as batch:
+            for lookup_key, user_id in entries.items():
+                batch.put_item(Item={
+                    'LookupKey': lookup_key,
+                    'UserId': user_id,
+                    'ExpiresAt': expires_at
+                })
+    except ClientError as e:
+        logger.warning("User lookup table write failed", entries=len(entries), error=str(e))
+
+
+def start_provisioning(request_item):
+    """
+    Start the account assignment and record the request as PROVISIONING
+    JIT-Provisioning-Worker polls the assignment status and finalizes the record
+    """
+    request_id = request_item['RequestId']
+
+    try:
+        response = get_client('sso-admin').create_account_assignment(
+            InstanceArn=INSTANCE_ARN,
+            TargetId=request_item['AccountId'],
+            TargetType='AWS_ACCOUNT',
+            PermissionSetArn=request_item['PermissionSetArn'],
+            PrincipalType='USER',
+            PrincipalId=request_item['UserId']
         )
+        assignment_request_id = response['AccountAssignmentCreationStatus']['RequestId']
+        request_item['AssignmentRequestId'] = assignment_request_id
         
-        print(f"✓ Email sent to {user_email}: {subject}")
+        logger.info("Account assignment requested", assignment_request_id=assignment_request_id)
         
-    except Exception as e:
-        print(f"⚠ Error sending email: {str(e)}")        
-
-
-def api_response(status_code, body):
-    """Helper function to return API Gateway formatted response"""
-    return {
-        'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-            'Access-Control-Allow-Methods': 'GET,POST,OPTIONS'
-        },
-        'body': json.dumps(body)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConflictException':
+            request_item['Status'] = FAILED
+            request_item['ErrorMessage'] = str(e)
+            get_table().put_item(Item=compact_item(request_item))
+            raise
+        logger.warning("Assignment already exists, worker will finalize immediately")
+
+    request_item['Status'] = PROVISIONING
+    get_table().put_item(Item=compact_item(request_item))
+
+    get_client('sqs').send_message(
+        QueueUrl=PROVISIONING_QUEUE_URL,
+        DelaySeconds=PROVISIONING_BASE_DELAY_SECONDS,
+        MessageBody=json.dumps(provisioning_message(request_item))
+    )
+
+    logger.info("Request queued for provisioning", request_id=request_id)
+
+
+def find_active_grants(user_id):
+    """
+    The user's unexpired ACTIVE / PROVISIONING grants from the UserId index,
+    keyed by (account ID, permission set ARN)
+    """
+    query_args = {
+        'IndexName': USER_INDEX,
+        'KeyConditionExpression': Key('UserId').eq(user_id),
+        'FilterExpression': Attr('Status').is_in(list(EXTENDABLE_STATES)) & Attr('ExpirationTimestamp').gt(int(time.time()))
     }
+    grants = {}
+    
+    while True:
+        response = get_table().query(**query_args)
+        for item in map(expand_item, response.get('Items', [])):
+            key = (item['AccountId'], item['PermissionSetArn'])
+            # Older duplicate grants may exist - the one expiring last is the one to extend
+            if key not in grants or item['ExpirationTimestamp'] > grants[key]['ExpirationTimestamp']:
+                grants[key] = item
+        
+        if not response.get('LastEvaluatedKey'):
+            return grants
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
 
-def get_user_by_email(email_or_username):
-    """Get user ID from Identity Center by email or username"""
-    try:
-        # List all users
-        response = identitystore.list_users(
-            IdentityStoreId=IDENTITY_STORE_ID
-        )
+def extend_active_grant(user_id, account_id, permission_set_arn, duration_minutes, grants=None):
+    """
+    Extend the user's existing grant of this permission set in this account to
+    now + duration_minutes (never shortening it) and move its revocation
+    Returns (grant item, expiration timestamp), or None when there is no grant to extend
+    """
+    for _ in range(EXTEND_ATTEMPTS):
+        grant = (grants if grants is not None else find_active_grants(user_id)).get((account_id, permission_set_arn))
+        grants = None
+        if grant is None:
+            return None
         
-        # Search through users for matching email or username
-        for user in response.get('Users', []):
-            # Check if email matches
-            user_emails = user.get('Emails', [])
-            for email_obj in user_emails:
-                if email_obj.get('Value', '').lower() == email_or_username.lower():
-                    return user
-            
-            # Check if username matches
-            if user.get('UserName', '').lower() == email_or_username.lower():
-                return user
+        current_expiration = int(grant['ExpirationTimestamp'])
+        current_timestamp = int(time.time())
+        expiration_timestamp = current_timestamp + (duration_minutes * 60)
+        if expiration_timestamp <= current_expiration:
+            logger.info("Existing grant already covers the requested duration", existing_request_id=grant['RequestId'])
+            return grant, current_expiration
         
-        # Pagination if needed
-        while response.get('NextToken'):
-            response = identitystore.list_users(
-                IdentityStoreId=IDENTITY_STORE_ID,
-                NextToken=response['NextToken']
+        started = int(grant.get('GrantedTimestamp') or grant['RequestTimestamp'])
+        try:
+            # Conditional on the values read, so concurrent extensions and revocations are not overwritten
+            get_table().update_item(
+                Key={'RequestId': grant['RequestId']},
+                UpdateExpression=(
+                    'SET ExpirationTimestamp = :expires, DurationMinutes = :duration, ExtendedTimestamp = :now, '
+                    'UpdatedTimestamp = :now, UpdatedDay = :day '
+                    'ADD ExtensionCount :one, #version :one'
+                ),
+                ConditionExpression='#status = :status AND ExpirationTimestamp = :current',
+                ExpressionAttributeNames={
+                    '#status': 'Status',
+                    '#version': 'Version'
+                },
+                ExpressionAttributeValues={
+                    ':expires': expiration_timestamp,
+                    ':duration': (expiration_timestamp - started) // 60,
+                    ':now': current_timestamp,
+                    ':day': change_day(current_timestamp),
+                    ':one': 1,
+                    ':status': grant['Status'],
+                    ':current': current_expiration
+                }
             )
-            
-            for user in response.get('Users', []):
-                user_emails = user.get('Emails', [])
-                for email_obj in user_emails:
-                    if email_obj.get('Value', '').lower() == email_or_username.lower():
-                        return user
-                
-                if user.get('UserName', '').lower() == email_or_username.lower():
-                    return user
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            logger.info("Grant changed while extending, re-reading", existing_request_id=grant['RequestId'])
+            continue
         
-        return None
+        logger.info("Existing grant extended", existing_request_id=grant['RequestId'], status=grant['Status'])
         
-    except Exception as e:
-        print(f"Error fetching user: {str(e)}")
-        return None
+        # A PROVISIONING grant is scheduled by the worker, which reads the new expiration;
+        # in stream mode JIT-Stream-Processor moves the schedule when it sees the change
+        if grant['Status'] == ACTIVE and not STREAM_SIDE_EFFECTS:
+            reschedule_revocation(grant, expiration_timestamp)
+        
+        return grant, expiration_timestamp
+    
+    return None
+
+
+def notify_extension(grant, expiration_timestamp, permission_set_name):
+    """Tell the user an ACTIVE grant was extended (PROVISIONING ones get the usual granted email)"""
+    if grant['Status'] != ACTIVE or STREAM_SIDE_EFFECTS:
+        # In stream mode JIT-Stream-Processor sends it
+        return
+    send_templated_notification(grant['UserEmail'], 'extended', {
+        'account': grant['AccountName'],
+        'permission_set': permission_set_name,
+        'expires': expiration_timestamp,
+        'request_id': grant['RequestId']
+    }, dedupe_key=f"{grant['RequestId']}:EXTENDED:{expiration_timestamp}")
 
 
 def grant_access(request_id, user_id, account_id, permission_set_arn, expiration_timestamp):
     """Grant access by creating account assignment with status polling"""
     try:
-        print(f"Creating account assignment for user {user_id} on account {account_id}")
-        print(f"Permission set: {permission_set_arn}")
+        logger.debug("Creating account assignment", user_id=user_id, account_id=account_id, permission_set_arn=permission_set_arn)
         
         # Create account assignment in Identity Center
-        response = sso_admin.create_account_assignment(
+        response = get_client('sso-admin').create_account_assignment(
             InstanceArn=INSTANCE_ARN,
             TargetId=account_id,
             TargetType='AWS_ACCOUNT',
@@ -303,195 +1148,71 @@ def grant_access(request_id, user_id, account_id, permission_set_arn, expiration
         assignment_request_id = response['AccountAssignmentCreationStatus']['RequestId']
         assignment_status = response['AccountAssignmentCreationStatus']['Status']
         
-        print(f"✓ Account assignment request created: {assignment_request_id}")
-        print(f"✓ Initial status: {assignment_status}")
+        logger.info("Account assignment requested", assignment_request_id=assignment_request_id, status=assignment_status)
         
         # Poll for completion
-        max_attempts = 30  # 60 seconds max
-        attempt = 0
-        
-        while attempt < max_attempts:
-            try:
-                status_response = sso_admin.describe_account_assignment_creation_status(
-                    InstanceArn=INSTANCE_ARN,
-                    AccountAssignmentCreationRequestId=assignment_request_id
-                )
-                
-                status = status_response['AccountAssignmentCreationStatus']['Status']
-                print(f"✓ Assignment status check {attempt + 1}/{max_attempts}: {status}")
-                
-                if status == 'SUCCEEDED':
-                    print(f"✓✓✓ Account assignment SUCCEEDED!")
-                    break
-                elif status == 'FAILED':
-                    failure_reason = status_response['AccountAssignmentCreationStatus'].get('FailureReason', 'Unknown')
-                    error_msg = f"Account assignment FAILED: {failure_reason}"
-                    print(f"✗✗✗ {error_msg}")
-                    raise Exception(error_msg)
-                elif status in ['IN_PROGRESS']:
-                    time.sleep(2)
-                    attempt += 1
-                else:
-                    print(f"Unknown status: {status}, continuing...")
-                    break
-                    
-            except ClientError as e:
-                print(f"Error checking status: {str(e)}")
-                break
-        
-        if attempt >= max_attempts:
-            print(f"⚠ Warning: Status check timed out after {max_attempts} attempts")
+        wait_for_assignment(assignment_request_id)
         
         # Update DynamoDB record
-        current_timestamp = int(time.time())
-        table.update_item(
-            Key={'RequestId': request_id},
-            UpdateExpression='SET #status = :status, GrantedTimestamp = :granted, ApprovalTimestamp = :approved, AssignmentRequestId = :assign_req_id',
-            ExpressionAttributeNames={
-                '#status': 'Status'
-            },
-            ExpressionAttributeValues={
-                ':status': 'ACTIVE',
-                ':granted': current_timestamp,
-                ':approved': current_timestamp,
-                ':assign_req_id': assignment_request_id
-            }
-        )
+        request_item = transition_request(request_id, 'grant', {'AssignmentRequestId': assignment_request_id})
         
-        print(f"✓ DynamoDB updated with ACTIVE status")
+        logger.info("Request is ACTIVE", request_id=request_id)
         
         # Schedule auto-revocation
         schedule_revocation(request_id, user_id, account_id, permission_set_arn, expiration_timestamp)
         
-        return True
+        return request_item
         
     except ClientError as e:
         error_code = e.response['Error']['Code']
         error_msg = e.response['Error']['Message']
-        print(f"✗ ClientError: {error_code} - {error_msg}")
+        logger.debug("Account assignment ClientError", error_code=error_code, error=error_msg)
         
         if error_code == 'ConflictException':
-            print(f"⚠ Assignment already exists, treating as success")
-            current_timestamp = int(time.time())
-            table.update_item(
-                Key={'RequestId': request_id},
-                UpdateExpression='SET #status = :status, GrantedTimestamp = :granted',
-                ExpressionAttributeNames={'#status': 'Status'},
-                ExpressionAttributeValues={':status': 'ACTIVE', ':granted': current_timestamp}
-            )
-            return True
+            logger.warning("Assignment already exists, treating as success", request_id=request_id)
+            return transition_request(request_id, 'grant')
         else:
+            logger.error("Account assignment failed", error_code=error_code, error=error_msg)
             raise
     except Exception as e:
-        print(f"✗ Unexpected error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error granting access", error=str(e))
         raise
 
 
-def schedule_revocation(request_id, user_id, account_id, permission_set_arn, expiration_timestamp):
-    """Schedule automatic revocation using EventBridge Rule (cron-based)"""
-    try:
-        # Convert Decimal to int if needed
-        if isinstance(expiration_timestamp, Decimal):
-            expiration_timestamp = int(expiration_timestamp)
-        
-        if isinstance(expiration_timestamp, str):
-            expiration_timestamp = int(float(expiration_timestamp))
-        
-        schedule_time = datetime.fromtimestamp(expiration_timestamp, tz=dt.timezone.utc)
-        
-        # EventBridge uses cron expressions - create a one-time rule
-        rule_name = f"revoke-{request_id}"
-        
-        # Cron format: minute hour day month day-of-week year
-        cron_expression = f"cron({schedule_time.minute} {schedule_time.hour} {schedule_time.day} {schedule_time.month} ? {schedule_time.year})"
-        
-        print(f"Scheduling revocation: {rule_name} with cron: {cron_expression}")
-        
-        events = boto3.client('events')
-        
-        # Create EventBridge rule
-        events.put_rule(
-            Name=rule_name,
-            ScheduleExpression=cron_expression,
-            State='ENABLED',
-            Description=f'Auto-revoke JIT access for request {request_id}'
-        )
-        
-        # Add Lambda as target
-        events.put_targets(
-            Rule=rule_name,
-            Targets=[
-                {
-                    'Id': '1',
-                    'Arn': f'arn:aws:lambda:{REGION}:533267321107:function:JIT-Revoke-Access',
-                    'Input': json.dumps({
-                        'request_id': request_id,
-                        'user_id': user_id,
-                        'account_id': account_id,
-                        'permission_set_arn': permission_set_arn
-                    })
-                }
-            ]
-        )
-        
-        print(f"✓ Revocation scheduled successfully using EventBridge Rule")
-        
-        # Update DynamoDB
-        table.update_item(
-            Key={'RequestId': request_id},
-            UpdateExpression='SET RevocationScheduleArn = :arn',
-            ExpressionAttributeValues={
-                ':arn': f'arn:aws:events:{REGION}:533267321107:rule/{rule_name}'
-            }
-        )
-        
-    except Exception as e:
-        print(f"⚠ Error scheduling revocation: {str(e)}")
-        import traceback
-        traceback.print_exc()
-
-
-def send_approval_notification(request_id, user_email, account_name, permission_set, reason):
-    """Send SNS notification for approval request"""
-    try:
-        sns = boto3.client('sns')
-        topic_arn = os.environ.get('SNS_APPROVAL_TOPIC_ARN')
-        
-        if not topic_arn:
-            print("SNS_APPROVAL_TOPIC_ARN not configured, skipping notification")
-            return
-        
-        message = f"""
-JIT Access Approval Required
-
-Request ID: {request_id}
-User: {user_email}
-Account: {account_name}
-Permission Set: {permission_set}
-Reason: {reason}
-
-This is a HIGH RISK access request requiring approval.
-        """
-        
-        sns.publish(
-            TopicArn=topic_arn,
-            Subject=f'JIT Access Approval Required - {user_email}',
-            Message=message
-        )
-        
-        print(f"✓ Approval notification sent")
-        
-    except Exception as e:
-        print(f"⚠ Error sending notification: {str(e)}")
-
-
-def error_response(message):
-    """Return standardized error response"""
-    return {
-        'statusCode': 400,
-        'body': json.dumps({
-            'error': message
-        })
-    }
+@span('wait_for_assignment')
+def wait_for_assignment(assignment_request_id):
+    """Poll an account assignment until it leaves IN_PROGRESS (raises if it FAILED)"""
+    max_attempts = 30  # 60 seconds max
+    attempt = 0
+    
+    while attempt < max_attempts:
+        try:
+            status_response = get_client('sso-admin').describe_account_assignment_creation_status(
+                InstanceArn=INSTANCE_ARN,
+                AccountAssignmentCreationRequestId=assignment_request_id
+            )
+            
+            status = status_response['AccountAssignmentCreationStatus']['Status']
+            logger.debug("Assignment status check", attempt=attempt + 1, max_attempts=max_attempts, status=status)
+            
+            if status == 'SUCCEEDED':
+                logger.info("Account assignment succeeded", attempts=attempt + 1)
+                break
+            elif status == 'FAILED':
+                failure_reason = status_response['AccountAssignmentCreationStatus'].get('FailureReason', 'Unknown')
+                error_msg = f"Account assignment FAILED: {failure_reason}"
+                logger.error("Account assignment failed", reason=failure_reason)
+                raise Exception(error_msg)
+            elif status in ['IN_PROGRESS']:
+                time.sleep(2)
+                attempt += 1
+            else:
+                logger.warning("Unknown assignment status, continuing", status=status)
+                break
+                
+        except ClientError as e:
+            logger.warning("Error checking assignment status", error=str(e))
+            break
+    
+    if attempt >= max_attempts:
+        logger.warning("Assignment status check timed out", attempts=max_attempts)
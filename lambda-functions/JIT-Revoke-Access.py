@@ -1,21 +1,25 @@
 import json
-import boto3
 import os
 import time
-from botocore.exceptions import ClientError
-
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-sso_admin = boto3.client('sso-admin')
-scheduler = boto3.client('scheduler')
-
-# Environment variables
-TABLE_NAME = os.environ['DYNAMODB_TABLE']
-INSTANCE_ARN = os.environ['IDENTITY_CENTER_INSTANCE_ARN']
-REGION = os.environ['REGION']
-
-table = dynamodb.Table(TABLE_NAME)
-
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Key, Attr
+from jit_core import (
+    TransitionConflict, bind, delete_assignment, delete_revocation_schedule, error_response, get_logger,
+    get_table, notify_transition, reschedule_revocation, traced, transition_request
+)
+from jit_core.lifecycle import ACTIVE
+
+logger = get_logger('JIT-Revoke-Access')
+
+# Sweeper mode: revoke every expired ACTIVE grant on a fixed cadence
+# SWEEPER_INDEX may name a Status-ExpirationTimestamp GSI; otherwise the
+# Status-RequestTimestamp index is queried with an expiry filter
+STATUS_INDEX = 'Status-RequestTimestamp-index'
+SWEEPER_INDEX = os.environ.get('SWEEPER_INDEX')
+SWEEPER_MAX_ITEMS = int(os.environ.get('SWEEPER_MAX_ITEMS', 500))
+SWEEPER_MAX_WORKERS = int(os.environ.get('SWEEPER_MAX_WORKERS', 10))
+
+@traced
 def lambda_handler(event, context):
     """
     Revoke JIT access by deleting Identity Center account assignment
@@ -24,121 +28,80 @@ def lambda_handler(event, context):
         "request_id": "uuid",
         "user_id": "user-id-from-identity-center",
         "account_id": "123456789012",
-        "permission_set_arn": "arn:aws:sso:::permissionSet/..."
+        "permission_set_arn": "arn:aws:sso:::permissionSet/...",
+        "expires_at": 1733499000
     }
+    Sweeper mode is triggered by an EventBridge rate rule or {"mode": "sweep"}
     """
     
+    if event.get('mode') == 'sweep' or event.get('detail-type') == 'Scheduled Event':
+        return sweep_expired_grants()
+    
+    request_item = None
     try:
-        print(f"Revocation triggered: {json.dumps(event)}")
-        
         # Extract parameters
         request_id = event.get('request_id')
         user_id = event.get('user_id')
         account_id = event.get('account_id')
         permission_set_arn = event.get('permission_set_arn')
         
+        bind(request_id=request_id)
+        logger.info("Revocation triggered", user_id=user_id, account_id=account_id, permission_set_arn=permission_set_arn)
+        
         # Validation
         if not all([request_id, user_id, account_id, permission_set_arn]):
             return error_response('Missing required parameters')
         
-        # Get request details from DynamoDB
-        response = table.get_item(Key={'RequestId': request_id})
-        
-        if 'Item' not in response:
-            return error_response(f'Request {request_id} not found')
-        
-        request_item = response['Item']
-        current_status = request_item.get('Status')
-        
-        # Only revoke if access is currently active
-        if current_status != 'ACTIVE':
-            print(f"Request {request_id} status is {current_status}, skipping revocation")
+        # Only revoke if access is currently active and expired: one conditional
+        # write marks the grant REVOKED and returns it, so a manual revoke, the
+        # sweeper or a duplicate schedule firing cannot revoke (and email) twice.
+        # The grant counts as expired if its expiry is no later than the one this
+        # revocation was scheduled for: cron rules only have minute precision, and
+        # rules created without expires_at fire somewhere in their expiry's minute
+        now = int(time.time())
+        expires_by = (now // 60) * 60 + 59
+        if event.get('expires_at'):
+            expires_by = min(int(event['expires_at']), expires_by)
+        try:
+            request_item = transition_request(request_id, 'expire', expires_by=expires_by)
+        except TransitionConflict as e:
+            if e.current is None:
+                return error_response(f'Request {request_id} not found')
+            if e.current_status == ACTIVE:
+                # Extended since this revocation was scheduled: move it to the new expiry
+                expiration_timestamp = int(e.current['ExpirationTimestamp'])
+                logger.info("Grant not expired yet, rescheduling", expires_at=expiration_timestamp)
+                reschedule_revocation(e.current, expiration_timestamp)
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({
+                        'message': 'Access not expired yet, revocation rescheduled',
+                        'request_id': request_id,
+                        'expires_at': expiration_timestamp
+                    })
+                }
+            logger.info("No revocation needed", status=e.current_status)
             return {
                 'statusCode': 200,
                 'body': json.dumps({
-                    'message': f'No revocation needed, status is {current_status}',
+                    'message': f'No revocation needed, status is {e.current_status}',
                     'request_id': request_id
                 })
             }
         
         # Delete account assignment in Identity Center
-        print(f"Revoking access for user {user_id} on account {account_id}")
+        logger.info("Revoking access", user_id=user_id, account_id=account_id)
         
-        try:
-            response = sso_admin.delete_account_assignment(
-                InstanceArn=INSTANCE_ARN,
-                TargetId=account_id,
-                TargetType='AWS_ACCOUNT',
-                PermissionSetArn=permission_set_arn,
-                PrincipalType='USER',
-                PrincipalId=user_id
-            )
-            
-            deletion_status = response['AccountAssignmentDeletionStatus']['Status']
-            print(f"Account assignment deletion initiated: {deletion_status}")
-            
-        except ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code == 'ResourceNotFoundException':
-                print(f"Assignment already deleted for user {user_id}")
-            else:
-                raise
-        
-        # Update DynamoDB record
-        current_timestamp = int(time.time())
-        table.update_item(
-            Key={'RequestId': request_id},
-            UpdateExpression='SET #status = :status, RevokedTimestamp = :revoked',
-            ExpressionAttributeNames={
-                '#status': 'Status'
-            },
-            ExpressionAttributeValues={
-                ':status': 'REVOKED',
-                ':revoked': current_timestamp
-            }
-        )
-
-        # Update DynamoDB record
-        current_timestamp = int(time.time())
-        table.update_item(
-            Key={'RequestId': request_id},
-            UpdateExpression='SET #status = :status, RevokedTimestamp = :revoked',
-            ExpressionAttributeNames={
-                '#status': 'Status'
-            },
-            ExpressionAttributeValues={
-                ':status': 'REVOKED',
-                ':revoked': current_timestamp
-            }
-        )
+        deletion_status = delete_assignment(request_item)
+        if deletion_status:
+            logger.info("Account assignment deletion initiated", status=deletion_status)
         
         # Send revocation email
-        email_subject = f"⏱ JIT Access REVOKED - {request_item.get('PermissionSet')}"
-        email_body = f"""
-Your JIT access has been automatically REVOKED as the time limit has expired.
-
-Account: {request_item.get('AccountName')}
-Permission Set: {request_item.get('PermissionSet')}
-Access Duration: {request_item.get('DurationMinutes')} minutes
-
-If you still need access, please submit a new request through the JIT Access Portal.
-
-Request ID: {request_id}
-"""
-        send_user_notification(request_item.get('UserEmail'), email_subject, email_body)
+        notify_transition('expire', request_item)
         
         # Clean up EventBridge schedule
         schedule_arn = request_item.get('RevocationScheduleArn')
-        if schedule_arn:
-            schedule_name = schedule_arn.split('/')[-1]
-            try:
-                scheduler.delete_schedule(
-                    Name=schedule_name,
-                    GroupName='default'
-                )
-                print(f"Deleted schedule: {schedule_name}")
-            except Exception as e:
-                print(f"Error deleting schedule: {str(e)}")
+        delete_revocation_schedule(schedule_arn)
         
         return {
             'statusCode': 200,
@@ -148,82 +111,105 @@ Request ID: {request_id}
                 'user_email': request_item.get('UserEmail'),
                 'account': request_item.get('AccountName'),
                 'permission_set': request_item.get('PermissionSet'),
-                'revoked_at': current_timestamp
+                'revoked_at': int(request_item['RevokedTimestamp'])
             })
         }
         
     except Exception as e:
-        print(f"Error revoking access: {str(e)}")
+        logger.exception("Error revoking access", error=str(e))
         
-        # Update DynamoDB to mark as error
-        try:
-            table.update_item(
-                Key={'RequestId': request_id},
-                UpdateExpression='SET #status = :status, ErrorMessage = :error',
-                ExpressionAttributeNames={
-                    '#status': 'Status'
-                },
-                ExpressionAttributeValues={
-                    ':status': 'ERROR',
-                    ':error': str(e)
-                }
-            )
-        except:
-            pass
+        # Mark our REVOKED claim as failed (only if nobody changed it since)
+        if request_item is not None:
+            try:
+                transition_request(request_id, 'revoke_failed', {'ErrorMessage': str(e)}, version=request_item['Version'])
+            except Exception:
+                pass
         
         return error_response(f'Revocation failed: {str(e)}')
 
-        # Send revocation email
-        email_subject = f"⏱ JIT Access REVOKED - {request_item.get('PermissionSet')}"
-        email_body = f"""
-Your JIT access has been automatically REVOKED as the time limit has expired.
-
-Account: {request_item.get('AccountName')}
-Permission Set: {request_item.get('PermissionSet')}
-Access Duration: {request_item.get('DurationMinutes')} minutes
 
-If you still need access, please submit a new request through the JIT Access Portal.
-
-Request ID: {request_id}
-"""
-        send_user_notification(request_item.get('UserEmail'), email_subject, email_body)
+def sweep_expired_grants():
+    """Find ACTIVE grants past their ExpirationTimestamp and revoke them in batches"""
+    now = int(time.time())
+    
+    if SWEEPER_INDEX:
+        query_args = {
+            'IndexName': SWEEPER_INDEX,
+            'KeyConditionExpression': Key('Status').eq(ACTIVE) & Key('ExpirationTimestamp').lte(now)
+        }
+    else:
+        query_args = {
+            'IndexName': STATUS_INDEX,
+            'KeyConditionExpression': Key('Status').eq(ACTIVE),
+            'FilterExpression': Attr('ExpirationTimestamp').lte(now)
+        }
+    
+    summary = {'REVOKED': 0, 'SKIPPED': 0, 'FAILED': 0}
+    processed = 0
+    
+    with ThreadPoolExecutor(max_workers=SWEEPER_MAX_WORKERS) as executor:
+        while processed < SWEEPER_MAX_ITEMS:
+            query_args['Limit'] = SWEEPER_MAX_ITEMS - processed
+            response = get_table().query(**query_args)
+            expired_items = response.get('Items', [])
+            
+            # Revoke each page concurrently before fetching the next one
+            for status in executor.map(revoke_expired_grant, expired_items):
+                summary[status] += 1
+            processed += len(expired_items)
+            
+            if not response.get('LastEvaluatedKey'):
+                break
+            query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    logger.info("Sweep complete", revoked=summary['REVOKED'], skipped=summary['SKIPPED'], failed=summary['FAILED'])
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': 'Sweep complete',
+            'swept_at': now,
+            'revoked': summary['REVOKED'],
+            'skipped': summary['SKIPPED'],
+            'failed': summary['FAILED']
+        })
+    }
 
 
-def send_user_notification(user_email, subject, message):
-    """Send email notification to user via SES"""
+def revoke_expired_grant(request_item):
+    """
+    Revoke one expired grant for the sweeper, returning REVOKED, SKIPPED or FAILED
+    The grant is claimed first; if the assignment cannot be deleted it goes back
+    to ACTIVE so the next sweep retries it. Runs in a worker thread.
+    """
+    request_id = request_item['RequestId']
+    
     try:
-        ses = boto3.client('ses', region_name='us-east-1')
-        
-        ses.send_email(
-            Source='felixayo85@gmail.com',  # Must be a verified email in SES
-            Destination={
-                'ToAddresses': [user_email]
-            },
-            Message={
-                'Subject': {
-                    'Data': subject,
-                    'Charset': 'UTF-8'
-                },
-                'Body': {
-                    'Text': {
-                        'Data': message,
-                        'Charset': 'UTF-8'
-                    }
-                }
-            }
-        )
-        
-        print(f"✓ Email sent to {user_email}: {subject}")
+        # Skip grants a manual revoke got to first, or extended since the query
+        request_item = transition_request(request_id, 'expire')
+    except TransitionConflict:
+        return 'SKIPPED'
+    except Exception as e:
+        logger.error("Sweeper failed to revoke grant", request_id=request_id, error=str(e))
+        return 'FAILED'
+    
+    try:
+        delete_assignment(request_item)
+    except Exception as e:
+        logger.error("Sweeper failed to revoke grant", request_id=request_id, error=str(e))
+        try:
+            transition_request(request_id, 'restore', version=request_item['Version'])
+        except Exception as restore_error:
+            logger.error("Error restoring grant to ACTIVE", request_id=request_id, error=str(restore_error))
+        return 'FAILED'
+    
+    try:
+        notify_transition('expire', request_item)
         
+        # Grants created before switching to sweeper mode may still have a schedule
+        delete_revocation_schedule(request_item.get('RevocationScheduleArn'))
     except Exception as e:
-        print(f"⚠ Error sending email: {str(e)}")        
-
+        logger.warning("Error notifying about revoked grant", request_id=request_id, error=str(e))
+    
+    return 'REVOKED'
 
-def error_response(message):
-    """Return standardized error response"""
-    return {
-        'statusCode': 400,
-        'body': json.dumps({
-            'error': message
-        })
-    }
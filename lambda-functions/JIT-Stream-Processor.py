@@ -0,0 +1,214 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from jit_core import (
+    TransitionConflict, delete_assignment, expand_item, get_client, get_logger, load_config, notify_transition,
+    provisioning_message, publish_change, record_change, reschedule_revocation, schedule_revocation,
+    send_approval_notification, send_templated_notification, to_json, traced, transition_request
+)
+from jit_core.lifecycle import ACTIVE, DENIED, FAILED, PENDING, PROVISIONING, REVOKED
+
+logger = get_logger('JIT-Stream-Processor')
+
+# Environment variables
+config = load_config()
+INSTANCE_ARN = config.instance_arn
+
+# SIDE_EFFECT_MODE=stream: grant, schedule and notify from the stream (otherwise only STATS_TABLE is maintained)
+STREAM_SIDE_EFFECTS = config.side_effect_mode == 'stream'
+
+# Live portal updates over the WebSocket API (CONNECTIONS_TABLE and WEBSOCKET_ENDPOINT)
+PUSH_ENABLED = bool(config.connections_table_name and config.websocket_endpoint)
+
+# Assignments that are still IN_PROGRESS are finalized by JIT-Provisioning-Worker
+PROVISIONING_QUEUE_URL = os.environ.get('PROVISIONING_QUEUE_URL')
+if STREAM_SIDE_EFFECTS and not PROVISIONING_QUEUE_URL:
+    raise RuntimeError("SIDE_EFFECT_MODE=stream requires PROVISIONING_QUEUE_URL (JIT-Provisioning-Worker)")
+PROVISIONING_BASE_DELAY_SECONDS = int(os.environ.get('PROVISIONING_BASE_DELAY_SECONDS', 2))
+
+# Requests processed concurrently within one batch (records of the same request stay in order)
+STREAM_MAX_WORKERS = int(os.environ.get('STREAM_MAX_WORKERS', 10))
+
+deserializer = TypeDeserializer()
+
+@traced
+def lambda_handler(event, context):
+    """
+    Perform the side effects of request status changes (SIDE_EFFECT_MODE=stream),
+    keep the dashboard aggregates in STATS_TABLE up to date and push changes to
+    subscribed portal connections
+    Triggered by the requests table stream (NEW_AND_OLD_IMAGES) with
+    ReportBatchItemFailures enabled. Records are grouped by request: groups run
+    concurrently, each in stream order, and stop at their first failure. Lambda
+    retries from the earliest failed record, so reactions may run again: their
+    writes are conditional, and their emails carry dedupe keys that
+    JIT-Notification-Worker (NOTIFICATION_QUEUE_URL) uses to send them once.
+    Without the outbox a retried email is sent again.
+    """
+
+    groups = {}
+    for record in event.get('Records', []):
+        groups.setdefault(record['dynamodb']['Keys']['RequestId']['S'], []).append(record)
+
+    if not groups:
+        return {'batchItemFailures': []}
+
+    with ThreadPoolExecutor(max_workers=min(STREAM_MAX_WORKERS, len(groups))) as executor:
+        failed = [record for record in executor.map(process_records, groups.values()) if record]
+
+    logger.info("Stream batch processed", records=len(event['Records']), requests=len(groups), failed=len(failed))
+
+    return {'batchItemFailures': [{'itemIdentifier': record['dynamodb']['SequenceNumber']} for record in failed]}
+
+
+def process_records(records):
+    """Process one request's records in order, returning the first that failed (None when all succeeded)"""
+    for record in records:
+        try:
+            process_record(record)
+        except Exception as e:
+            logger.exception("Error processing stream record", event_id=record.get('eventID'), error=str(e))
+            return record
+    return None
+
+
+def process_record(record):
+    """Count and react to the change recorded by one stream record"""
+    images = record['dynamodb']
+    if record['eventName'] != 'INSERT' and 'OldImage' not in images:
+        logger.warning("Stream record has no old image, the stream view type must be NEW_AND_OLD_IMAGES")
+        return
+
+    new_item = load_image(images['NewImage']) if 'NewImage' in images else None
+    old_item = load_image(images['OldImage']) if 'OldImage' in images else None
+
+    # JIT-Archiver stamping an archived request for TTL deletion changes nothing to count, react to or push
+    if new_item and 'ArchivedAt' in new_item and 'ArchivedAt' not in (old_item or {}):
+        return
+
+    # Counted first: a reaction that fails is retried, the counters are not moved twice
+    if config.stats_table_name:
+        record_change(old_item, new_item, images.get('ApproximateCreationDateTime'))
+
+    if STREAM_SIDE_EFFECTS and new_item:
+        react(old_item, new_item)
+
+    # Best effort (the portal also refreshes itself); redelivered records are pushed again
+    if PUSH_ENABLED and new_item:
+        try:
+            publish_change(old_item, new_item)
+        except Exception as e:
+            logger.warning("Push of request change failed", request_id=new_item['RequestId'], error=str(e))
+
+
+def react(old_item, new_item):
+    """Perform the side effects of a status change (or extension)"""
+    old_status, status = old_item and old_item.get('Status'), new_item.get('Status')
+
+    if old_status is None and status == PENDING:
+        send_approval_notification(new_item['RequestId'], new_item['UserEmail'], new_item['AccountName'],
+                                   new_item['PermissionSet'], new_item.get('Reason'))
+    elif old_status in (None, PENDING) and status == PROVISIONING:
+        start_grant(new_item)
+    elif old_status == PROVISIONING and status == ACTIVE:
+        activate_grant(new_item)
+    elif old_status == PROVISIONING and status == FAILED:
+        notify_transition('provisioning_failed', new_item)
+    elif old_status == PENDING and status == DENIED:
+        notify_transition('deny', new_item)
+    elif old_status == ACTIVE and status == ACTIVE and is_extension(old_item, new_item):
+        extend_grant(new_item)
+    # Everything else (revocations, schedule ARN updates, ...) is handled by the function that wrote it
+
+
+def load_image(image):
+    """A stream image (DynamoDB JSON) as a request item"""
+    return expand_item({name: deserializer.deserialize(value) for name, value in image.items()})
+
+
+def start_grant(request_item):
+    """
+    Create the account assignment for a PROVISIONING request
+    A finished assignment is finalized here; one still IN_PROGRESS goes to
+    JIT-Provisioning-Worker, so the stream is never blocked polling it
+    """
+    request_id = request_item['RequestId']
+
+    try:
+        response = get_client('sso-admin').create_account_assignment(
+            InstanceArn=INSTANCE_ARN,
+            TargetId=request_item['AccountId'],
+            TargetType='AWS_ACCOUNT',
+            PermissionSetArn=request_item['PermissionSetArn'],
+            PrincipalType='USER',
+            PrincipalId=request_item['UserId']
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConflictException':
+            # Already assigned (or a redelivered record) - nothing left to wait for
+            logger.warning("Assignment already exists, treating as success", request_id=request_id)
+            finalize(request_item, 'provisioned')
+        else:
+            logger.error("Account assignment failed", request_id=request_id, error=str(e))
+            finalize(request_item, 'provisioning_failed', {'ErrorMessage': str(e)})
+        return
+
+    assignment = response['AccountAssignmentCreationStatus']
+    logger.info("Account assignment requested", request_id=request_id, status=assignment['Status'])
+
+    if assignment['Status'] == 'SUCCEEDED':
+        finalize(request_item, 'provisioned', {'AssignmentRequestId': assignment['RequestId']})
+    elif assignment['Status'] == 'FAILED':
+        error_message = f"Account assignment FAILED: {assignment.get('FailureReason', 'Unknown')}"
+        finalize(request_item, 'provisioning_failed', {'ErrorMessage': error_message})
+    else:
+        get_client('sqs').send_message(
+            QueueUrl=PROVISIONING_QUEUE_URL,
+            DelaySeconds=PROVISIONING_BASE_DELAY_SECONDS,
+            MessageBody=to_json(provisioning_message(request_item, assignment['RequestId']))
+        )
+
+
+def finalize(request_item, transition, attributes=None):
+    """Apply the transition that ends provisioning; its own stream record triggers the notification"""
+    request_id = request_item['RequestId']
+
+    try:
+        transition_request(request_id, transition, attributes)
+    except TransitionConflict as e:
+        if transition == 'provisioned' and e.current_status == REVOKED:
+            # Cancelled by a bulk revocation before the assignment was made
+            logger.info("Request was revoked while provisioning, deleting the assignment", request_id=request_id)
+            delete_assignment(request_item)
+        else:
+            logger.info("Request is no longer PROVISIONING, skipping", request_id=request_id, status=e.current_status)
+
+
+def activate_grant(request_item):
+    """Schedule revocation of a grant that became ACTIVE and notify the user"""
+    approved = bool(request_item.get('ApproverEmail'))
+
+    # Approved grants use EventBridge Scheduler, like JIT-Approval-Handler does inline
+    schedule_revocation(request_item['RequestId'], request_item['UserId'], request_item['AccountId'],
+                        request_item['PermissionSetArn'], request_item['ExpirationTimestamp'],
+                        method='scheduler' if approved else 'rule')
+
+    notify_transition('approve' if approved else 'provisioned', request_item)
+
+
+def is_extension(old_item, new_item):
+    return int(new_item.get('ExpirationTimestamp', 0)) > int(old_item.get('ExpirationTimestamp', 0))
+
+
+def extend_grant(request_item):
+    """Move the revocation of an extended ACTIVE grant and tell the user"""
+    expiration_timestamp = int(request_item['ExpirationTimestamp'])
+    reschedule_revocation(request_item, expiration_timestamp)
+
+    send_templated_notification(request_item['UserEmail'], 'extended', {
+        'account': request_item['AccountName'],
+        'permission_set': request_item['PermissionSet'],
+        'expires': expiration_timestamp,
+        'request_id': request_item['RequestId']
+    }, dedupe_key=f"{request_item['RequestId']}:EXTENDED:{expiration_timestamp}")
@@ -0,0 +1,61 @@
+from jit_core import api_response, bind, get_logger, load_config, subscribe, traced, unsubscribe, user_channel
+from jit_core.push import APPROVALS_CHANNEL
+
+logger = get_logger('JIT-WebSocket-Handler')
+
+# Environment variables
+config = load_config()
+
+# Cognito group whose members may subscribe to the approvals channel
+MANAGERS_GROUP = 'Managers'
+
+@traced
+def lambda_handler(event, context):
+    """
+    Connection routes of the WebSocket API for live portal updates
+    $connect subscribes the connection to its channels (the user's own requests,
+    plus approvals for managers), $disconnect removes it and $default answers
+    the portal's keep-alive messages. Changes are pushed by JIT-Stream-Processor.
+    """
+
+    request_context = event.get('requestContext', {})
+    route_key = request_context.get('routeKey')
+    connection_id = request_context.get('connectionId')
+    bind(connection_id=connection_id, route=route_key)
+
+    try:
+        if route_key == '$connect':
+            return connect(connection_id, request_context.get('authorizer') or {})
+        if route_key == '$disconnect':
+            unsubscribe(connection_id)
+            logger.info("Connection closed")
+            return api_response(200, {'message': 'Disconnected'})
+        return api_response(200, {'message': 'pong'})
+
+    except Exception as e:
+        logger.exception("Error handling WebSocket route", error=str(e))
+        return api_response(500, {'error': f'Internal error: {str(e)}'})
+
+
+def connect(connection_id, authorizer):
+    """
+    Subscribe a new connection
+    Identity comes only from the $connect authorizer context (email, groups),
+    set by the Lambda authorizer that validates the portal's ID token. Without
+    it the connection is refused (API Gateway closes it on a non-2xx status).
+    """
+    email = authorizer.get('email')
+    if not email:
+        logger.warning("Connection refused, no authorizer identity")
+        return api_response(403, {'error': 'Unauthorized'})
+
+    managers = MANAGERS_GROUP in (authorizer.get('groups') or '').split(',')
+
+    channels = [user_channel(email)]
+    if managers:
+        channels.append(APPROVALS_CHANNEL)
+
+    subscribe(connection_id, channels)
+    logger.info("Connection subscribed", channels=channels)
+
+    return api_response(200, {'message': 'Connected', 'channels': channels})
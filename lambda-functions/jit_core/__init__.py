@@ -0,0 +1,90 @@
+"""
+Shared helpers for the JIT access Lambdas
+Bundle this package with every function (or publish it as a Lambda layer)
+"""
+
+from .archive import read_partition, search_archive, write_partition
+from .assignments import delete_assignment, provisioning_message
+from .cache import TTLCache, cache_stats, get_cache, invalidate_all
+from .clients import get_client, get_table, reset_clients, set_client
+from .config import Config, load_config
+from .idempotency import idempotency_key_from, run_idempotent
+from .lifecycle import TransitionConflict, notify_transition, transition_many, transition_request
+from .log import bind, get_logger
+from .notifications import (
+    deliver_notification,
+    send_approval_notification,
+    send_templated_notification,
+    send_topic_notification,
+    send_user_notification,
+)
+from .push import publish_change, subscribe, unsubscribe, user_channel
+from .responses import api_response, decimal_default, error_response, not_modified, to_json
+from .schema import compact_item, expand_item, projection
+from .scheduling import (
+    create_revocation_rule,
+    create_revocation_schedule,
+    delete_revocation_schedule,
+    reschedule_revocation,
+    schedule_revocation,
+)
+from .stats import read_stats, read_version, record_change
+from .templates import format_timestamp, render_digest, render_notification
+from .tracing import record_call, span, traced
+
+__all__ = [
+    'Config',
+    'TTLCache',
+    'TransitionConflict',
+    'api_response',
+    'bind',
+    'cache_stats',
+    'compact_item',
+    'create_revocation_rule',
+    'create_revocation_schedule',
+    'decimal_default',
+    'delete_assignment',
+    'delete_revocation_schedule',
+    'deliver_notification',
+    'error_response',
+    'expand_item',
+    'format_timestamp',
+    'get_cache',
+    'get_client',
+    'get_logger',
+    'get_table',
+    'idempotency_key_from',
+    'invalidate_all',
+    'load_config',
+    'not_modified',
+    'notify_transition',
+    'projection',
+    'provisioning_message',
+    'publish_change',
+    'read_partition',
+    'read_stats',
+    'read_version',
+    'record_call',
+    'record_change',
+    'render_digest',
+    'render_notification',
+    'reschedule_revocation',
+    'reset_clients',
+    'run_idempotent',
+    'schedule_revocation',
+    'search_archive',
+    'send_approval_notification',
+    'send_templated_notification',
+    'send_topic_notification',
+    'send_user_notification',
+    'set_client',
+    'span',
+    'subscribe',
+    'to_json',
+    'traced',
+    'transition_many',
+    'transition_request',
+    'unsubscribe',
+    'user_channel',
+    'write_partition',
+]
@@ -0,0 +1,96 @@
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from .clients import get_client
+from .config import load_config
+from .log import get_logger
+from .responses import to_json
+from .schema import change_day
+
+logger = get_logger('jit_core.archive')
+
+# Closed requests moved out of the requests table by JIT-Archiver. Each run
+# writes the requests it archives to ARCHIVE_BUCKET as gzip-compressed JSON
+# Lines (one full item per line), partitioned Hive-style by the UTC day of the
+# request and its account, so Athena can query the archive as well:
+#
+#   <ARCHIVE_PREFIX>day=<YYYY-MM-DD>/account=<AccountName>/<run>.jsonl.gz
+#
+# Archived items are then stamped with ArchivedAt, ArchiveKey and ExpiresAt
+# (the requests table's TTL attribute) and DynamoDB deletes them. A run that
+# stops between the two steps archives the same requests again later, so
+# readers keep one copy per RequestId (the highest Version).
+
+ARCHIVE_SUFFIX = '.jsonl.gz'
+ARCHIVE_READ_MAX_WORKERS = 10
+
+
+def partition_prefix(day, account_name=None):
+    """Key prefix of a day's partitions (or of one account's partition that day)"""
+    prefix = f'{load_config().archive_prefix}day={day}/'
+    return f'{prefix}account={account_name}/' if account_name else prefix
+
+
+def write_partition(day, account_name, items, name):
+    """Write items as one compressed object of the day/account partition; returns its key"""
+    key = f'{partition_prefix(day, account_name)}{name}{ARCHIVE_SUFFIX}'
+    body = gzip.compress(''.join(to_json(item) + '\n' for item in items).encode('utf-8'))
+    get_client('s3').put_object(
+        Bucket=load_config().archive_bucket,
+        Key=key,
+        Body=body,
+        ContentType='application/x-ndjson'
+    )
+    logger.debug("Archive object written", key=key, items=len(items), bytes=len(body))
+    return key
+
+
+def read_partition(key):
+    """The items of one archive object"""
+    response = get_client('s3').get_object(Bucket=load_config().archive_bucket, Key=key)
+    lines = gzip.decompress(response['Body'].read()).decode('utf-8').splitlines()
+    return [json.loads(line) for line in lines if line]
+
+
+def list_partitions(day, account_names=None):
+    """Keys of the archive objects of a day (paginated ListObjectsV2), optionally of some accounts only"""
+    list_args = {'Bucket': load_config().archive_bucket, 'Prefix': partition_prefix(day)}
+    prefixes = tuple(partition_prefix(day, name) for name in account_names) if account_names else None
+    keys = []
+    while True:
+        response = get_client('s3').list_objects_v2(**list_args)
+        keys.extend(
+            entry['Key'] for entry in response.get('Contents', [])
+            if entry['Key'].endswith(ARCHIVE_SUFFIX) and (prefixes is None or entry['Key'].startswith(prefixes))
+        )
+        if not response.get('IsTruncated'):
+            return keys
+        list_args['ContinuationToken'] = response['NextContinuationToken']
+
+
+def search_archive(since, until, account_names=None, predicate=None):
+    """
+    Archived requests made between since and until (epoch seconds, inclusive)
+    One listing per day partition, then every matching object is read
+    concurrently. predicate(item) narrows the result further. Returns one item
+    per RequestId, newest request first.
+    """
+    days = sorted({change_day(timestamp) for timestamp in range(int(since), int(until) + 1, 86400)} | {change_day(until)})
+
+    with ThreadPoolExecutor(max_workers=ARCHIVE_READ_MAX_WORKERS) as executor:
+        keys = [key for day_keys in executor.map(lambda day: list_partitions(day, account_names), days) for key in day_keys]
+        partitions = list(executor.map(read_partition, keys))
+
+    latest = {}
+    for item in (item for items in partitions for item in items):
+        current = latest.get(item['RequestId'])
+        if current is None or int(item.get('Version', 0)) > int(current.get('Version', 0)):
+            latest[item['RequestId']] = item
+
+    matches = [
+        item for item in latest.values()
+        if since <= int(item.get('RequestTimestamp', 0)) <= until and (predicate is None or predicate(item))
+    ]
+    logger.debug("Archive searched", days=len(days), objects=len(keys), matches=len(matches))
+    return sorted(matches, key=lambda item: (int(item.get('RequestTimestamp', 0)), item['RequestId']), reverse=True)
@@ -0,0 +1,52 @@
+from botocore.exceptions import ClientError
+
+from .clients import get_client
+from .config import load_config
+from .log import get_logger
+
+logger = get_logger('jit_core.assignments')
+
+
+def delete_assignment(request_item):
+    """
+    Delete a grant's Identity Center account assignment
+    Returns the deletion status, or None when the assignment was already gone
+    (which counts as success). Safe to call from worker threads.
+    """
+    try:
+        response = get_client('sso-admin').delete_account_assignment(
+            InstanceArn=load_config().instance_arn,
+            TargetId=request_item['AccountId'],
+            TargetType='AWS_ACCOUNT',
+            PermissionSetArn=request_item['PermissionSetArn'],
+            PrincipalType='USER',
+            PrincipalId=request_item['UserId']
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ResourceNotFoundException':
+            raise
+        logger.warning("Assignment already deleted", request_id=request_item.get('RequestId'),
+                       user_id=request_item['UserId'])
+        return None
+
+    return response['AccountAssignmentDeletionStatus']['Status']
+
+
+def provisioning_message(request_item, assignment_request_id=None):
+    """
+    The JIT-Provisioning-Worker message for a PROVISIONING request
+    assignment_request_id defaults to the request's AssignmentRequestId
+    """
+    return {
+        'request_id': request_item['RequestId'],
+        'assignment_request_id': assignment_request_id or request_item.get('AssignmentRequestId'),
+        'attempt': 0,
+        'user_id': request_item['UserId'],
+        'user_email': request_item['UserEmail'],
+        'account_id': request_item['AccountId'],
+        'account_name': request_item['AccountName'],
+        'permission_set': request_item['PermissionSet'],
+        'permission_set_arn': request_item['PermissionSetArn'],
+        'expiration_timestamp': request_item['ExpirationTimestamp'],
+        'duration_minutes': request_item['DurationMinutes']
+    }
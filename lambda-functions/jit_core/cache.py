@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Sentinel so cached None values can be told apart from misses
+_MISSING = object()
+
+# Named caches shared by everything loaded in this container
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache with per-entry TTL
+    Lives for the life of the Lambda container, so warm invocations reuse it
+    """
+
+    def __init__(self, name, maxsize=256, ttl_seconds=300, clock=time.monotonic, holds_data=True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        # False for caches of resources rather than data (boto3 clients), which invalidate_all keeps
+        self.holds_data = holds_data
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl_seconds=None):
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires_at = self.clock() + ttl if ttl else None
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, cache_none=False):
+        """Return the cached value, calling loader(key) and caching the result on a miss"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = loader(key)
+        if value is not None or cache_none:
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss counters for logging"""
+        with self._lock:
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+def get_cache(name, maxsize=256, ttl_seconds=300, holds_data=True):
+    """Return the named container-wide cache, creating it on first use"""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = TTLCache(name, maxsize=maxsize, ttl_seconds=ttl_seconds, holds_data=holds_data)
+        return _caches[name]
+
+
+def invalidate_all():
+    """
+    Clear every named data cache (e.g. after changing Identity Center users)
+    The boto3 client cache is kept; use reset_clients() to drop it.
+    """
+    with _caches_lock:
+        caches = [cache for cache in _caches.values() if cache.holds_data]
+
+    for cache in caches:
+        cache.invalidate()
+
+
+def cache_stats():
+    """Return stats for every named cache"""
+    with _caches_lock:
+        caches = list(_caches.values())
+
+    return [cache.stats() for cache in caches]
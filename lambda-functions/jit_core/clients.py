@@ -0,0 +1,50 @@
+from .cache import get_cache
+from .config import load_config
+from .tracing import instrument
+
+# boto3 clients/resources are created on first use and kept for the life of the
+# container, so handlers only read their configuration at import. boto3 itself is
+# imported where it is first needed (here, in schema and in push): code that
+# never touches AWS skips its import cost.
+_clients = get_cache('clients', maxsize=32, ttl_seconds=0, holds_data=False)
+
+
+def get_client(service_name):
+    """Return a boto3 client, created on first use and reused across warm invocations"""
+    return _clients.get_or_load(service_name, _create_client)
+
+
+def get_table(table_name=None):
+    """Return a DynamoDB Table resource (defaults to the requests table)"""
+    return _clients.get_or_load(('table', table_name or load_config().table_name), _create_table)
+
+
+def set_client(service_name, client):
+    """Replace a client, e.g. with a botocore Stubber-wrapped client or a fake in benchmarks"""
+    _clients.set(service_name, client)
+
+
+def reset_clients():
+    """Drop every memoized client and table"""
+    _clients.invalidate()
+
+
+def _create_client(service_name):
+    import boto3
+    config = load_config()
+    # The WebSocket management API is called on the API's own endpoint
+    endpoint_url = config.websocket_endpoint if service_name == 'apigatewaymanagementapi' else None
+    return instrument(boto3.client(service_name, region_name=config.region, endpoint_url=endpoint_url))
+
+
+def _create_table(key):
+    _, table_name = key
+    dynamodb = _clients.get_or_load('dynamodb-resource', _create_resource)
+    return dynamodb.Table(table_name)
+
+
+def _create_resource(_):
+    import boto3
+    dynamodb = boto3.resource('dynamodb', region_name=load_config().region)
+    instrument(dynamodb.meta.client)
+    return dynamodb
@@ -0,0 +1,129 @@
+import os
+from dataclasses import dataclass
+
+# Permission set key -> (environment variable, risk level, Identity Center name)
+PERMISSION_SET_ENV = {
+    'S3FullAccess': ('PS_S3_FULL_ACCESS', 'LOW', 'JIT-S3FullAccess'),
+    'EC2FullAccess': ('PS_EC2_FULL_ACCESS', 'LOW', 'JIT-EC2FullAccess'),
+    'EmergencyAdmin': ('PS_EMERGENCY_ADMIN', 'HIGH', 'JIT-EmergencyAdmin')
+}
+
+# Account name -> environment variable
+ACCOUNT_ENV = {
+    'Management': 'MANAGEMENT_ACCOUNT',
+    'LogArchive': 'LOG_ARCHIVE_ACCOUNT',
+    'Audit': 'AUDIT_ACCOUNT'
+}
+
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR']
+
+_config = None
+
+
+@dataclass(frozen=True)
+class Config:
+    """Environment configuration shared by the JIT Lambdas"""
+    table_name: str
+    region: str
+    instance_arn: str
+    identity_store_id: str
+    permission_sets: dict
+    accounts: dict
+    revocation_mode: str
+    side_effect_mode: str
+    sender_email: str
+    automation_account_id: str
+    sns_approval_topic_arn: str
+    trace_format: str
+    log_level: str
+    log_debug_sample_rate: float
+    log_buffer_lines: int
+    notification_queue_url: str
+    notification_timezone: str
+    idempotency_table_name: str
+    idempotency_ttl_seconds: int
+    stats_table_name: str
+    connections_table_name: str
+    websocket_endpoint: str
+    archive_bucket: str
+    archive_prefix: str
+
+    @property
+    def revoke_function_arn(self):
+        return f'arn:aws:lambda:{self.region}:{self.automation_account_id}:function:JIT-Revoke-Access'
+
+    @property
+    def automation_role_arn(self):
+        return f'arn:aws:iam::{self.automation_account_id}:role/JIT-Automation-Role'
+
+
+def load_config(environ=None):
+    """
+    Return the configuration, read from the environment once per container
+    Pass environ to build a fresh Config without touching the cached one
+    """
+    global _config
+
+    if environ is None and _config is not None:
+        return _config
+
+    env = os.environ if environ is None else environ
+    log_level = env.get('LOG_LEVEL', 'INFO').upper()
+
+    config = Config(
+        table_name=env['DYNAMODB_TABLE'],
+        region=env['REGION'],
+        instance_arn=env.get('IDENTITY_CENTER_INSTANCE_ARN'),
+        identity_store_id=env.get('IDENTITY_STORE_ID'),
+        # Only permission sets / accounts configured for this function are included
+        permission_sets={
+            key: {'arn': env[variable], 'risk_level': risk_level, 'name': name}
+            for key, (variable, risk_level, name) in PERMISSION_SET_ENV.items()
+            if env.get(variable)
+        },
+        accounts={
+            name: env[variable]
+            for name, variable in ACCOUNT_ENV.items()
+            if env.get(variable)
+        },
+        # 'schedule' = one EventBridge rule/schedule per grant, 'sweeper' = JIT-Revoke-Access sweeps expired grants
+        revocation_mode=env.get('REVOCATION_MODE', 'schedule'),
+        # 'inline' = handlers provision, schedule and notify themselves, 'stream' = handlers only
+        # write the request and JIT-Stream-Processor performs the side effects from the table stream
+        side_effect_mode=env.get('SIDE_EFFECT_MODE', 'inline'),
+        sender_email=env.get('SES_SENDER_EMAIL', 'felixayo85@gmail.com'),  # Must be a verified email in SES
+        automation_account_id=env.get('AUTOMATION_ACCOUNT_ID', '533267321107'),
+        sns_approval_topic_arn=env.get('SNS_APPROVAL_TOPIC_ARN'),
+        # Per-invocation AWS call summary: 'json', 'emf' (CloudWatch metrics) or 'off'
+        trace_format=env.get('TRACE_FORMAT', 'json'),
+        log_level=log_level if log_level in LOG_LEVELS else 'INFO',
+        # Fraction of invocations whose DEBUG lines are emitted (the rest only on error)
+        log_debug_sample_rate=float(env.get('LOG_DEBUG_SAMPLE_RATE', 0)),
+        log_buffer_lines=int(env.get('LOG_BUFFER_LINES', 50)),
+        # When set, notifications go through the outbox queue to JIT-Notification-Worker
+        notification_queue_url=env.get('NOTIFICATION_QUEUE_URL'),
+        # IANA time zone used for timestamps in notifications
+        notification_timezone=env.get('NOTIFICATION_TIMEZONE', 'UTC'),
+        # Table holding idempotency keys of POST /requests (feature is off when unset)
+        idempotency_table_name=env.get('IDEMPOTENCY_TABLE'),
+        idempotency_ttl_seconds=int(env.get('IDEMPOTENCY_TTL_SECONDS', 86400)),
+        # Table of dashboard aggregates kept by JIT-Stream-Processor and read by GET /stats (off when unset)
+        stats_table_name=env.get('STATS_TABLE'),
+        # WebSocket push: subscriptions of portal connections and the API's management endpoint
+        # (https://<api-id>.execute-api.<region>.amazonaws.com/<stage>); off when either is unset
+        connections_table_name=env.get('CONNECTIONS_TABLE'),
+        websocket_endpoint=env.get('WEBSOCKET_ENDPOINT'),
+        # S3 archive of closed requests written by JIT-Archiver and read by GET /requests?archive=true (off when unset)
+        archive_bucket=env.get('ARCHIVE_BUCKET'),
+        archive_prefix=env.get('ARCHIVE_PREFIX', 'requests/')
+    )
+
+    if environ is None:
+        _config = config
+    return config
+
+
+def set_config(config):
+    """Replace the cached configuration (None re-reads the environment on next use)"""
+    global _config
+    _config = config
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import time
+
+from botocore.exceptions import ClientError
+
+from .clients import get_table
+from .config import load_config
+from .log import get_logger
+from .responses import api_response
+
+logger = get_logger('jit_core.idempotency')
+
+IN_PROGRESS = 'IN_PROGRESS'
+COMPLETED = 'COMPLETED'
+
+# An IN_PROGRESS claim older than this (longer than any handler timeout) may be taken over
+IN_PROGRESS_SECONDS = 180
+
+MAX_KEY_LENGTH = 255
+
+
+def idempotency_key_from(event, body):
+    """The client token: Idempotency-Key header, or idempotency_key in the body / direct invocation event"""
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'idempotency-key' and value:
+            return value
+    return (body or {}).get('idempotency_key')
+
+
+def run_idempotent(scope, key, payload, operation):
+    """
+    Run operation() (returning an API Gateway response) at most once per scope + key
+    The key is claimed with a conditional write to IDEMPOTENCY_TABLE; a retry
+    with the same key gets the stored response back (marked with an
+    Idempotent-Replayed header) until IDEMPOTENCY_TTL_SECONDS passes. Reusing a
+    key for a different payload is rejected. Without a key or table, operation()
+    just runs.
+    """
+    config = load_config()
+    if not key or not config.idempotency_table_name:
+        return operation()
+
+    if len(key) > MAX_KEY_LENGTH:
+        return api_response(400, {'error': f'Idempotency key cannot exceed {MAX_KEY_LENGTH} characters'})
+
+    table = get_table(config.idempotency_table_name)
+    record_key = f'{scope}#{key}'
+    fingerprint = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    now = int(time.time())
+
+    try:
+        table.put_item(
+            Item={
+                'IdempotencyKey': record_key,
+                'Status': IN_PROGRESS,
+                'Fingerprint': fingerprint,
+                'CreatedAt': now,
+                'LockExpiresAt': now + IN_PROGRESS_SECONDS,
+                'ExpiresAt': now + config.idempotency_ttl_seconds
+            },
+            # ExpiresAt is the table's TTL attribute; DynamoDB may delete expired items late
+            ConditionExpression=(
+                'attribute_not_exists(IdempotencyKey) OR ExpiresAt < :now OR '
+                '(#status = :in_progress AND LockExpiresAt < :now)'
+            ),
+            ExpressionAttributeNames={
+                '#status': 'Status'
+            },
+            ExpressionAttributeValues={
+                ':now': now,
+                ':in_progress': IN_PROGRESS
+            }
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return _replay(table, record_key, fingerprint)
+
+    try:
+        response = operation()
+    except Exception:
+        _release(table, record_key)
+        raise
+
+    if response.get('statusCode', 200) >= 500:
+        # Let the client retry server errors with the same key
+        _release(table, record_key)
+        return response
+
+    try:
+        table.update_item(
+            Key={'IdempotencyKey': record_key},
+            UpdateExpression='SET #status = :completed, #response = :response REMOVE LockExpiresAt',
+            ExpressionAttributeNames={
+                '#status': 'Status',
+                '#response': 'Response'
+            },
+            ExpressionAttributeValues={
+                ':completed': COMPLETED,
+                ':response': json.dumps(response)
+            }
+        )
+    except Exception as e:
+        # The work is done; a retry would just be rejected as in progress until the lock expires
+        logger.warning("Error storing idempotent response", idempotency_key=record_key, error=str(e))
+
+    return response
+
+
+def _replay(table, record_key, fingerprint):
+    item = table.get_item(Key={'IdempotencyKey': record_key}, ConsistentRead=True).get('Item')
+
+    if item is None:
+        # Released or expired between the write and the read
+        return api_response(409, {'error': 'A request with this idempotency key is being retried, please try again'})
+
+    if item.get('Fingerprint') != fingerprint:
+        logger.warning("Idempotency key reused with a different request", idempotency_key=record_key)
+        return api_response(422, {'error': 'Idempotency key was already used for a different request'})
+
+    if item['Status'] != COMPLETED:
+        logger.info("Duplicate request while the original is in progress", idempotency_key=record_key)
+        response = api_response(409, {'error': 'A request with this idempotency key is already in progress'})
+        response['headers']['Retry-After'] = '2'
+        return response
+
+    logger.info("Returning stored response for duplicate request", idempotency_key=record_key)
+    response = json.loads(item['Response'])
+    response['headers'] = dict(response.get('headers') or {}, **{'Idempotent-Replayed': 'true'})
+    return response
+
+
+def _release(table, record_key):
+    try:
+        table.delete_item(Key={'IdempotencyKey': record_key})
+    except Exception as e:
+        logger.warning("Error releasing idempotency key", idempotency_key=record_key, error=str(e))
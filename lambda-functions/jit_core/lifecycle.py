@@ -0,0 +1,222 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from .clients import get_client
+from .config import load_config
+from .log import get_logger
+from .notifications import send_templated_notification
+from .schema import change_stamp, expand_item, from_attribute_values, to_attribute_values
+
+logger = get_logger('jit_core.lifecycle')
+
+# Request states
+PENDING = 'PENDING'
+PROVISIONING = 'PROVISIONING'
+ACTIVE = 'ACTIVE'
+FAILED = 'FAILED'
+DENIED = 'DENIED'
+REVOKED = 'REVOKED'
+ERROR = 'ERROR'
+
+STATES = (PENDING, PROVISIONING, ACTIVE, FAILED, DENIED, REVOKED, ERROR)
+
+# ACTIVE / PROVISIONING grants that a repeated request may extend instead of granting again
+EXTENDABLE_STATES = (ACTIVE, PROVISIONING)
+
+Transition = namedtuple('Transition', ['name', 'source', 'target', 'attributes', 'timestamps', 'remove', 'template',
+                                       'expired'])
+
+# Default concurrency for transition_many (DynamoDB has no batch conditional update)
+TRANSITION_MAX_WORKERS = 10
+
+
+def _transition(name, source, target, attributes=None, timestamps=(), remove=(), template=None, expired=False):
+    return Transition(name, source, target, attributes or {}, timestamps, remove, template, expired)
+
+
+# Every status change a request can make. Each is one conditional UpdateItem on
+# Status = source that writes the target status, the fixed attributes, the
+# timestamps (set to the time of the transition, as is the change stamp) and
+# removes the listed attributes. template is the email sent to the user afterwards (notify_transition).
+# expired transitions also require ExpirationTimestamp to have passed, so a grant
+# extended after its revocation was scheduled (or queried) is not expired early.
+# New records are written directly as PENDING or PROVISIONING.
+TRANSITIONS = {transition.name: transition for transition in (
+    _transition('approve', PENDING, ACTIVE, timestamps=('ApprovalTimestamp', 'GrantedTimestamp'), template='approved'),
+    _transition('deny', PENDING, DENIED, timestamps=('ApprovalTimestamp',), template='denied'),
+    # Approved with SIDE_EFFECT_MODE=stream: JIT-Stream-Processor creates the assignment
+    _transition('approve_async', PENDING, PROVISIONING),
+    _transition('grant', PENDING, ACTIVE, timestamps=('ApprovalTimestamp', 'GrantedTimestamp'), template='granted'),
+    _transition('provisioned', PROVISIONING, ACTIVE, timestamps=('ApprovalTimestamp', 'GrantedTimestamp'),
+                template='granted'),
+    _transition('provisioning_failed', PROVISIONING, FAILED, template='failed'),
+    _transition('expire', ACTIVE, REVOKED, {'RevocationType': 'AUTO'}, ('RevokedTimestamp',), template='revoked_expired',
+                expired=True),
+    _transition('revoke', ACTIVE, REVOKED, {'RevocationType': 'MANUAL'}, ('RevokedTimestamp',), template='revoked_manual'),
+    _transition('bulk_revoke', ACTIVE, REVOKED, {'RevocationType': 'BULK'}, ('RevokedTimestamp',), template='revoked_bulk'),
+    # Bulk revocation of a grant that is still provisioning; whoever finishes provisioning deletes the assignment
+    _transition('bulk_cancel', PROVISIONING, REVOKED, {'RevocationType': 'BULK'}, ('RevokedTimestamp',),
+                template='revoked_bulk'),
+    _transition('reconcile', ACTIVE, REVOKED, {'RevocationType': 'RECONCILED'}, ('RevokedTimestamp',)),
+    _transition('revoke_failed', REVOKED, ERROR),
+    # Undo a claim when the Identity Center call behind it failed (use with the claimed Version)
+    _transition('reopen', ACTIVE, PENDING,
+                remove=('ApproverEmail', 'ApprovalTimestamp', 'ApprovalComments', 'GrantedTimestamp')),
+    _transition('restore', REVOKED, ACTIVE, remove=('RevokedTimestamp', 'RevokedBy', 'RevocationType'))
+)}
+
+
+class TransitionConflict(Exception):
+    """
+    A conditional status transition lost: the request does not exist, is no
+    longer in the expected status or was changed since it was read
+    current is the item as DynamoDB saw it (None when it does not exist).
+    """
+
+    def __init__(self, request_id, transition, current):
+        self.request_id = request_id
+        self.transition = transition
+        self.current = current
+        super().__init__(f"Cannot {transition.name} request {request_id} (status: {self.current_status})")
+
+    @property
+    def current_status(self):
+        return (self.current or {}).get('Status')
+
+
+def get_transition(name):
+    """Transition definition by name (KeyError for unknown names)"""
+    return TRANSITIONS[name]
+
+
+def allowed_transitions(status):
+    """Names of the transitions that can leave status"""
+    return [transition.name for transition in TRANSITIONS.values() if transition.source == status]
+
+
+def transition_request(request_id, name, attributes=None, version=None, expires_by=None):
+    """
+    Apply a lifecycle transition (see TRANSITIONS) with one conditional UpdateItem
+    attributes are SET alongside the transition's own and the Version counter is
+    incremented. Pass the Version from an earlier read to also require that
+    nothing changed since. Returns the new item; raises TransitionConflict
+    (carrying the current item) when another writer won, so no separate read is
+    needed either way. expires_by moves the expiry check of expired transitions
+    from now to that time. Safe to call from worker threads.
+    """
+    transition = TRANSITIONS[name]
+    update = update_for(transition, attributes, version, expires_by)
+
+    try:
+        response = get_client('dynamodb').update_item(
+            TableName=load_config().table_name,
+            Key={'RequestId': {'S': request_id}},
+            UpdateExpression=update['UpdateExpression'],
+            ConditionExpression=update['ConditionExpression'],
+            ExpressionAttributeNames=update['ExpressionAttributeNames'],
+            ExpressionAttributeValues=to_attribute_values(update['ExpressionAttributeValues']),
+            ReturnValues='ALL_NEW',
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        old = e.response.get('Item')
+        current = expand_item(from_attribute_values(old)) if old else None
+        conflict = TransitionConflict(request_id, transition, current)
+        logger.info("Status transition lost", request_id=request_id, transition=name,
+                    current_status=conflict.current_status)
+        raise conflict from None
+
+    logger.debug("Status transition", request_id=request_id, transition=name, status=transition.target)
+    return expand_item(from_attribute_values(response['Attributes']))
+
+
+def transition_many(name, items, attributes=None, max_workers=TRANSITION_MAX_WORKERS):
+    """
+    Apply the same transition to many requests (items need a RequestId)
+    DynamoDB has no batch conditional update, so this is still one UpdateItem
+    per request, issued concurrently. Returns one result per item, in order:
+    the new item, or the exception (TransitionConflict for lost races).
+    """
+    def apply(item):
+        try:
+            return transition_request(item['RequestId'], name, attributes)
+        except Exception as e:
+            if not isinstance(e, TransitionConflict):
+                logger.error("Status transition failed", request_id=item['RequestId'], transition=name, error=str(e))
+            return e
+
+    if len(items) <= 1:
+        return [apply(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+        return list(executor.map(apply, items))
+
+
+def update_for(transition, attributes=None, version=None, expires_by=None):
+    """The UpdateItem arguments (expressions and plain values) for a transition"""
+    now = int(time.time())
+    values_to_set = dict(transition.attributes)
+    values_to_set.update((attribute, now) for attribute in transition.timestamps)
+    values_to_set.update(change_stamp(now))
+    values_to_set.update(attributes or {})
+
+    names = {'#status': 'Status', '#version': 'Version'}
+    values = {':from': transition.source, ':to': transition.target, ':one': 1}
+    assignments = ['#status = :to']
+    for index, (attribute, value) in enumerate(values_to_set.items()):
+        names[f'#a{index}'] = attribute
+        values[f':a{index}'] = value
+        assignments.append(f'#a{index} = :a{index}')
+
+    condition = '#status = :from'
+    if transition.expired:
+        names['#expires'] = 'ExpirationTimestamp'
+        values[':now'] = now if expires_by is None else expires_by
+        condition += ' AND #expires <= :now'
+    if version is not None:
+        condition += ' AND #version = :version'
+        values[':version'] = version
+
+    update_expression = f"SET {', '.join(assignments)} ADD #version :one"
+    removed = [attribute for attribute in transition.remove if attribute not in values_to_set]
+    if removed:
+        for index, attribute in enumerate(removed):
+            names[f'#r{index}'] = attribute
+        update_expression += ' REMOVE ' + ', '.join(f'#r{index}' for index in range(len(removed)))
+
+    return {
+        'UpdateExpression': update_expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }
+
+
+def notify_transition(name, request_item, fields=None):
+    """
+    Send the transition's email (if it has one) for the updated request
+    Template fields come from the item; fields overrides or adds to them.
+    """
+    transition = TRANSITIONS[name]
+    if not transition.template:
+        return
+
+    template_fields = {
+        'account': request_item.get('AccountName'),
+        'permission_set': request_item.get('PermissionSet'),
+        'expires': request_item.get('ExpirationTimestamp'),
+        'duration_minutes': request_item.get('DurationMinutes'),
+        'approver': request_item.get('ApproverEmail'),
+        'comments': request_item.get('ApprovalComments'),
+        'revoker': request_item.get('RevokedBy'),
+        'error': request_item.get('ErrorMessage'),
+        'request_id': request_item['RequestId']
+    }
+    template_fields.update(fields or {})
+
+    send_templated_notification(request_item.get('UserEmail'), transition.template, template_fields,
+                                dedupe_key=f"{request_item['RequestId']}:{transition.target}")
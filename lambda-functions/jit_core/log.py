@@ -0,0 +1,159 @@
+import json
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+
+from .config import load_config
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+# Non-sampled debug lines kept per invocation in case an error needs context
+DEBUG_RING_SIZE = 100
+
+_lock = threading.Lock()
+_loggers = {}
+
+
+class _State:
+    def __init__(self):
+        self.active = False
+        self.fields = {}
+        self.buffer = []
+        self.debug_ring = deque(maxlen=DEBUG_RING_SIZE)
+        self.sampled = False
+        self.failed = False
+
+
+_state = _State()
+
+
+class Logger:
+    """
+    JSON logger for the JIT Lambdas
+    Records carry the invocation's correlation fields (see bind) and are
+    buffered until the invocation ends, the buffer fills, or an error is logged
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def debug(self, message, **fields):
+        _log(self.name, 'DEBUG', message, fields)
+
+    def info(self, message, **fields):
+        _log(self.name, 'INFO', message, fields)
+
+    def warning(self, message, **fields):
+        _log(self.name, 'WARNING', message, fields)
+
+    def error(self, message, **fields):
+        _log(self.name, 'ERROR', message, fields)
+
+    def exception(self, message, **fields):
+        """Log an ERROR with the current exception's traceback in one field"""
+        fields['traceback'] = traceback.format_exc()
+        _log(self.name, 'ERROR', message, fields)
+
+
+def get_logger(name):
+    with _lock:
+        if name not in _loggers:
+            _loggers[name] = Logger(name)
+        return _loggers[name]
+
+
+def bind(**fields):
+    """Add correlation fields (request_id, user, ...) to every later record of this invocation"""
+    with _lock:
+        _state.fields.update({key: value for key, value in fields.items() if value is not None})
+
+
+def start_invocation(context=None):
+    """Reset correlation fields and decide whether this invocation's debug lines are sampled"""
+    config = load_config()
+    with _lock:
+        _state.active = True
+        _state.fields = {}
+        if getattr(context, 'aws_request_id', None):
+            _state.fields['aws_request_id'] = context.aws_request_id
+        _state.buffer = []
+        _state.debug_ring.clear()
+        _state.failed = False
+        _state.sampled = LEVELS[config.log_level] <= LEVELS['DEBUG'] or random.random() < config.log_debug_sample_rate
+
+
+def end_invocation():
+    with _lock:
+        _state.active = False
+        _flush_locked()
+        _state.fields = {}
+
+
+def write_record(record):
+    """Emit a pre-built record (e.g. the trace summary) through the same buffer"""
+    with _lock:
+        _state.buffer.append(record)
+        if not _state.active:
+            _flush_locked()
+
+
+def flush():
+    with _lock:
+        _flush_locked()
+
+
+def _log(name, level, message, fields):
+    config = load_config()
+    with _lock:
+        record = (time.time(), level, name, message, dict(_state.fields, **fields))
+
+        if level == 'DEBUG':
+            if not _state.sampled:
+                # Kept out of the output unless the invocation later fails
+                if _state.active:
+                    _state.debug_ring.append(record)
+                return
+        elif LEVELS[level] < LEVELS[config.log_level]:
+            return
+
+        if level == 'ERROR' and not _state.failed:
+            _state.failed = True
+            _state.buffer.extend(_state.debug_ring)
+            _state.buffer.sort(key=_record_time)
+            _state.debug_ring.clear()
+
+        _state.buffer.append(record)
+
+        if level == 'ERROR' or not _state.active or len(_state.buffer) >= config.log_buffer_lines:
+            _flush_locked()
+
+
+def _record_time(record):
+    return record[0] if isinstance(record, tuple) else 0
+
+
+def _flush_locked():
+    if not _state.buffer:
+        return
+    lines = [json.dumps(_render(record), separators=(',', ':'), default=str) for record in _state.buffer]
+    _state.buffer = []
+    sys.stdout.write('\n'.join(lines) + '\n')
+    sys.stdout.flush()
+
+
+def _render(record):
+    if isinstance(record, dict):
+        return record
+    timestamp, level, name, message, fields = record
+    rendered = {
+        'timestamp': datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat(timespec='milliseconds'),
+        'level': level,
+        'logger': name,
+        'message': message
+    }
+    rendered.update(fields)
+    return rendered
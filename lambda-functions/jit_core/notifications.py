@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+
+from .clients import get_client
+from .config import load_config
+from .log import get_logger
+from .templates import render_notification
+from .tracing import at_invocation_end, in_invocation
+
+logger = get_logger('jit_core.notifications')
+
+# SQS SendMessageBatch accepts at most 10 entries
+OUTBOX_BATCH_SIZE = 10
+
+# Notifications queued during the current invocation, sent in one go when it ends
+_outbox = []
+_outbox_keys = set()
+_outbox_lock = threading.Lock()
+
+
+def send_user_notification(user_email, subject, message, dedupe_key=None, html=None):
+    """
+    Email a user (plain text, or multipart text + HTML when html is given)
+    With NOTIFICATION_QUEUE_URL set the email is queued for JIT-Notification-Worker
+    instead of being sent via SES in the request path. dedupe_key (e.g.
+    '<request id>:REVOKED') identifies the notification so it is only sent once.
+    """
+    notification = {
+        'kind': 'email',
+        'to': user_email,
+        'subject': subject,
+        'body': message,
+        'dedupe_key': dedupe_key or _content_key(user_email, subject, message)
+    }
+    if html:
+        notification['html'] = html
+    _dispatch(notification)
+
+
+def send_templated_notification(user_email, template, fields, dedupe_key=None):
+    """Render a notification template (see templates.TEMPLATES) and email it to a user"""
+    rendered = render_notification(template, fields)
+    send_user_notification(user_email, rendered.subject, rendered.text, dedupe_key=dedupe_key, html=rendered.html)
+
+
+def send_topic_notification(topic_arn, subject, message, dedupe_key=None):
+    """Publish to an SNS topic, through the outbox when NOTIFICATION_QUEUE_URL is set"""
+    _dispatch({
+        'kind': 'topic',
+        'topic_arn': topic_arn,
+        'subject': subject,
+        'body': message,
+        'dedupe_key': dedupe_key or _content_key(topic_arn, subject, message)
+    })
+
+
+def send_approval_notification(request_id, user_email, account_name, permission_set, reason):
+    """Ask the approvers (SNS_APPROVAL_TOPIC_ARN) to review a high-risk request; errors are logged, not raised"""
+    try:
+        topic_arn = load_config().sns_approval_topic_arn
+
+        if not topic_arn:
+            logger.warning("SNS_APPROVAL_TOPIC_ARN not configured, skipping notification")
+            return
+
+        # SNS email subscriptions only take plain text
+        rendered = render_notification('approval_required', {
+            'request_id': request_id,
+            'user': user_email,
+            'account': account_name,
+            'permission_set': permission_set,
+            'reason': reason
+        })
+        send_topic_notification(topic_arn, rendered.subject, rendered.text, dedupe_key=f"{request_id}:PENDING")
+
+        logger.info("Approval notification sent", request_id=request_id)
+
+    except Exception as e:
+        logger.warning("Error sending approval notification", request_id=request_id, error=str(e))
+
+
+def deliver_notification(notification):
+    """Send one notification via SES/SNS now; errors are raised to the caller"""
+    if notification['kind'] == 'topic':
+        get_client('sns').publish(
+            TopicArn=notification['topic_arn'],
+            Subject=notification['subject'],
+            Message=notification['body']
+        )
+        return
+
+    body = {
+        'Text': {
+            'Data': notification['body'],
+            'Charset': 'UTF-8'
+        }
+    }
+    if notification.get('html'):
+        # SES sends Text + Html as a multipart/alternative message
+        body['Html'] = {
+            'Data': notification['html'],
+            'Charset': 'UTF-8'
+        }
+
+    get_client('ses').send_email(
+        Source=load_config().sender_email,
+        Destination={
+            'ToAddresses': [notification['to']]
+        },
+        Message={
+            'Subject': {
+                'Data': notification['subject'],
+                'Charset': 'UTF-8'
+            },
+            'Body': body
+        }
+    )
+
+
+def flush_outbox():
+    """Queue every notification collected during the invocation (SendMessageBatch, 10 per call)"""
+    with _outbox_lock:
+        pending = list(_outbox)
+        _outbox.clear()
+        _outbox_keys.clear()
+
+    if not pending:
+        return
+
+    queue_url = load_config().notification_queue_url
+    sqs = get_client('sqs')
+
+    for start in range(0, len(pending), OUTBOX_BATCH_SIZE):
+        chunk = pending[start:start + OUTBOX_BATCH_SIZE]
+        entries = [_queue_entry(queue_url, str(index), notification) for index, notification in enumerate(chunk)]
+        try:
+            response = sqs.send_message_batch(QueueUrl=queue_url, Entries=entries)
+            failed = [chunk[int(entry['Id'])] for entry in response.get('Failed', [])]
+        except Exception as e:
+            logger.warning("Error queueing notifications", count=len(chunk), error=str(e))
+            failed = chunk
+
+        # Never lose a notification because the outbox is unavailable
+        for notification in failed:
+            _deliver_now(notification)
+
+    logger.debug("Notifications queued", count=len(pending))
+
+
+def _dispatch(notification):
+    if not load_config().notification_queue_url:
+        _deliver_now(notification)
+        return
+
+    if not in_invocation():
+        # No invocation end to flush at (scripts, tests): queue right away
+        with _outbox_lock:
+            _outbox.append(notification)
+        flush_outbox()
+        return
+
+    with _outbox_lock:
+        if notification['dedupe_key'] in _outbox_keys:
+            logger.debug("Duplicate notification dropped", dedupe_key=notification['dedupe_key'])
+            return
+        _outbox_keys.add(notification['dedupe_key'])
+        _outbox.append(notification)
+
+
+def _deliver_now(notification):
+    target = notification.get('to') or notification.get('topic_arn')
+    try:
+        deliver_notification(notification)
+        logger.info("Notification sent", to=target, subject=notification['subject'])
+    except Exception as e:
+        logger.warning("Error sending notification", to=target, error=str(e))
+
+
+def _queue_entry(queue_url, entry_id, notification):
+    entry = {'Id': entry_id, 'MessageBody': json.dumps(notification)}
+    if queue_url.endswith('.fifo'):
+        # Let SQS drop duplicates within its 5 minute deduplication window
+        entry['MessageGroupId'] = notification.get('to') or notification['topic_arn']
+        entry['MessageDeduplicationId'] = hashlib.sha256(notification['dedupe_key'].encode()).hexdigest()
+    return entry
+
+
+def _content_key(target, subject, message):
+    return hashlib.sha256('\n'.join((target or '', subject, message)).encode()).hexdigest()
+
+
+at_invocation_end(flush_outbox)
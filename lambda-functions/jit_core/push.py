@@ -0,0 +1,143 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from .clients import get_client, get_table
+from .config import load_config
+from .lifecycle import PENDING
+from .log import get_logger
+from .responses import to_json
+
+logger = get_logger('jit_core.push')
+
+# Live updates for the portal over the API Gateway WebSocket API. A connection
+# subscribes to channels when it connects (JIT-WebSocket-Handler), and
+# JIT-Stream-Processor publishes every request change to the channels it
+# concerns, so the cost follows the number of changes, not of open portals:
+#
+#   approvals        requests entering or leaving PENDING (the approvals tab)
+#   user#<email>     every change to the user's own requests
+#
+# CONNECTIONS_TABLE (partition key SubscriptionKey, TTL ExpiresAt) holds one
+# item per subscription, found by Channel-ConnectionId-index (KEYS_ONLY), and
+# one CONNECTION#<ConnectionId> item listing the connection's channels so
+# $disconnect can remove them.
+
+APPROVALS_CHANNEL = 'approvals'
+CHANNEL_INDEX = 'Channel-ConnectionId-index'
+
+# API Gateway closes WebSocket connections after 2 hours; TTL removes what $disconnect missed
+CONNECTION_TTL_SECONDS = 7200
+
+PUSH_MAX_WORKERS = 10
+
+# Request attributes sent with each change (what the portal renders, plus Version for ordering)
+EVENT_ATTRIBUTES = (
+    'RequestId', 'UserEmail', 'AccountName', 'PermissionSet', 'Status', 'Version',
+    'RequestTimestamp', 'ExpirationTimestamp', 'DurationMinutes', 'Reason',
+    'ApproverEmail', 'ApprovalComments', 'RevokedBy', 'RevocationType'
+)
+
+
+def user_channel(email):
+    return f'user#{email.strip().lower()}'
+
+
+def subscribe(connection_id, channels):
+    """Register a connection for channels (one write per channel plus the connection item)"""
+    expires_at = int(time.time()) + CONNECTION_TTL_SECONDS
+    with get_table(load_config().connections_table_name).batch_writer() as batch:
+        batch.put_item(Item={
+            'SubscriptionKey': f'CONNECTION#{connection_id}',
+            'ConnectionId': connection_id,
+            'Channels': list(channels),
+            'ExpiresAt': expires_at
+        })
+        for channel in channels:
+            batch.put_item(Item={
+                'SubscriptionKey': f'{channel}#{connection_id}',
+                'Channel': channel,
+                'ConnectionId': connection_id,
+                'ExpiresAt': expires_at
+            })
+
+
+def unsubscribe(connection_id):
+    """Remove a connection and all of its subscriptions"""
+    table = get_table(load_config().connections_table_name)
+    connection = table.get_item(Key={'SubscriptionKey': f'CONNECTION#{connection_id}'}).get('Item')
+    if not connection:
+        return
+
+    with table.batch_writer() as batch:
+        for channel in connection.get('Channels', []):
+            batch.delete_item(Key={'SubscriptionKey': f'{channel}#{connection_id}'})
+        batch.delete_item(Key={'SubscriptionKey': f'CONNECTION#{connection_id}'})
+
+
+def change_channels(old_item, new_item):
+    """The channels a request change is published to"""
+    channels = []
+    if PENDING in ((old_item or {}).get('Status'), new_item.get('Status')):
+        channels.append(APPROVALS_CHANNEL)
+    if new_item.get('UserEmail'):
+        channels.append(user_channel(new_item['UserEmail']))
+    return channels
+
+
+def change_event(old_item, new_item):
+    """The message pushed for a request change"""
+    return {
+        'type': 'request',
+        'previous_status': (old_item or {}).get('Status'),
+        'request': {attribute: new_item[attribute] for attribute in EVENT_ATTRIBUTES if attribute in new_item}
+    }
+
+
+def publish_change(old_item, new_item):
+    """
+    Push a request change to every connection subscribed to its channels
+    Best effort: connections that are gone are unsubscribed, other failures are
+    logged (the portal still refreshes itself). Returns the number delivered.
+    """
+    connection_ids = set()
+    for channel in change_channels(old_item, new_item):
+        connection_ids.update(subscribers(channel))
+    if not connection_ids:
+        return 0
+
+    data = to_json(change_event(old_item, new_item)).encode('utf-8')
+    if len(connection_ids) == 1:
+        return int(post(connection_ids.pop(), data))
+    with ThreadPoolExecutor(max_workers=min(PUSH_MAX_WORKERS, len(connection_ids))) as executor:
+        return sum(executor.map(lambda connection_id: post(connection_id, data), connection_ids))
+
+
+def subscribers(channel):
+    """ConnectionIds subscribed to a channel (paginated Query of the channel index)"""
+    from boto3.dynamodb.conditions import Key
+
+    table = get_table(load_config().connections_table_name)
+    query_args = {'IndexName': CHANNEL_INDEX, 'KeyConditionExpression': Key('Channel').eq(channel)}
+    connection_ids = []
+    while True:
+        response = table.query(**query_args)
+        connection_ids.extend(item['ConnectionId'] for item in response.get('Items', []))
+        if not response.get('LastEvaluatedKey'):
+            return connection_ids
+        query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def post(connection_id, data):
+    """Send data to one connection; True when delivered"""
+    try:
+        get_client('apigatewaymanagementapi').post_to_connection(ConnectionId=connection_id, Data=data)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'GoneException':
+            logger.info("Connection gone, unsubscribing", connection_id=connection_id)
+            unsubscribe(connection_id)
+        else:
+            logger.warning("Push failed", connection_id=connection_id, error=str(e))
+        return False
@@ -0,0 +1,57 @@
+import json
+from decimal import Decimal
+
+
+def api_response(status_code, body, methods='GET,POST,OPTIONS', headers=None):
+    """Helper function to return API Gateway formatted response (headers are added to the defaults)"""
+    return {
+        'statusCode': status_code,
+        'headers': dict(_default_headers(methods), **(headers or {})),
+        'body': to_json(body)
+    }
+
+
+def not_modified(etag, methods='GET,POST,OPTIONS'):
+    """304 response (no body) for a conditional GET whose If-None-Match matched"""
+    return {
+        'statusCode': 304,
+        'headers': dict(_default_headers(methods), ETag=etag),
+        'body': ''
+    }
+
+
+def _default_headers(methods):
+    return {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization,Idempotency-Key,If-None-Match',
+        'Access-Control-Expose-Headers': 'ETag,Idempotent-Replayed',
+        'Access-Control-Allow-Methods': methods
+    }
+
+
+def error_response(message):
+    """Return standardized error response"""
+    return {
+        'statusCode': 400,
+        'body': to_json({
+            'error': message
+        })
+    }
+
+
+def to_json(value):
+    """
+    Encode a response body in a single pass
+    DynamoDB items can be passed as read: Decimal numbers are written as JSON
+    numbers by the C encoder's default hook, so there is no need to convert
+    items (or round-trip them through json) first.
+    """
+    return json.dumps(value, default=decimal_default, separators=(',', ':'))
+
+
+def decimal_default(obj):
+    """Convert Decimal to regular numbers for JSON"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    raise TypeError
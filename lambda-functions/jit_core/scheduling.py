@@ -0,0 +1,195 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from .clients import get_client, get_table
+from .config import load_config
+from .log import get_logger
+from .schema import schedule_kind
+
+logger = get_logger('jit_core.scheduling')
+
+
+def schedule_revocation(request_id, user_id, account_id, permission_set_arn, expiration_timestamp, method='rule'):
+    """
+    Schedule automatic revocation and store the schedule ARN on the request
+    method: 'rule' (EventBridge cron rule) or 'scheduler' (EventBridge Scheduler)
+    Non-fatal - access can still be manually revoked
+    """
+    if load_config().revocation_mode == 'sweeper':
+        # Expired grants are picked up by the JIT-Revoke-Access sweeper
+        return
+
+    try:
+        if method == 'scheduler':
+            schedule_arn = create_revocation_schedule(request_id, user_id, account_id, permission_set_arn, expiration_timestamp)
+        else:
+            schedule_arn = create_revocation_rule(request_id, user_id, account_id, permission_set_arn, expiration_timestamp)
+
+        store_schedule_arn(request_id, schedule_arn)
+
+    except Exception as e:
+        logger.exception("Error scheduling revocation", request_id=request_id, error=str(e))
+
+
+def create_revocation_rule(request_id, user_id, account_id, permission_set_arn, expiration_timestamp):
+    """Create the one-time EventBridge rule that revokes a grant, returning the rule ARN"""
+    config = load_config()
+    # Cron has minute precision: round up so the rule never fires before the expiry
+    expires_at = _to_int(expiration_timestamp)
+    schedule_time = datetime.fromtimestamp(-(-expires_at // 60) * 60, tz=timezone.utc)
+
+    # EventBridge uses cron expressions - create a one-time rule
+    rule_name = f"revoke-{request_id}"
+
+    # Cron format: minute hour day month day-of-week year
+    cron_expression = f"cron({schedule_time.minute} {schedule_time.hour} {schedule_time.day} {schedule_time.month} ? {schedule_time.year})"
+
+    logger.debug("Scheduling revocation", rule=rule_name, cron=cron_expression)
+
+    events = get_client('events')
+
+    events.put_rule(
+        Name=rule_name,
+        ScheduleExpression=cron_expression,
+        State='ENABLED',
+        Description=f'Auto-revoke JIT access for request {request_id}'
+    )
+
+    events.put_targets(
+        Rule=rule_name,
+        Targets=[
+            {
+                'Id': '1',
+                'Arn': config.revoke_function_arn,
+                'Input': _revocation_input(request_id, user_id, account_id, permission_set_arn, expires_at)
+            }
+        ]
+    )
+
+    logger.info("Revocation scheduled", rule=rule_name, expires_at=schedule_time.isoformat())
+
+    return f'arn:aws:events:{config.region}:{config.automation_account_id}:rule/{rule_name}'
+
+
+def create_revocation_schedule(request_id, user_id, account_id, permission_set_arn, expiration_timestamp):
+    """Create the one-time EventBridge Scheduler schedule that revokes a grant, returning its ARN"""
+    config = load_config()
+    schedule_name = f"revoke-{request_id}"
+    schedule_time = datetime.fromtimestamp(_to_int(expiration_timestamp), tz=timezone.utc)
+
+    get_client('scheduler').create_schedule(
+        **_schedule_definition(schedule_name, schedule_time, request_id, user_id, account_id, permission_set_arn)
+    )
+
+    logger.info("Revocation scheduled", schedule=schedule_name, expires_at=schedule_time.isoformat())
+
+    return f'arn:aws:scheduler:{config.region}:{config.automation_account_id}:schedule/default/{schedule_name}'
+
+
+def reschedule_revocation(request_item, expiration_timestamp):
+    """
+    Move an existing grant's revocation to a new time, updating its schedule in place
+    Non-fatal - access can still be manually revoked
+    """
+    if load_config().revocation_mode == 'sweeper':
+        # The sweeper reads ExpirationTimestamp, so there is nothing to move
+        return
+
+    request_id = request_item['RequestId']
+    schedule_arn = request_item.get('RevocationScheduleArn')
+    grant = (request_id, request_item['UserId'], request_item['AccountId'], request_item['PermissionSetArn'])
+
+    try:
+        if schedule_arn and 'scheduler' in schedule_arn:
+            schedule_name = schedule_arn.split('/')[-1]
+            schedule_time = datetime.fromtimestamp(_to_int(expiration_timestamp), tz=timezone.utc)
+            get_client('scheduler').update_schedule(**_schedule_definition(schedule_name, schedule_time, *grant))
+            logger.info("Revocation rescheduled", schedule=schedule_name, expires_at=schedule_time.isoformat())
+            return
+
+        # PutRule on the existing rule name replaces its cron expression
+        rule_arn = create_revocation_rule(*grant, expiration_timestamp)
+        if rule_arn != schedule_arn:
+            store_schedule_arn(request_id, rule_arn)
+
+    except Exception as e:
+        logger.exception("Error rescheduling revocation", request_id=request_id, error=str(e))
+
+
+def store_schedule_arn(request_id, schedule_arn):
+    """Record the revocation rule/schedule on the request (compactly when the ARN is the standard one)"""
+    kind = schedule_kind(request_id, schedule_arn)
+    if kind:
+        update = {
+            'UpdateExpression': 'SET RevocationSchedule = :schedule REMOVE RevocationScheduleArn',
+            'ExpressionAttributeValues': {':schedule': kind}
+        }
+    else:
+        update = {
+            'UpdateExpression': 'SET RevocationScheduleArn = :schedule REMOVE RevocationSchedule',
+            'ExpressionAttributeValues': {':schedule': schedule_arn}
+        }
+    get_table().update_item(Key={'RequestId': request_id}, **update)
+
+
+def delete_revocation_schedule(schedule_arn):
+    """Cancel the automatic revocation schedule (EventBridge Scheduler or Rule)"""
+    if not schedule_arn:
+        return
+
+    try:
+        if 'scheduler' in schedule_arn:
+            # EventBridge Scheduler
+            schedule_name = schedule_arn.split('/')[-1]
+            get_client('scheduler').delete_schedule(
+                Name=schedule_name,
+                GroupName='default'
+            )
+            logger.info("Deleted revocation schedule", schedule=schedule_name)
+        elif 'rule' in schedule_arn:
+            # EventBridge Rule
+            rule_name = schedule_arn.split('/')[-1]
+            events = get_client('events')
+            events.remove_targets(Rule=rule_name, Ids=['1'])
+            events.delete_rule(Name=rule_name)
+            logger.info("Deleted revocation rule", rule=rule_name)
+    except Exception as e:
+        logger.warning("Error deleting schedule", schedule_arn=schedule_arn, error=str(e))
+
+
+def _schedule_definition(schedule_name, schedule_time, request_id, user_id, account_id, permission_set_arn):
+    # create_schedule and update_schedule both take the full definition
+    config = load_config()
+    return {
+        'Name': schedule_name,
+        'GroupName': 'default',
+        'ScheduleExpression': f"at({schedule_time.strftime('%Y-%m-%dT%H:%M:%S')})",
+        'ScheduleExpressionTimezone': 'UTC',
+        'FlexibleTimeWindow': {'Mode': 'OFF'},
+        'Target': {
+            'Arn': config.revoke_function_arn,
+            'RoleArn': config.automation_role_arn,
+            'Input': _revocation_input(request_id, user_id, account_id, permission_set_arn,
+                                       int(schedule_time.timestamp()))
+        },
+        'State': 'ENABLED'
+    }
+
+
+def _revocation_input(request_id, user_id, account_id, permission_set_arn, expires_at):
+    # expires_at is the expiry this revocation was scheduled for (see JIT-Revoke-Access)
+    return json.dumps({
+        'request_id': request_id,
+        'user_id': user_id,
+        'account_id': account_id,
+        'permission_set_arn': permission_set_arn,
+        'expires_at': expires_at
+    })
+
+
+def _to_int(timestamp):
+    # Timestamps may arrive as Decimal (DynamoDB) or str (event payloads)
+    if isinstance(timestamp, (Decimal, str)):
+        return int(float(timestamp))
+    return int(timestamp)
@@ -0,0 +1,132 @@
+import time
+
+from .config import load_config
+
+# Request items are stored compactly: values that can be rebuilt from the
+# configuration are not stored in full. compact_item() is applied before every
+# write of a whole item and expand_item() after every read, so handlers only see
+# the full attributes. Items written before this are already expanded.
+#
+#   PermissionSetArn       -> PermissionSetId ('ps-…'; the instance comes from IDENTITY_CENTER_INSTANCE_ARN)
+#   RevocationScheduleArn  -> RevocationSchedule ('rule' | 'scheduler'; named revoke-<RequestId>)
+#   empty strings / None   -> not stored
+#
+# Every write also stamps the change (change_stamp): UpdatedTimestamp (epoch
+# seconds) and UpdatedDay ('YYYY-MM-DD', UTC), the keys of the
+# UpdatedDay-UpdatedTimestamp-index change feed behind GET /requests?changed_since=
+
+PERMISSION_SET_ARN_PREFIX = 'arn:aws:sso:::permissionSet/'
+
+_serializer = None
+_deserializer = None
+
+
+def compact_item(item):
+    """The stored form of a request item (see above); the argument is not modified"""
+    stored = {name: value for name, value in item.items() if value is not None and value != ''}
+
+    permission_set_id = _permission_set_id(stored.get('PermissionSetArn'))
+    if permission_set_id:
+        del stored['PermissionSetArn']
+        stored['PermissionSetId'] = permission_set_id
+
+    schedule = schedule_kind(stored['RequestId'], stored.get('RevocationScheduleArn'))
+    if schedule:
+        del stored['RevocationScheduleArn']
+        stored['RevocationSchedule'] = schedule
+
+    stored.update(change_stamp())
+    return stored
+
+
+def expand_item(item):
+    """A stored request item with its full attributes restored (None stays None)"""
+    if not item or ('PermissionSetId' not in item and 'RevocationSchedule' not in item):
+        return item
+
+    expanded = dict(item)
+    if 'PermissionSetId' in expanded and _instance_id():
+        permission_set_id = expanded.pop('PermissionSetId')
+        expanded.setdefault('PermissionSetArn', permission_set_arn(permission_set_id))
+
+    schedule = expanded.pop('RevocationSchedule', None)
+    if schedule:
+        expanded.setdefault('RevocationScheduleArn', schedule_arn(expanded['RequestId'], schedule))
+
+    return expanded
+
+
+def change_stamp(timestamp=None):
+    """The change feed attributes for a write at timestamp (default now)"""
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    return {'UpdatedTimestamp': timestamp, 'UpdatedDay': change_day(timestamp)}
+
+
+def change_day(timestamp):
+    """The UpdatedDay partition ('YYYY-MM-DD', UTC) of an epoch timestamp"""
+    return time.strftime('%Y-%m-%d', time.gmtime(int(timestamp)))
+
+
+def permission_set_arn(permission_set_id):
+    return f'{PERMISSION_SET_ARN_PREFIX}{_instance_id()}/{permission_set_id}'
+
+
+def schedule_arn(request_id, kind):
+    """ARN of the revocation rule ('rule') or schedule ('scheduler') created for a request"""
+    config = load_config()
+    if kind == 'scheduler':
+        return f'arn:aws:scheduler:{config.region}:{config.automation_account_id}:schedule/default/revoke-{request_id}'
+    return f'arn:aws:events:{config.region}:{config.automation_account_id}:rule/revoke-{request_id}'
+
+
+def schedule_kind(request_id, arn):
+    """'rule' or 'scheduler' when arn is the standard one for the request, else None (stored in full)"""
+    for kind in ('rule', 'scheduler'):
+        if arn and arn == schedule_arn(request_id, kind):
+            return kind
+    return None
+
+
+def projection(attributes):
+    """ProjectionExpression arguments for a list of attribute names (placeholders avoid reserved words)"""
+    names = {f'#p{index}': attribute for index, attribute in enumerate(attributes)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
+
+
+def to_attribute_values(values):
+    """Plain values as low-level client attribute values ({'S': ...}, {'N': ...})"""
+    serializer, _ = _serializers()
+    return {name: serializer.serialize(value) for name, value in values.items()}
+
+
+def from_attribute_values(item):
+    """Low-level client attribute values as plain values (numbers as Decimal)"""
+    _, deserializer = _serializers()
+    return {name: deserializer.deserialize(value) for name, value in item.items()}
+
+
+def _serializers():
+    global _serializer, _deserializer
+    if _serializer is None:
+        from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+        _serializer, _deserializer = TypeSerializer(), TypeDeserializer()
+    return _serializer, _deserializer
+
+
+def _permission_set_id(arn):
+    # Only ARNs under the configured instance can be rebuilt on read
+    instance_id = _instance_id()
+    if not arn or not instance_id:
+        return None
+    prefix = f'{PERMISSION_SET_ARN_PREFIX}{instance_id}/'
+    if arn.startswith(prefix) and '/' not in arn[len(prefix):]:
+        return arn[len(prefix):]
+    return None
+
+
+def _instance_id():
+    instance_arn = load_config().instance_arn or ''
+    return instance_arn.rsplit('/', 1)[-1] if '/' in instance_arn else None
@@ -0,0 +1,263 @@
+import time
+
+from botocore.exceptions import ClientError
+
+from .clients import get_client, get_table
+from .config import load_config
+from .lifecycle import ACTIVE, DENIED, ERROR, FAILED, PENDING, REVOKED
+from .log import get_logger
+from .schema import change_day, from_attribute_values, to_attribute_values
+
+logger = get_logger('jit_core.stats')
+
+# Dashboard aggregates, kept up to date from the requests table stream by
+# JIT-Stream-Processor (record_change) and read by GET /stats (read_stats) with
+# one BatchGetItem. Each is a small item in STATS_TABLE (partition key StatKey):
+#
+#   ACTIVE#<AccountName>   Count                                        ACTIVE grants in the account
+#   PENDING                Count                                        requests waiting for approval
+#   DAY#<YYYY-MM-DD>       Requested, Granted, Denied, Revoked, Failed  changes that day (UTC)
+#   USER#<UserId>          Recent, Version                              the user's latest requests, newest first
+#   REQUEST#<RequestId>    CountedStatus, ExpiresAt                     the status the counters include
+#   VERSION                Version                                      changes to the requests table (GET /requests ETag)
+#
+# A change moves the counters and the request's CountedStatus in one transaction
+# conditional on CountedStatus, so a redelivered (or older) stream record
+# changes nothing: stream records of one request arrive in order, so a marker
+# that does not hold the record's old status has already counted it.
+
+# Status recorded for a request whose item was deleted
+DELETED = 'DELETED'
+
+VERSION_KEY = 'VERSION'
+
+# Day counter incremented by a change into the status
+DAY_COUNTERS = {ACTIVE: 'Granted', DENIED: 'Denied', REVOKED: 'Revoked', FAILED: 'Failed'}
+
+# Rollbacks (reopen / restore) take back the day counter of the change they undo
+ROLLBACKS = {(ACTIVE, PENDING), (REVOKED, ACTIVE)}
+
+# REQUEST# markers of finished requests expire (TTL attribute ExpiresAt) after this
+FINISHED_STATES = (DENIED, REVOKED, FAILED, ERROR, DELETED)
+MARKER_TTL_SECONDS = 30 * 86400
+
+USER_HISTORY_LENGTH = 20
+HISTORY_ATTRIBUTES = ('RequestId', 'AccountName', 'PermissionSet', 'Status', 'RequestTimestamp', 'ExpirationTimestamp')
+HISTORY_ATTEMPTS = 3
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 31
+
+
+class AlreadyCounted(Exception):
+    """The REQUEST# marker did not hold the expected status; counted is what it holds (None when missing)"""
+
+    def __init__(self, counted):
+        self.counted = counted
+        super().__init__(f"Request is counted as {counted}")
+
+
+def counter_deltas(counted_status, status, account_name, day, created=False):
+    """{StatKey: {attribute: delta}} for a request moving from counted_status (None = not counted) to status"""
+    deltas = {}
+
+    def add(key, attribute, delta):
+        counters = deltas.setdefault(key, {})
+        counters[attribute] = counters.get(attribute, 0) + delta
+
+    for state, sign in ((counted_status, -1), (status, 1)):
+        if state == ACTIVE:
+            add(f'ACTIVE#{account_name}', 'Count', sign)
+        elif state == PENDING:
+            add('PENDING', 'Count', sign)
+
+    if created:
+        add(f'DAY#{day}', 'Requested', 1)
+    if (counted_status, status) in ROLLBACKS:
+        add(f'DAY#{day}', DAY_COUNTERS[counted_status], -1)
+    elif status in DAY_COUNTERS and status != counted_status:
+        add(f'DAY#{day}', DAY_COUNTERS[status], 1)
+
+    return {
+        key: {attribute: delta for attribute, delta in counters.items() if delta}
+        for key, counters in deltas.items()
+        if any(counters.values())
+    }
+
+
+def record_change(old_item, new_item, changed_at=None):
+    """
+    Apply one change of a request (old_item None = created, new_item None =
+    deleted) to the aggregates. Returns True when the counters moved, False
+    when nothing changed or the change was already counted (a redelivered
+    record). Does nothing without STATS_TABLE.
+    """
+    if not load_config().stats_table_name:
+        return False
+
+    item = new_item or old_item
+    status = new_item.get('Status') if new_item else DELETED
+    counted = old_item.get('Status') if old_item else None
+    created = old_item is None
+    day = change_day(changed_at if changed_at is not None else time.time())
+
+    applied = stale = False
+    try:
+        if counted != status:
+            apply_counters(item['RequestId'], counted, status, counter_deltas(counted, status, item['AccountName'], day, created))
+            applied = True
+        else:
+            bump_version()
+    except AlreadyCounted as e:
+        if e.counted is not None or counted is None:
+            logger.debug("Change already counted", request_id=item['RequestId'], counted=e.counted, status=status)
+            stale = True
+        elif status != DELETED:
+            # Request from before STATS_TABLE was set: start counting it from its new status
+            apply_counters(item['RequestId'], None, status, counter_deltas(None, status, item['AccountName'], day))
+            applied = True
+        else:
+            bump_version()
+
+    if new_item and not stale and (old_item is None or _history_changed(old_item, new_item)):
+        update_user_history(new_item)
+
+    return applied
+
+
+def apply_counters(request_id, counted_status, status, deltas):
+    """Move the request's marker from counted_status to status and apply deltas (plus the version), all or nothing"""
+    table_name = load_config().stats_table_name
+    deltas = dict(deltas, **{VERSION_KEY: {'Version': 1}})
+    marker = {':status': status}
+    update_expression = 'SET CountedStatus = :status'
+    if status in FINISHED_STATES:
+        update_expression += ', ExpiresAt = :expires'
+        marker[':expires'] = int(time.time()) + MARKER_TTL_SECONDS
+    else:
+        update_expression += ' REMOVE ExpiresAt'
+    if counted_status is None:
+        condition = 'attribute_not_exists(CountedStatus)'
+    else:
+        condition = 'CountedStatus = :counted'
+        marker[':counted'] = counted_status
+
+    transact_items = [{'Update': {
+        'TableName': table_name,
+        'Key': {'StatKey': {'S': f'REQUEST#{request_id}'}},
+        'UpdateExpression': update_expression,
+        'ConditionExpression': condition,
+        'ExpressionAttributeValues': to_attribute_values(marker),
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+    }}]
+    for key, counters in deltas.items():
+        names, values = {}, {}
+        for index, (attribute, delta) in enumerate(counters.items()):
+            names[f'#a{index}'] = attribute
+            values[f':a{index}'] = delta
+        transact_items.append({'Update': {
+            'TableName': table_name,
+            'Key': {'StatKey': {'S': key}},
+            'UpdateExpression': 'ADD ' + ', '.join(f'#a{index} :a{index}' for index in range(len(counters))),
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': to_attribute_values(values)
+        }})
+
+    try:
+        get_client('dynamodb').transact_write_items(TransactItems=transact_items)
+    except ClientError as e:
+        reasons = e.response.get('CancellationReasons') or []
+        if e.response['Error']['Code'] != 'TransactionCanceledException' or not reasons \
+                or reasons[0].get('Code') != 'ConditionalCheckFailed':
+            raise
+        current = from_attribute_values(reasons[0].get('Item') or {})
+        raise AlreadyCounted(current.get('CountedStatus')) from None
+
+    logger.debug("Stats updated", request_id=request_id, status=status, counters=len(deltas))
+
+
+def bump_version():
+    """Count a change that moved no counters (e.g. an extension) in the table version"""
+    get_table(load_config().stats_table_name).update_item(
+        Key={'StatKey': VERSION_KEY},
+        UpdateExpression='ADD Version :one',
+        ExpressionAttributeValues={':one': 1}
+    )
+
+
+def read_version():
+    """The requests table version (0 before the first counted change)"""
+    item = get_table(load_config().stats_table_name).get_item(Key={'StatKey': VERSION_KEY}).get('Item') or {}
+    return int(item.get('Version', 0))
+
+
+def update_user_history(request_item):
+    """Insert or refresh the request in its user's recent history (optimistic, retried on conflicts)"""
+    table = get_table(load_config().stats_table_name)
+    key = f"USER#{request_item['UserId']}"
+    entry = {attribute: request_item[attribute] for attribute in HISTORY_ATTRIBUTES if attribute in request_item}
+
+    for _ in range(HISTORY_ATTEMPTS):
+        current = table.get_item(Key={'StatKey': key}, ConsistentRead=True).get('Item') or {}
+        recent = [existing for existing in current.get('Recent', []) if existing['RequestId'] != entry['RequestId']]
+        recent.append(entry)
+        recent.sort(key=lambda existing: existing.get('RequestTimestamp', 0), reverse=True)
+
+        version = current.get('Version')
+        condition = {'ConditionExpression': 'attribute_not_exists(StatKey)'} if version is None else {
+            'ConditionExpression': 'Version = :version',
+            'ExpressionAttributeValues': {':version': version}
+        }
+        try:
+            table.put_item(
+                Item={'StatKey': key, 'Recent': recent[:USER_HISTORY_LENGTH], 'Version': (version or 0) + 1},
+                **condition
+            )
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    logger.warning("User history changed concurrently, giving up", user_id=request_item['UserId'])
+
+
+def read_stats(account_names, days=DEFAULT_DAYS, user_id=None):
+    """The dashboard aggregates with one BatchGetItem (plus retries of unprocessed keys)"""
+    table_name = load_config().stats_table_name
+    day_keys = [change_day(time.time() - offset * 86400) for offset in range(days)]
+    keys = ['PENDING'] + [f'ACTIVE#{name}' for name in account_names] + [f'DAY#{day}' for day in day_keys]
+    if user_id:
+        keys.append(f'USER#{user_id}')
+
+    items = {}
+    request = {table_name: {'Keys': [{'StatKey': {'S': key}} for key in keys]}}
+    while request:
+        response = get_client('dynamodb').batch_get_item(RequestItems=request)
+        for item in response.get('Responses', {}).get(table_name, []):
+            item = from_attribute_values(item)
+            items[item['StatKey']] = item
+        request = response.get('UnprocessedKeys')
+
+    def count(key, attribute='Count'):
+        return items.get(key, {}).get(attribute, 0)
+
+    active = {name: count(f'ACTIVE#{name}') for name in account_names}
+    stats = {
+        'pending': count('PENDING'),
+        'active': active,
+        'active_total': sum(active.values()),
+        'days': [
+            dict({'date': day}, **{
+                attribute.lower(): count(f'DAY#{day}', attribute)
+                for attribute in ('Requested', 'Granted', 'Denied', 'Revoked', 'Failed')
+            })
+            for day in day_keys
+        ]
+    }
+    if user_id:
+        stats['recent'] = items.get(f'USER#{user_id}', {}).get('Recent', [])
+    return stats
+
+
+def _history_changed(old_item, new_item):
+    return any(old_item.get(attribute) != new_item.get(attribute) for attribute in HISTORY_ATTRIBUTES)
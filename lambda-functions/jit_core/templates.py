@@ -0,0 +1,264 @@
+import html
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+from string import Template
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .config import load_config
+from .log import get_logger
+
+logger = get_logger('jit_core.templates')
+
+RenderedNotification = namedtuple('RenderedNotification', ['subject', 'text', 'html'])
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S %Z'
+
+NEW_REQUEST_HINT = 'If you still need access, please submit a new request through the JIT Access Portal.'
+
+# Notification templates. Values use string.Template syntax ($field); a body is a
+# list of blocks: a paragraph (str), label/value rows (list of tuples) or a
+# bulleted list of rows from a list field ({'items': field, 'row': template}).
+# Fields listed in 'timestamps' are epoch seconds, shown in NOTIFICATION_TIMEZONE.
+TEMPLATES = {
+    'granted': {
+        'subject': '✓ JIT Access Granted - $permission_set',
+        'body': [
+            'Your JIT access request has been APPROVED and access is now ACTIVE.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'), ('Expires', '$expires'),
+             ('Duration', '$duration_minutes minutes')],
+            'Your access will be automatically revoked after $duration_minutes minutes.'
+        ],
+        'footer': 'Request ID: $request_id',
+        'timestamps': ('expires',)
+    },
+    'granted_batch': {
+        'subject': '✓ JIT Access Granted - $grant_count grants',
+        'body': [
+            'Your JIT access requests have been APPROVED and access is now ACTIVE.',
+            {'items': 'grants', 'row': '$account: $permission_set (Request ID: $request_id)'},
+            [('Expires', '$expires'), ('Duration', '$duration_minutes minutes')],
+            'Your access will be automatically revoked after $duration_minutes minutes.'
+        ],
+        'footer': 'Batch ID: $batch_id',
+        'timestamps': ('expires',)
+    },
+    'extended': {
+        'subject': '✓ JIT Access Extended - $permission_set',
+        'body': [
+            'You already had ACTIVE access, so your existing grant has been EXTENDED instead of granted again.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'), ('Expires', '$expires')],
+            'Your access will be automatically revoked at the new expiration time.'
+        ],
+        'footer': 'Request ID: $request_id',
+        'timestamps': ('expires',)
+    },
+    'approved': {
+        'subject': '✓ JIT Access Request APPROVED',
+        'body': [
+            'Your JIT access request has been APPROVED and access is now ACTIVE.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'), ('Approver', '$approver'),
+             ('Comments', '$comments'), ('Expires', '$expires')],
+            'Your access will be automatically revoked at the expiration time.'
+        ],
+        'footer': 'Request ID: $request_id',
+        'timestamps': ('expires',)
+    },
+    'denied': {
+        'subject': '✗ JIT Access Request DENIED',
+        'body': [
+            'Your JIT access request has been DENIED.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'), ('Approver', '$approver'),
+             ('Reason', '$comments')]
+        ],
+        'footer': 'Request ID: $request_id'
+    },
+    'failed': {
+        'subject': '✗ JIT Access Request FAILED - $permission_set',
+        'body': [
+            'Your JIT access request could not be provisioned.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'), ('Error', '$error')],
+            'Please submit a new request through the JIT Access Portal.'
+        ],
+        'footer': 'Request ID: $request_id'
+    },
+    'revoked_expired': {
+        'subject': '⏱ JIT Access REVOKED - $permission_set',
+        'body': [
+            'Your JIT access has been automatically REVOKED as the time limit has expired.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'),
+             ('Access Duration', '$duration_minutes minutes')],
+            NEW_REQUEST_HINT
+        ],
+        'footer': 'Request ID: $request_id'
+    },
+    'revoked_manual': {
+        'subject': '⏱ JIT Access REVOKED (Manual)',
+        'body': [
+            'Your JIT access has been MANUALLY REVOKED.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'), ('Revoked by', '$revoker')],
+            NEW_REQUEST_HINT
+        ],
+        'footer': 'Request ID: $request_id'
+    },
+    'revoked_bulk': {
+        'subject': '⏱ JIT Access REVOKED (Bulk)',
+        'body': [
+            'Your JIT access has been REVOKED as part of a bulk revocation.',
+            [('Account', '$account'), ('Permission Set', '$permission_set'), ('Revoked by', '$revoker')],
+            NEW_REQUEST_HINT
+        ],
+        'footer': 'Request ID: $request_id'
+    },
+    'approval_required': {
+        'subject': 'JIT Access Approval Required - $user',
+        'body': [
+            'JIT Access Approval Required',
+            [('Request ID', '$request_id'), ('User', '$user'), ('Account', '$account'),
+             ('Permission Set', '$permission_set'), ('Reason', '$reason')],
+            'This is a HIGH RISK access request requiring approval.'
+        ]
+    }
+}
+
+HTML_LAYOUT = (
+    '<!DOCTYPE html><html><head><meta charset="UTF-8"></head>'
+    '<body style="font-family:Arial,Helvetica,sans-serif;color:#16191f;line-height:1.5">'
+    '<h2 style="color:#232f3e">{title}</h2><!--content-->{content}<!--/content--></body></html>'
+)
+HTML_ROW = '<tr><th style="text-align:left;padding:2px 16px 2px 0">{label}</th><td>{value}</td></tr>'
+HTML_FOOTER = '<p style="color:#687078;font-size:12px">{footer}</p>'
+
+_compiled = {}
+_compile_lock = threading.Lock()
+_zones = {}
+
+
+class CompiledTemplate:
+    """
+    A template turned into str.format_map strings (plain text and HTML) once,
+    so rendering is a handful of C-level format calls per message
+    """
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.timestamps = spec.get('timestamps', ())
+        self.subject = _to_format(spec['subject'])
+        self.items = {}
+
+        text_blocks, html_blocks = [], []
+        for block in spec['body']:
+            if isinstance(block, str):
+                text_blocks.append(_to_format(block))
+                html_blocks.append(f'<p>{_to_format(block, escape=True)}</p>')
+            elif isinstance(block, dict):
+                self.items[block['items']] = (_to_format(block['row']), _to_format(block['row'], escape=True))
+                text_blocks.append(f"{{{block['items']}}}")
+                html_blocks.append(f"<ul>{{{block['items']}}}</ul>")
+            else:
+                text_blocks.append('\n'.join(f'{_to_format(label)}: {_to_format(value)}' for label, value in block))
+                html_blocks.append('<table>' + ''.join(
+                    HTML_ROW.format(label=_to_format(label, escape=True), value=_to_format(value, escape=True))
+                    for label, value in block
+                ) + '</table>')
+
+        if spec.get('footer'):
+            text_blocks.append(_to_format(spec['footer']))
+            html_blocks.append(HTML_FOOTER.format(footer=_to_format(spec['footer'], escape=True)))
+
+        # Same shape as the hand-written bodies: leading and trailing newline
+        self.text = '\n' + '\n\n'.join(text_blocks) + '\n'
+        self.html = HTML_LAYOUT.replace('{title}', '{_subject}').replace('{content}', ''.join(html_blocks))
+
+    def render(self, fields, zone_name):
+        text_fields = {key: '' if value is None else str(value) for key, value in fields.items()}
+        for key in self.timestamps:
+            text_fields[key] = format_timestamp(fields[key], zone_name)
+        html_fields = {key: html.escape(value) for key, value in text_fields.items()}
+
+        for key, (text_row, html_row) in self.items.items():
+            rows = [{name: '' if value is None else str(value) for name, value in row.items()} for row in fields[key]]
+            text_fields[key] = '\n'.join('- ' + text_row.format_map(row) for row in rows)
+            html_fields[key] = ''.join(
+                '<li>' + html_row.format_map({name: html.escape(value) for name, value in row.items()}) + '</li>'
+                for row in rows
+            )
+
+        subject = self.subject.format_map(text_fields)
+        html_fields['_subject'] = html.escape(subject)
+        return RenderedNotification(subject, self.text.format_map(text_fields), self.html.format_map(html_fields))
+
+
+def get_template(name):
+    """Compiled template by name, compiled on first use and kept for the life of the container"""
+    template = _compiled.get(name)
+    if template is None:
+        with _compile_lock:
+            template = _compiled.get(name)
+            if template is None:
+                template = _compiled[name] = CompiledTemplate(name, TEMPLATES[name])
+    return template
+
+
+def render_notification(name, fields, zone_name=None):
+    """Render a template to (subject, text, html); timestamps use NOTIFICATION_TIMEZONE unless zone_name is given"""
+    return get_template(name).render(fields, zone_name or load_config().notification_timezone)
+
+
+def render_digest(notifications):
+    """Combine several rendered emails to one user into a single message"""
+    subject = f"JIT Access - {len(notifications)} updates"
+    text = '\n\n'.join(
+        f"{notification['subject']}\n{'-' * len(notification['subject'])}\n{notification['body'].strip()}"
+        for notification in notifications
+    ) + '\n'
+
+    sections = []
+    for notification in notifications:
+        if notification.get('html'):
+            content = notification['html']
+            start, end = content.find('<!--content-->'), content.rfind('<!--/content-->')
+            if start != -1 and end != -1:
+                content = content[start + len('<!--content-->'):end]
+        else:
+            content = f"<pre>{html.escape(notification['body'].strip())}</pre>"
+        sections.append(f"<h3>{html.escape(notification['subject'])}</h3>{content}")
+
+    body_html = HTML_LAYOUT.format(title=html.escape(subject), content='<hr>'.join(sections))
+    return RenderedNotification(subject, text, body_html)
+
+
+def format_timestamp(value, zone_name='UTC'):
+    """Epoch seconds as 'YYYY-MM-DD HH:MM:SS <zone>'"""
+    return datetime.fromtimestamp(int(value), tz=_zone(zone_name)).strftime(TIMESTAMP_FORMAT)
+
+
+def _zone(name):
+    zone = _zones.get(name)
+    if zone is None:
+        try:
+            zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning("Unknown time zone, using UTC", zone=name)
+            zone = timezone.utc
+        _zones[name] = zone
+    return zone
+
+
+def _to_format(source, escape=False):
+    """Translate string.Template syntax into a str.format_map string (literal text optionally HTML-escaped)"""
+    parts, position = [], 0
+    for match in Template.pattern.finditer(source):
+        literal = source[position:match.start()]
+        if match.group('escaped') is not None:
+            literal += '$'
+        parts.append((html.escape(literal, quote=False) if escape else literal).replace('{', '{{').replace('}', '}}'))
+        name = match.group('named') or match.group('braced')
+        if name:
+            parts.append(f'{{{name}}}')
+        elif match.group('invalid') is not None:
+            raise ValueError(f"Invalid placeholder in template: {source!r}")
+        position = match.end()
+    tail = source[position:]
+    parts.append((html.escape(tail, quote=False) if escape else tail).replace('{', '{{').replace('}', '}}'))
+    return ''.join(parts)
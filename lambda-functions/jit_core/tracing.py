@@ -0,0 +1,247 @@
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from . import log
+from .config import load_config
+
+# Error codes AWS services use for throttling
+THROTTLING_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'TooManyRequestsException',
+    'RequestLimitExceeded', 'ProvisionedThroughputExceededException', 'RequestThrottled',
+    'RequestThrottledException', 'SlowDown'
+}
+
+METRICS_NAMESPACE = 'JITAccess'
+SLOWEST_CALLS = 3
+
+# Context keys stored in botocore's per-request context dict
+_START = 'jit_trace_start'
+_ATTEMPTS = 'jit_trace_attempts'
+_THROTTLES = 'jit_trace_throttles'
+
+# The trace of the invocation in progress (one invocation per container at a time)
+_current = None
+
+# Callables run at the end of every traced invocation (e.g. the notification outbox flush)
+_invocation_end_hooks = []
+
+
+class Trace:
+    """AWS calls and timed spans recorded during one invocation"""
+
+    def __init__(self, function_name, request_id):
+        self.function_name = function_name
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.operations = {}
+        self.spans = {}
+        self.slowest = []
+        self._lock = threading.Lock()
+
+    def record_call(self, operation, duration_ms, retries=0, throttles=0, error=None):
+        with self._lock:
+            stats = self.operations.setdefault(operation, {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'retries': 0, 'throttles': 0, 'errors': 0
+            })
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['retries'] += retries
+            stats['throttles'] += throttles
+            if error:
+                stats['errors'] += 1
+
+            self.slowest.append((duration_ms, operation))
+            self.slowest.sort(reverse=True)
+            del self.slowest[SLOWEST_CALLS:]
+
+    def record_span(self, name, duration_ms):
+        with self._lock:
+            stats = self.spans.setdefault(name, {'count': 0, 'total_ms': 0.0})
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+
+    def summary(self, status_code=None, error=None):
+        """One JSON-serializable record describing the invocation"""
+        with self._lock:
+            operations = {
+                name: dict(stats, total_ms=round(stats['total_ms'], 2), max_ms=round(stats['max_ms'], 2))
+                for name, stats in sorted(self.operations.items(), key=lambda entry: -entry[1]['total_ms'])
+            }
+            record = {
+                'type': 'jit-trace',
+                'function': self.function_name,
+                'request_id': self.request_id,
+                'duration_ms': round((time.perf_counter() - self.started) * 1000, 2),
+                'aws_calls': sum(stats['count'] for stats in operations.values()),
+                'aws_ms': round(sum(stats['total_ms'] for stats in operations.values()), 2),
+                'retries': sum(stats['retries'] for stats in operations.values()),
+                'throttles': sum(stats['throttles'] for stats in operations.values()),
+                'operations': operations,
+                'slowest': [{'operation': operation, 'ms': round(ms, 2)} for ms, operation in self.slowest]
+            }
+            if self.spans:
+                record['spans'] = {
+                    name: dict(stats, total_ms=round(stats['total_ms'], 2)) for name, stats in self.spans.items()
+                }
+        if status_code is not None:
+            record['status_code'] = status_code
+        if error:
+            record['error'] = error
+        return record
+
+
+def traced(handler):
+    """
+    Decorator for lambda_handler: trace every AWS call made during the
+    invocation, emit one summary line when it returns (TRACE_FORMAT) and
+    scope the structured log buffer to the invocation
+    """
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _current
+
+        trace = Trace(
+            getattr(context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', handler.__module__),
+            getattr(context, 'aws_request_id', None)
+        )
+        _current = trace
+        log.start_invocation(context)
+        response, error = None, None
+        try:
+            response = handler(event, context)
+            return response
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _run_invocation_end_hooks()
+            _current = None
+            status_code = response.get('statusCode') if isinstance(response, dict) else None
+            emit(trace.summary(status_code, error))
+            log.end_invocation()
+
+    return wrapper
+
+
+def at_invocation_end(hook):
+    """Run hook() when each traced invocation finishes, while its trace is still open"""
+    if hook not in _invocation_end_hooks:
+        _invocation_end_hooks.append(hook)
+    return hook
+
+
+def in_invocation():
+    return _current is not None
+
+
+def _run_invocation_end_hooks():
+    for hook in _invocation_end_hooks:
+        try:
+            hook()
+        except Exception as e:
+            log.get_logger('jit_core.tracing').exception("Invocation end hook failed", hook=hook.__name__, error=str(e))
+
+
+@contextmanager
+def span(name):
+    """Time a block (or, as a decorator, a function) as a named span of the current trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace = _current
+        if trace is not None:
+            trace.record_span(name, (time.perf_counter() - started) * 1000)
+
+
+def record_call(operation, duration_ms, retries=0, throttles=0, error=None):
+    """Record an AWS call made outside botocore (e.g. by a test fake)"""
+    trace = _current
+    if trace is not None:
+        trace.record_call(operation, duration_ms, retries, throttles, error)
+
+
+def emit(record):
+    """Print the summary as plain JSON or as a CloudWatch Embedded Metric Format document"""
+    trace_format = load_config().trace_format
+    if trace_format == 'off':
+        return
+
+    if trace_format == 'emf':
+        record = dict(record, FunctionName=record['function'])
+        record.update({
+            'InvocationDuration': record['duration_ms'],
+            'AwsCallDuration': record['aws_ms'],
+            'AwsCalls': record['aws_calls'],
+            'AwsRetries': record['retries'],
+            'AwsThrottles': record['throttles'],
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['FunctionName']],
+                    'Metrics': [
+                        {'Name': 'InvocationDuration', 'Unit': 'Milliseconds'},
+                        {'Name': 'AwsCallDuration', 'Unit': 'Milliseconds'},
+                        {'Name': 'AwsCalls', 'Unit': 'Count'},
+                        {'Name': 'AwsRetries', 'Unit': 'Count'},
+                        {'Name': 'AwsThrottles', 'Unit': 'Count'}
+                    ]
+                }]
+            }
+        })
+
+    log.write_record(record)
+
+
+def instrument(client):
+    """Register the tracing hooks on a boto3 client's event system"""
+    events = client.meta.events
+    events.register('before-parameter-build', _on_start, unique_id='jit-trace-start')
+    events.register('needs-retry', _on_attempt, unique_id='jit-trace-attempt')
+    events.register('after-call', _on_after_call, unique_id='jit-trace-after-call')
+    events.register('after-call-error', _on_after_call_error, unique_id='jit-trace-after-call-error')
+    return client
+
+
+def _on_start(context=None, **kwargs):
+    if context is not None:
+        context[_START] = time.perf_counter()
+
+
+def _on_attempt(request_dict=None, response=None, attempts=None, **kwargs):
+    # Called after every attempt, including the last one
+    context = (request_dict or {}).get('context')
+    if context is None:
+        return None
+    context[_ATTEMPTS] = attempts
+    if response is not None and response[1].get('Error', {}).get('Code') in THROTTLING_CODES:
+        context[_THROTTLES] = context.get(_THROTTLES, 0) + 1
+    return None
+
+
+def _on_after_call(event_name=None, parsed=None, context=None, **kwargs):
+    error = (parsed or {}).get('Error', {}).get('Code')
+    retries = (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts')
+    _finish_call(event_name, context, error, retries)
+
+
+def _on_after_call_error(event_name=None, exception=None, context=None, **kwargs):
+    _finish_call(event_name, context, type(exception).__name__, None)
+
+
+def _finish_call(event_name, context, error, retries):
+    trace = _current
+    if trace is None or context is None or _START not in context:
+        return
+
+    duration_ms = (time.perf_counter() - context.pop(_START)) * 1000
+    if retries is None:
+        retries = max(context.get(_ATTEMPTS, 1) - 1, 0)
+    # event_name is '<event>.<service>.<Operation>'
+    operation = event_name.split('.', 1)[1]
+    trace.record_call(operation, duration_ms, retries, context.get(_THROTTLES, 0), error)
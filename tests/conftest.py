@@ -0,0 +1,49 @@
+"""
+Shared setup for the jit_core and handler tests
+jit_core is imported from lambda-functions/, with a minimal environment and
+no AWS access: jit_core tests that need a client install a botocore
+Stubber-wrapped one with jit_core.set_client(). Handler tests (test_handler_*)
+run the real lambda_handler against the in-process fakes of benchmarks/, loaded
+with load_test.load_handler in the benchmark environment.
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'lambda-functions'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+TEST_ENV = {
+    'DYNAMODB_TABLE': 'JIT-Access-Requests',
+    'REGION': 'us-east-1',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'test',
+    'AWS_SECRET_ACCESS_KEY': 'test',
+    'IDENTITY_CENTER_INSTANCE_ARN': 'arn:aws:sso:::instance/ssoins-0000000000000000'
+}
+os.environ.update(TEST_ENV)
+
+from jit_core import reset_clients  # noqa: E402
+from jit_core.config import set_config  # noqa: E402
+from fakes import FakeAWS  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_state():
+    """Every test starts from the environment above with no memoized clients"""
+    set_config(None)
+    reset_clients()
+    yield
+    set_config(None)
+    reset_clients()
+
+
+@pytest.fixture
+def aws():
+    """Fake AWS services (benchmarks/fakes.py) behind every jit_core client and table"""
+    fake = FakeAWS()
+    fake.install()
+    return fake
@@ -0,0 +1,82 @@
+from jit_core.cache import TTLCache, get_cache, invalidate_all
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache('test', ttl_seconds=10, clock=clock)
+    cache.set('a', 1)
+
+    clock.now += 9
+    assert cache.get('a') == 1
+    clock.now += 2
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_zero_ttl_never_expires():
+    clock = FakeClock()
+    cache = TTLCache('test', ttl_seconds=0, clock=clock)
+    cache.set('a', 1)
+
+    clock.now += 10 ** 9
+    assert cache.get('a') == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache('test', maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_get_or_load_caches_none_only_when_asked():
+    cache = TTLCache('test')
+    calls = []
+
+    def loader(key):
+        calls.append(key)
+        return None
+
+    cache.get_or_load('a', loader)
+    cache.get_or_load('a', loader)
+    assert calls == ['a', 'a']
+
+    cache.get_or_load('b', loader, cache_none=True)
+    cache.get_or_load('b', loader, cache_none=True)
+    assert calls == ['a', 'a', 'b']
+
+
+def test_hit_and_miss_counters():
+    cache = TTLCache('test')
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_invalidate_all_keeps_the_client_cache():
+    users = get_cache('test-users')
+    clients = get_cache('clients')
+    users.set('someone@example.com', {'UserId': 'u-1'})
+    clients.set('test-service', object())
+
+    invalidate_all()
+
+    assert users.get('someone@example.com') is None
+    assert clients.get('test-service') is not None
+    clients.invalidate('test-service')
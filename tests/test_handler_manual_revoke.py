@@ -0,0 +1,49 @@
+import json
+import time
+
+from load_test import load_handler, make_request
+
+
+def bulk(handler, **filters):
+    response = handler(dict({'bulk': True, 'revoker_email': 'security@example.com'}, **filters), None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def status_of(aws, item):
+    return aws.requests.get_item(Key={'RequestId': item['RequestId']})['Item']['Status']
+
+
+def test_bulk_revoke_needs_a_filter_or_confirm_all(aws):
+    handler = load_handler('JIT-Manual-Revoke').lambda_handler
+
+    assert bulk(handler)[0] == 400
+
+
+def test_bulk_revoke_revokes_active_and_cancels_provisioning(aws):
+    now = int(time.time())
+    active, provisioning, pending = (make_request(i, status, now) for i, status in
+                                     enumerate(['ACTIVE', 'PROVISIONING', 'PENDING']))
+    aws.requests.load([active, provisioning, pending])
+    handler = load_handler('JIT-Manual-Revoke').lambda_handler
+
+    status, body = bulk(handler, confirm_all=True)
+
+    assert status == 200
+    assert (body['matched'], body['revoked'], body['cancelled'], body['failed']) == (2, 1, 1, 0)
+    assert {result['request_id']: result['status'] for result in body['results']} == {
+        active['RequestId']: 'REVOKED', provisioning['RequestId']: 'CANCELLED'
+    }
+    assert [status_of(aws, item) for item in (active, provisioning, pending)] == ['REVOKED', 'REVOKED', 'PENDING']
+    assert aws.recorder.calls['sso-admin.DeleteAccountAssignment'] == 2
+
+
+def test_bulk_revoke_by_user_leaves_other_users_alone(aws):
+    now = int(time.time())
+    mine, theirs = make_request(1, 'ACTIVE', now), make_request(2, 'ACTIVE', now)
+    aws.requests.load([mine, theirs])
+    handler = load_handler('JIT-Manual-Revoke').lambda_handler
+
+    status, body = bulk(handler, user_email=mine['UserEmail'].upper())
+
+    assert (status, body['revoked']) == (200, 1)
+    assert [status_of(aws, item) for item in (mine, theirs)] == ['REVOKED', 'ACTIVE']
@@ -0,0 +1,79 @@
+import base64
+import json
+import time
+
+from load_test import api_event, load_handler, make_request
+
+
+def call(handler, method, body=None, params=None):
+    response = handler(api_event(method, body, params), None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def post(handler, **body):
+    return call(handler, 'POST', dict({'reason': 'test', 'duration_minutes': 30}, **body))
+
+
+def page_token(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def test_pages_follow_next_token_to_the_end(aws):
+    now = int(time.time())
+    aws.requests.load(make_request(i, 'ACTIVE', now) for i in range(25))
+    handler = load_handler('JIT-Request-Handler').lambda_handler
+
+    seen = []
+    params = {'status': 'ACTIVE', 'limit': '10'}
+    while True:
+        status, body = call(handler, 'GET', params=params)
+        assert status == 200
+        seen.extend(item['RequestId'] for item in body['requests'])
+        if 'next_token' not in body:
+            break
+        params = dict(params, next_token=body['next_token'])
+
+    assert sorted(seen) == sorted(make_request(i, 'ACTIVE', now)['RequestId'] for i in range(25))
+
+
+def test_tampered_next_token_is_rejected(aws):
+    handler = load_handler('JIT-Request-Handler').lambda_handler
+    key = {'RequestId': 'x', 'Status': 'ACTIVE', 'RequestTimestamp': 1}
+
+    assert call(handler, 'GET', params={'status': 'ACTIVE', 'next_token': '!!!'})[0] == 400
+    assert call(handler, 'GET', params={'status': 'ACTIVE', 'next_token': page_token(dict(key, Extra=1))})[0] == 400
+    assert call(handler, 'GET', params={'status': 'ACTIVE', 'next_token': page_token(dict(key, RequestTimestamp='1'))})[0] == 400
+    status, body = call(handler, 'GET', params={'status': 'ACTIVE', 'next_token': page_token(dict(key, Status='DENIED'))})
+    assert status == 400
+    assert body['error'] == 'next_token does not belong to this query'
+
+
+def test_batch_writes_every_record_and_grants_low_risk(aws):
+    handler = load_handler('JIT-Request-Handler', PROVISIONING_QUEUE_URL=None).lambda_handler
+
+    status, body = post(handler, user_email='batch@example.com', grants=[
+        {'account_name': 'Management', 'permission_set': 'S3FullAccess'},
+        {'account_name': 'Audit', 'permission_set': 'EmergencyAdmin'}
+    ])
+
+    assert status == 200
+    assert [result['status'] for result in body['results']] == ['ACTIVE', 'PENDING']
+    stored = {item['RequestId']: item for item in aws.requests.scan()['Items']}
+    assert {stored[result['request_id']]['Status'] for result in body['results']} == {'ACTIVE', 'PENDING'}
+    assert {item['BatchId'] for item in stored.values()} == {body['batch_id']}
+    assert aws.recorder.calls['sso-admin.CreateAccountAssignment'] == 1
+
+
+def test_repeated_low_risk_request_extends_the_grant(aws):
+    handler = load_handler('JIT-Request-Handler', PROVISIONING_QUEUE_URL=None).lambda_handler
+    request = {'user_email': 'repeat@example.com', 'account_name': 'Audit', 'permission_set': 'S3FullAccess'}
+
+    status, first = post(handler, **request)
+    assert (status, first['status']) == (200, 'ACTIVE')
+    status, second = post(handler, **dict(request, duration_minutes=60))
+
+    assert status == 200
+    assert second['extended'] is True
+    assert second['request_id'] == first['request_id']
+    assert len(aws.requests.scan()['Items']) == 1
+    assert aws.recorder.calls['sso-admin.CreateAccountAssignment'] == 1
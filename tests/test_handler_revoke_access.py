@@ -0,0 +1,88 @@
+import json
+import time
+
+import pytest
+
+from load_test import load_handler, make_request
+
+# Second 0 of a minute, so expiries inside it are easy to place
+MINUTE = (int(time.time()) // 60 + 1) * 60
+
+
+@pytest.fixture
+def handler(aws, monkeypatch):
+    monkeypatch.setattr(time, 'time', lambda: MINUTE)
+    return load_handler('JIT-Revoke-Access')
+
+
+def revocation_event(item, **extra):
+    return dict({
+        'request_id': item['RequestId'],
+        'user_id': item['UserId'],
+        'account_id': item['AccountId'],
+        'permission_set_arn': item['PermissionSetArn']
+    }, **extra)
+
+
+def fire(handler, event):
+    response = handler.lambda_handler(event, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def stored(aws, item):
+    return aws.requests.get_item(Key={'RequestId': item['RequestId']})['Item']
+
+
+def test_rule_firing_at_the_start_of_the_expiry_minute_revokes(aws, handler):
+    # A rule without expires_at fires at second 0 of the minute its grant expires in
+    grant = make_request(1, 'ACTIVE', MINUTE, expires_in=30)
+    aws.requests.load([grant])
+
+    status, body = fire(handler, revocation_event(grant))
+
+    assert (status, body['message']) == (200, 'Access successfully revoked')
+    assert stored(aws, grant)['Status'] == 'REVOKED'
+    assert aws.recorder.calls['sso-admin.DeleteAccountAssignment'] == 1
+    assert aws.recorder.calls['events.PutRule'] == 0
+
+
+def test_extended_grant_is_rescheduled_not_revoked(aws, handler):
+    grant = make_request(1, 'ACTIVE', MINUTE, expires_in=3630)
+    aws.requests.load([grant])
+    rules = []
+    aws.clients['events'].responses['put_rule'] = lambda **kwargs: rules.append(kwargs) or {}
+
+    status, body = fire(handler, revocation_event(grant, expires_at=MINUTE - 30))
+
+    assert (status, body['expires_at']) == (200, MINUTE + 3630)
+    assert body['message'] == 'Access not expired yet, revocation rescheduled'
+    assert stored(aws, grant)['Status'] == 'ACTIVE'
+    # Rounded up to the next whole minute, so the new rule cannot fire early
+    fires_at = time.gmtime(MINUTE + 3660)
+    assert [rule['ScheduleExpression'] for rule in rules] == [
+        f'cron({fires_at.tm_min} {fires_at.tm_hour} {fires_at.tm_mday} {fires_at.tm_mon} ? {fires_at.tm_year})'
+    ]
+    assert aws.recorder.calls['sso-admin.DeleteAccountAssignment'] == 0
+
+
+def test_already_revoked_grant_needs_no_revocation(aws, handler):
+    grant = make_request(1, 'REVOKED', MINUTE, expires_in=-60)
+    aws.requests.load([grant])
+
+    status, body = fire(handler, revocation_event(grant, expires_at=MINUTE - 60))
+
+    assert (status, body['message']) == (200, 'No revocation needed, status is REVOKED')
+    assert aws.recorder.calls['sso-admin.DeleteAccountAssignment'] == 0
+
+
+def test_sweeper_revokes_expired_grants_and_skips_extended_ones(aws, handler):
+    expired, active = make_request(1, 'ACTIVE', MINUTE, expires_in=-60), make_request(2, 'ACTIVE', MINUTE)
+    aws.requests.load([expired, active])
+
+    status, body = fire(handler, {'mode': 'sweep'})
+
+    assert (status, body['revoked'], body['skipped'], body['failed']) == (200, 1, 0, 0)
+    assert [stored(aws, item)['Status'] for item in (expired, active)] == ['REVOKED', 'ACTIVE']
+    # Extended between the sweeper's query and its claim
+    assert handler.revoke_expired_grant(active) == 'SKIPPED'
+    assert stored(aws, active)['Status'] == 'ACTIVE'
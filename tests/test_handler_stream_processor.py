@@ -0,0 +1,27 @@
+import dataclasses
+import time
+
+from jit_core.config import load_config, set_config
+from load_test import load_handler, make_request, stream_record
+
+
+def test_failed_record_is_reported_and_stops_only_its_request(aws):
+    now = int(time.time())
+    failing, other = make_request(1, 'PROVISIONING', now), make_request(2, 'PROVISIONING', now)
+    aws.requests.load([failing, other])
+    set_config(dataclasses.replace(load_config(), side_effect_mode='stream'))
+    handler = load_handler('JIT-Stream-Processor').lambda_handler
+
+    def create_account_assignment(**kwargs):
+        if kwargs['PrincipalId'] == failing['UserId']:
+            raise RuntimeError('Identity Center unavailable')
+        return {'AccountAssignmentCreationStatus': {'Status': 'SUCCEEDED', 'RequestId': 'assignment'}}
+    aws.clients['sso-admin'].responses['create_account_assignment'] = create_account_assignment
+
+    first = stream_record('INSERT', failing)
+    later = stream_record('MODIFY', dict(failing, DurationMinutes=30), failing)
+    response = handler({'Records': [first, stream_record('INSERT', other), later]}, None)
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': first['dynamodb']['SequenceNumber']}]}
+    assert aws.requests.get_item(Key={'RequestId': other['RequestId']})['Item']['Status'] == 'ACTIVE'
+    assert aws.requests.get_item(Key={'RequestId': failing['RequestId']})['Item']['Status'] == 'PROVISIONING'
@@ -0,0 +1,45 @@
+import dataclasses
+import json
+
+import pytest
+
+from jit_core.config import load_config, set_config
+from jit_core.push import CHANNEL_INDEX
+from load_test import CONNECTIONS_TABLE, WEBSOCKET_ENDPOINT, load_handler
+
+
+@pytest.fixture
+def handler(aws):
+    aws.add_table(CONNECTIONS_TABLE, 'SubscriptionKey', indexes={CHANNEL_INDEX: ('Channel', 'ConnectionId')})
+    aws.install()
+    set_config(dataclasses.replace(load_config(), connections_table_name=CONNECTIONS_TABLE,
+                                   websocket_endpoint=WEBSOCKET_ENDPOINT))
+    return load_handler('JIT-WebSocket-Handler').lambda_handler
+
+
+def connect(handler, authorizer=None, params=None):
+    return handler({
+        'requestContext': {'routeKey': '$connect', 'connectionId': 'connection-1', 'authorizer': authorizer},
+        'queryStringParameters': params
+    }, None)
+
+
+def test_connect_without_authorizer_identity_is_refused(aws, handler):
+    response = connect(handler, params={'user': 'victim@example.com', 'approvals': 'true'})
+
+    assert response['statusCode'] == 403
+    assert aws.tables[CONNECTIONS_TABLE].scan()['Items'] == []
+
+
+def test_connect_subscribes_from_the_authorizer_context(aws, handler):
+    response = connect(handler, authorizer={'email': 'Boss@Example.com', 'groups': 'Managers,Other'},
+                       params={'user': 'someone-else@example.com'})
+
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['channels'] == ['user#boss@example.com', 'approvals']
+
+
+def test_query_string_cannot_grant_the_approvals_channel(aws, handler):
+    response = connect(handler, authorizer={'email': 'user@example.com', 'groups': ''}, params={'approvals': 'true'})
+
+    assert json.loads(response['body'])['channels'] == ['user#user@example.com']
@@ -0,0 +1,128 @@
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+
+from jit_core import TransitionConflict, set_client, transition_request
+from jit_core.lifecycle import (
+    ACTIVE, DENIED, ERROR, FAILED, PENDING, PROVISIONING, REVOKED, STATES, TRANSITIONS, allowed_transitions, update_for
+)
+
+
+def test_every_transition_connects_known_states():
+    for transition in TRANSITIONS.values():
+        assert transition.source in STATES
+        assert transition.target in STATES
+        assert transition.source != transition.target
+
+
+@pytest.mark.parametrize('name, source, target', [
+    ('approve', PENDING, ACTIVE),
+    ('deny', PENDING, DENIED),
+    ('approve_async', PENDING, PROVISIONING),
+    ('provisioned', PROVISIONING, ACTIVE),
+    ('provisioning_failed', PROVISIONING, FAILED),
+    ('expire', ACTIVE, REVOKED),
+    ('revoke', ACTIVE, REVOKED),
+    ('bulk_revoke', ACTIVE, REVOKED),
+    ('bulk_cancel', PROVISIONING, REVOKED),
+    ('revoke_failed', REVOKED, ERROR),
+    ('reopen', ACTIVE, PENDING),
+    ('restore', REVOKED, ACTIVE)
+])
+def test_transition_table(name, source, target):
+    transition = TRANSITIONS[name]
+    assert (transition.source, transition.target) == (source, target)
+
+
+def test_terminal_states_have_no_way_out():
+    for status in (DENIED, FAILED, ERROR):
+        assert allowed_transitions(status) == []
+
+
+def test_update_is_conditional_on_the_source_status():
+    update = update_for(TRANSITIONS['revoke'], {'RevokedBy': 'security@example.com'})
+    values = update['ExpressionAttributeValues']
+
+    assert update['ConditionExpression'] == '#status = :from'
+    assert (values[':from'], values[':to']) == (ACTIVE, REVOKED)
+    assert 'ADD #version :one' in update['UpdateExpression']
+    names = update['ExpressionAttributeNames']
+    set_values = {names[name]: values[f':{name[1:]}'] for name in names if name.startswith('#a')}
+    assert set_values['RevocationType'] == 'MANUAL'
+    assert set_values['RevokedBy'] == 'security@example.com'
+    assert {'RevokedTimestamp', 'UpdatedTimestamp', 'UpdatedDay'} <= set(set_values)
+
+
+def test_expire_also_requires_the_grant_to_have_expired():
+    update = update_for(TRANSITIONS['expire'])
+
+    assert update['ConditionExpression'] == '#status = :from AND #expires <= :now'
+    assert update['ExpressionAttributeNames']['#expires'] == 'ExpirationTimestamp'
+    assert 'AND #expires' not in update_for(TRANSITIONS['revoke'])['ConditionExpression']
+
+
+def test_update_with_version_also_requires_it():
+    update = update_for(TRANSITIONS['reopen'], version=3)
+
+    assert update['ConditionExpression'] == '#status = :from AND #version = :version'
+    assert update['ExpressionAttributeValues'][':version'] == 3
+    assert ' REMOVE ' in update['UpdateExpression']
+
+
+def stubbed_dynamodb():
+    client = boto3.client('dynamodb', region_name='us-east-1')
+    stubber = Stubber(client)
+    set_client('dynamodb', client)
+    return stubber
+
+
+def test_transition_request_returns_the_new_item():
+    stubber = stubbed_dynamodb()
+    stubber.add_response('update_item', {'Attributes': {
+        'RequestId': {'S': 'r-1'}, 'Status': {'S': REVOKED}, 'Version': {'N': '2'}
+    }}, {
+        'TableName': 'JIT-Access-Requests',
+        'Key': {'RequestId': {'S': 'r-1'}},
+        'UpdateExpression': ANY,
+        'ConditionExpression': '#status = :from',
+        'ExpressionAttributeNames': ANY,
+        'ExpressionAttributeValues': ANY,
+        'ReturnValues': 'ALL_NEW',
+        'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+    })
+
+    with stubber:
+        item = transition_request('r-1', 'revoke')
+
+    assert item['Status'] == REVOKED
+    stubber.assert_no_pending_responses()
+
+
+def test_lost_transition_raises_with_the_current_item():
+    stubber = stubbed_dynamodb()
+    stubber.add_client_error(
+        'update_item', 'ConditionalCheckFailedException',
+        response_meta={}, modeled_fields={'Item': {'RequestId': {'S': 'r-1'}, 'Status': {'S': REVOKED}}}
+    )
+
+    with stubber, pytest.raises(TransitionConflict) as conflict:
+        transition_request('r-1', 'revoke')
+
+    assert conflict.value.current_status == REVOKED
+    assert conflict.value.current['RequestId'] == 'r-1'
+
+
+def test_transition_of_a_missing_request():
+    stubber = stubbed_dynamodb()
+    stubber.add_client_error('update_item', 'ConditionalCheckFailedException')
+
+    with stubber, pytest.raises(TransitionConflict) as conflict:
+        transition_request('r-404', 'approve')
+
+    assert conflict.value.current is None
+
+
+def test_expire_can_check_the_expiry_against_a_given_time():
+    update = update_for(TRANSITIONS['expire'], expires_by=1733499059)
+
+    assert update['ExpressionAttributeValues'][':now'] == 1733499059
@@ -0,0 +1,45 @@
+from jit_core.schema import change_stamp, compact_item, expand_item, permission_set_arn, schedule_arn
+
+REQUEST = {
+    'RequestId': 'r-1',
+    'Status': 'ACTIVE',
+    'PermissionSetArn': permission_set_arn('ps-0000000000000001'),
+    'RevocationScheduleArn': schedule_arn('r-1', 'scheduler'),
+    'ApprovalComments': '',
+    'ErrorMessage': None
+}
+
+
+def test_compact_item_drops_what_can_be_rebuilt():
+    stored = compact_item(REQUEST)
+
+    assert stored['PermissionSetId'] == 'ps-0000000000000001'
+    assert stored['RevocationSchedule'] == 'scheduler'
+    assert not {'PermissionSetArn', 'RevocationScheduleArn', 'ApprovalComments', 'ErrorMessage'} & set(stored)
+    assert {'UpdatedTimestamp', 'UpdatedDay'} <= set(stored)
+
+
+def test_expand_item_restores_the_full_attributes():
+    expanded = expand_item(compact_item(REQUEST))
+
+    assert expanded['PermissionSetArn'] == REQUEST['PermissionSetArn']
+    assert expanded['RevocationScheduleArn'] == REQUEST['RevocationScheduleArn']
+    assert 'PermissionSetId' not in expanded and 'RevocationSchedule' not in expanded
+
+
+def test_unknown_arns_are_stored_in_full():
+    item = dict(REQUEST, RevocationScheduleArn='arn:aws:events:us-east-1:111111111111:rule/custom')
+    stored = compact_item(item)
+
+    assert stored['RevocationScheduleArn'] == item['RevocationScheduleArn']
+    assert expand_item(stored)['RevocationScheduleArn'] == item['RevocationScheduleArn']
+
+
+def test_items_written_before_compaction_read_as_they_are():
+    assert expand_item({'RequestId': 'r-1', 'PermissionSetArn': 'arn:x'}) == {'RequestId': 'r-1', 'PermissionSetArn': 'arn:x'}
+    assert expand_item(None) is None
+
+
+def test_change_stamp_uses_the_utc_day():
+    assert change_stamp(86399) == {'UpdatedTimestamp': 86399, 'UpdatedDay': '1970-01-01'}
+    assert change_stamp(86400)['UpdatedDay'] == '1970-01-02'
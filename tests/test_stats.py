@@ -0,0 +1,54 @@
+from jit_core.lifecycle import ACTIVE, DENIED, FAILED, PENDING, PROVISIONING, REVOKED
+from jit_core.stats import DELETED, counter_deltas
+
+DAY = '2026-01-01'
+
+
+def deltas(counted, status, created=False):
+    return counter_deltas(counted, status, 'Audit', DAY, created)
+
+
+def test_new_pending_request():
+    assert deltas(None, PENDING, created=True) == {
+        'PENDING': {'Count': 1},
+        f'DAY#{DAY}': {'Requested': 1}
+    }
+
+
+def test_approval_moves_pending_to_active():
+    assert deltas(PENDING, ACTIVE) == {
+        'PENDING': {'Count': -1},
+        'ACTIVE#Audit': {'Count': 1},
+        f'DAY#{DAY}': {'Granted': 1}
+    }
+
+
+def test_terminal_changes_count_the_day():
+    assert deltas(PENDING, DENIED) == {'PENDING': {'Count': -1}, f'DAY#{DAY}': {'Denied': 1}}
+    assert deltas(ACTIVE, REVOKED) == {'ACTIVE#Audit': {'Count': -1}, f'DAY#{DAY}': {'Revoked': 1}}
+    assert deltas(PROVISIONING, FAILED) == {f'DAY#{DAY}': {'Failed': 1}}
+
+
+def test_reopen_takes_back_the_grant():
+    # ACTIVE -> PENDING undoes an approval whose Identity Center call failed
+    assert deltas(ACTIVE, PENDING) == {
+        'ACTIVE#Audit': {'Count': -1},
+        'PENDING': {'Count': 1},
+        f'DAY#{DAY}': {'Granted': -1}
+    }
+
+
+def test_restore_takes_back_the_revocation():
+    # REVOKED -> ACTIVE undoes a manual revoke whose Identity Center call failed
+    assert deltas(REVOKED, ACTIVE) == {
+        'ACTIVE#Audit': {'Count': 1},
+        f'DAY#{DAY}': {'Revoked': -1}
+    }
+
+
+def test_unchanged_status_moves_nothing():
+    assert deltas(ACTIVE, ACTIVE) == {}
+
+
+def test_deleting_an_active_request_releases_its_count():
+    assert deltas(ACTIVE, DELETED) == {'ACTIVE#Audit': {'Count': -1}}